@@ -1,11 +1,16 @@
 import { Card, CardContent, Typography, Box, Paper } from "@mui/material";
 import { CurrentJob as CurrentJobType } from "../types";
+import { useJobOutputStream } from "../services/jobOutputStream";
 
 interface CurrentJobProps {
   job: CurrentJobType;
 }
 
 export const CurrentJob = ({ job }: CurrentJobProps) => {
+  const { lines } = useJobOutputStream(
+    job.type === "sql" && !job.error ? job.stream : undefined
+  );
+
   const getContent = () => {
     if (job.type === "none") {
       return "No job currently running";
@@ -15,7 +20,7 @@ export const CurrentJob = ({ job }: CurrentJobProps) => {
       if (job.error) {
         return job.error;
       }
-      return job.content || "No output available";
+      return lines.length ? lines.join("\n") : "No output available";
     }
     return "Unknown job type";
   };
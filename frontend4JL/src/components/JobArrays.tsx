@@ -0,0 +1,97 @@
+import {
+  Card,
+  CardContent,
+  Typography,
+  Table,
+  TableBody,
+  TableCell,
+  TableContainer,
+  TableHead,
+  TableRow,
+  Paper,
+  Box,
+  LinearProgress,
+} from "@mui/material";
+import { JobArray } from "../types";
+import { formatDate } from "../utils/text_formatting";
+
+interface JobArraysProps {
+  jobArrays: JobArray[];
+}
+
+export const JobArrays = ({ jobArrays }: JobArraysProps) => {
+  if (jobArrays.length === 0) {
+    return null;
+  }
+
+  return (
+    <Card sx={{ mb: 3 }}>
+      <CardContent>
+        <Box
+          display="flex"
+          alignItems="center"
+          justifyContent="space-between"
+          mb={2}
+        >
+          <Typography variant="h6" component="div">
+            Job Arrays
+          </Typography>
+        </Box>
+
+        <TableContainer
+          component={Paper}
+          sx={{
+            bgcolor: "background.paper",
+            maxHeight: 300,
+            overflow: "auto",
+          }}
+        >
+          <Table size="small" stickyHeader>
+            <TableHead>
+              <TableRow>
+                <TableCell width="5%">ID</TableCell>
+                <TableCell width="15%">Program</TableCell>
+                <TableCell width="10%">User</TableCell>
+                <TableCell width="10%">Created</TableCell>
+                <TableCell width="30%">Progress</TableCell>
+                <TableCell width="6%">Tasks</TableCell>
+                <TableCell width="6%">Pending</TableCell>
+                <TableCell width="6%">Running</TableCell>
+                <TableCell width="6%">Completed</TableCell>
+                <TableCell width="6%">Failed</TableCell>
+              </TableRow>
+            </TableHead>
+            <TableBody>
+              {jobArrays.map((jobArray) => (
+                <TableRow key={jobArray.id}>
+                  <TableCell>{jobArray.id}</TableCell>
+                  <TableCell>{jobArray.program}</TableCell>
+                  <TableCell>{jobArray.user}</TableCell>
+                  <TableCell>{formatDate(jobArray.created)}</TableCell>
+                  <TableCell>
+                    <Box display="flex" alignItems="center" gap={1}>
+                      <LinearProgress
+                        variant="determinate"
+                        value={jobArray.progress}
+                        color={jobArray.failed > 0 ? "error" : "success"}
+                        sx={{ flex: 1 }}
+                      />
+                      <Typography variant="caption" color="text.secondary">
+                        {jobArray.progress}%
+                      </Typography>
+                    </Box>
+                  </TableCell>
+                  <TableCell>{jobArray.num_tasks}</TableCell>
+                  <TableCell>{jobArray.pending}</TableCell>
+                  <TableCell>{jobArray.running}</TableCell>
+                  <TableCell>{jobArray.completed}</TableCell>
+                  <TableCell>{jobArray.failed}</TableCell>
+                </TableRow>
+              ))}
+            </TableBody>
+          </Table>
+        </TableContainer>
+      </CardContent>
+    </Card>
+  );
+};
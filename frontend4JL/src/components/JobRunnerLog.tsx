@@ -17,6 +17,7 @@ import {
 import { JobRunnerLog as JobRunnerLogType } from "../types";
 import { useState } from "react";
 import { useRemoveOldLogs } from "../services/removeLogs";
+import { useLogTail } from "../services/logTail";
 import DeleteIcon from "@mui/icons-material/Delete";
 
 const DAYS_TO_KEEP_LOG = 7;
@@ -40,6 +41,7 @@ export const JobRunnerLog = ({ log }: JobRunnerLogProps) => {
     severity: "success",
   });
   const removeOldLogsMutation = useRemoveOldLogs();
+  const logContent = useLogTail(log.availableDates[currentIndex]);
 
   const handleRemoveOldLogs = async () => {
     try {
@@ -106,7 +108,7 @@ export const JobRunnerLog = ({ log }: JobRunnerLogProps) => {
         }}
       >
         <pre style={{ margin: 0, whiteSpace: "pre-wrap" }}>
-          {log.content[currentIndex]}
+          {logContent}
         </pre>
       </Box>
       <Box sx={{ display: "flex", justifyContent: "flex-end", mt: 2 }}>
@@ -8,11 +8,13 @@ import {
   Button,
 } from "@mui/material";
 import { JobsTable } from "../components/JobsTable";
+import { JobArrays } from "../components/JobArrays";
 import { JobRunnerLog } from "../components/JobRunnerLog";
 import { CurrentJob } from "../components/CurrentJob";
 import { GPUStatus } from "../components/GPUStatus";
 import {
   Job,
+  JobArray,
   GPUStatus as GPUStatusType,
   JobRunnerLog as JobRunnerLogType,
   CurrentJob as CurrentJobType,
@@ -24,7 +26,10 @@ import ChevronLeftIcon from "@mui/icons-material/ChevronLeft";
 import { useTheme } from "@mui/material/styles";
 import { useState } from "react";
 import { CircularProgress } from "@mui/material";
-import { fetchDataPerConfig } from "../services/fetchData_utils";
+import {
+  dataFetchConfig,
+  fetchDataPerConfig,
+} from "../services/fetchData_utils";
 
 /** Width of the sidebar drawer in pixels */
 const DRAWER_WIDTH = 300;
@@ -118,6 +123,7 @@ const Sidebar = ({
  * Main content area displaying jobs table, logs, and current job information
  * @param {Object} props - Component props
  * @param {Job[]} props.jobs - List of jobs to display
+ * @param {JobArray[]} props.jobArrays - List of job arrays with their progress
  * @param {JobRunnerLogType} [props.jobRunnerLog] - Job runner log information
  * @param {CurrentJobType} [props.currentJob] - Currently running job information
  * @param {boolean} props.sidebarOpen - Whether the sidebar is open
@@ -126,6 +132,7 @@ const Sidebar = ({
  */
 const MainContent = ({
   jobs,
+  jobArrays,
   jobRunnerLog,
   currentJob,
   sidebarOpen,
@@ -134,6 +141,7 @@ const MainContent = ({
   gpuStatusUpdatedAt,
 }: {
   jobs: Job[] | { [key: string]: Job[] };
+  jobArrays: JobArray[];
   jobRunnerLog?: JobRunnerLogType;
   currentJob?: CurrentJobType;
   sidebarOpen: boolean;
@@ -202,6 +210,9 @@ const MainContent = ({
           jobs={Array.isArray(jobs) ? jobs : Object.values(jobs).flat()}
         />
       </Box>
+      <Box>
+        <JobArrays jobArrays={jobArrays} />
+      </Box>
       <Box
         sx={{
           display: "grid",
@@ -237,22 +248,20 @@ export const Layout = ({ onToggleColorMode }: LayoutProps) => {
     setSidebarOpen(!sidebarOpen);
   };
 
-  // get status for each API call
-  const { gpuStatus, jobs, jobRunnerLog, currentJob } = fetchDataPerConfig([
-    "gpuStatus",
-    "jobs",
-    "jobRunnerLog",
-    "currentJob",
-  ]);
+  // one request per tick: the server keeps a snapshot of everything displayed
+  const { snapshot } = fetchDataPerConfig(["snapshot"]);
+  const {
+    jobs,
+    job_arrays: jobArrays,
+    gpu_status: gpuStatus,
+    current_job: currentJob,
+  } = snapshot.data;
+  const jobRunnerLog =
+    snapshot.data.job_runner_log ??
+    dataFetchConfig.jobRunnerLog.defaultValue;
 
   // Show loading spinner while data is being fetched
-  if (
-    gpuStatus.isLoading ||
-    jobs.isLoading ||
-    jobRunnerLog.isLoading ||
-    currentJob.isLoading ||
-    !gpuStatus.data
-  ) {
+  if (snapshot.isLoading || !gpuStatus) {
     return (
       <Box
         sx={{
@@ -274,16 +283,17 @@ export const Layout = ({ onToggleColorMode }: LayoutProps) => {
         <Sidebar
           open={sidebarOpen}
           onClose={handleDrawerToggle}
-          gpuStatus={gpuStatus.data}
+          gpuStatus={gpuStatus}
         />
         <MainContent
-          jobs={jobs.data}
-          jobRunnerLog={jobRunnerLog.data}
-          currentJob={currentJob.data}
+          jobs={jobs}
+          jobArrays={jobArrays}
+          jobRunnerLog={jobRunnerLog}
+          currentJob={currentJob}
           sidebarOpen={sidebarOpen}
           handleDrawerToggle={handleDrawerToggle}
-          gpuStatus={gpuStatus.data}
-          gpuStatusUpdatedAt={gpuStatus.dataUpdatedAt}
+          gpuStatus={gpuStatus}
+          gpuStatusUpdatedAt={snapshot.dataUpdatedAt}
         />
       </Box>
     </Box>
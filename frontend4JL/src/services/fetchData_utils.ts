@@ -1,5 +1,12 @@
 import { useQuery, UseQueryResult } from "@tanstack/react-query";
-import { GPUStatus, Job, JobRunnerLog, CurrentJob } from "../types";
+import {
+  GPUStatus,
+  Job,
+  JobArray,
+  JobRunnerLog,
+  CurrentJob,
+  Snapshot,
+} from "../types";
 
 // constants for data refetch intervals
 /**
@@ -34,11 +41,29 @@ export const dataFetchConfig = {
     REFETCH_INTERVAL.NORMAL
   ),
   jobs: createConfigEntry("jobs", [] as Job[], REFETCH_INTERVAL.NORMAL),
+  jobArrays: createConfigEntry(
+    "job-arrays",
+    [] as JobArray[],
+    REFETCH_INTERVAL.NORMAL
+  ),
   jobRunnerLog: createConfigEntry(
     "job-runner-log",
-    { content: [], availableDates: [], log_files: [] } as JobRunnerLog,
+    { sizes: [], availableDates: [], log_files: [] } as JobRunnerLog,
     REFETCH_INTERVAL.NORMAL
   ),
+  snapshot: createConfigEntry(
+    "snapshot",
+    {
+      version: 0,
+      jobs: [],
+      counts: {},
+      job_arrays: [],
+      gpu_status: { status: "available" },
+      current_job: { type: "none" },
+      job_runner_log: null,
+    } as Snapshot,
+    REFETCH_INTERVAL.FAST
+  ),
   currentJob: createConfigEntry(
     "current-job",
     { type: "none" } as CurrentJob,
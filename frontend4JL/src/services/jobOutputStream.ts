@@ -0,0 +1,40 @@
+import { useEffect, useState } from "react";
+
+// Lines of output kept on screen
+const MAX_LINES = 5000;
+
+/**
+ * Hook that streams the output of a job via Server-Sent Events
+ * Only new lines are sent by the server, and the browser resumes from the last one
+ * received when the connection drops
+ * @param streamUrl - URL of the job's output stream, nothing is streamed if undefined
+ * @returns Output lines received so far and whether the job finished
+ */
+export const useJobOutputStream = (
+  streamUrl: string | undefined
+): { lines: string[]; finished: boolean } => {
+  const [lines, setLines] = useState<string[]>([]);
+  const [finished, setFinished] = useState(false);
+
+  useEffect(() => {
+    setLines([]);
+    setFinished(false);
+    if (!streamUrl) {
+      return;
+    }
+
+    const source = new EventSource(streamUrl);
+    source.onmessage = (event: MessageEvent<string>) => {
+      const newLines = event.data.split("\n");
+      setLines((prev) => [...prev, ...newLines].slice(-MAX_LINES));
+    };
+    source.addEventListener("end", () => {
+      setFinished(true);
+      source.close();
+    });
+
+    return () => source.close();
+  }, [streamUrl]);
+
+  return { lines, finished };
+};
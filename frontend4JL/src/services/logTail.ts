@@ -0,0 +1,72 @@
+import { useEffect, useRef, useState } from "react";
+import { JobRunnerLogChunk } from "../types";
+import { REFETCH_INTERVAL } from "./fetchData_utils";
+
+/**
+ * Hook that tails the job runner log of a date
+ * Only the bytes appended since the last poll are fetched and added to the content
+ * @param logDate - Date of the log (YYYY-MM-DD), nothing is fetched if undefined
+ * @param interval - Poll interval in milliseconds (defaults to NORMAL)
+ * @returns Content of the log read so far
+ */
+export const useLogTail = (
+  logDate: string | undefined,
+  interval: number = REFETCH_INTERVAL.NORMAL
+): string => {
+  const [content, setContent] = useState("");
+  const offset = useRef(0);
+
+  useEffect(() => {
+    offset.current = 0;
+    setContent("");
+    if (!logDate) {
+      return;
+    }
+
+    let cancelled = false;
+    let inFlight = false;
+    const poll = async () => {
+      // A slow poll must not overlap with the next one, or chunks would be appended twice
+      if (inFlight) {
+        return;
+      }
+      inFlight = true;
+      try {
+        // Keep reading while the log is larger than what was read (chunks are capped)
+        while (!cancelled) {
+          const response = await fetch(
+            `/api/job-runner-log/${logDate}?offset=${offset.current}`
+          );
+          if (!response.ok) {
+            return;
+          }
+          const chunk: JobRunnerLogChunk = await response.json();
+          if (cancelled) {
+            return;
+          }
+          setContent((prev) =>
+            chunk.reset ? chunk.content : prev + chunk.content
+          );
+          const progressed = chunk.next_offset > offset.current || chunk.reset;
+          offset.current = chunk.next_offset;
+          if (!progressed || chunk.next_offset >= chunk.size) {
+            return;
+          }
+        }
+      } catch (error) {
+        console.error("Failed to fetch job runner log:", error);
+      } finally {
+        inFlight = false;
+      }
+    };
+
+    poll();
+    const timer = setInterval(poll, interval);
+    return () => {
+      cancelled = true;
+      clearInterval(timer);
+    };
+  }, [logDate, interval]);
+
+  return content;
+};
@@ -18,7 +18,7 @@ export const useRemoveOldLogs = () => {
   return useMutation({
     mutationFn: removeOldLogs,
     onSuccess: () => {
-      queryClient.invalidateQueries({ queryKey: ["jobRunnerLog"] });
+      queryClient.invalidateQueries({ queryKey: ["snapshot"] });
     },
   });
 };
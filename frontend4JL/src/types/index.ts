@@ -12,6 +12,7 @@ export interface Job {
   id: string;
   program: string;
   python_exec: string;
+  array: string;
   user: string;
   email: string;
   status: string;
@@ -22,19 +23,51 @@ export interface Job {
   error: string;
 }
 
+export interface JobArray {
+  id: string;
+  program: string;
+  user: string;
+  created: string;
+  num_tasks: number;
+  pending: number;
+  running: number;
+  completed: number;
+  failed: number;
+  progress: number;
+}
+
 export interface JobRunnerLog {
   log_files: string[];
-  content: string[];
+  sizes: number[];
   availableDates: string[];
 }
 
+export interface JobRunnerLogChunk {
+  log_file: string;
+  content: string;
+  offset: number;
+  next_offset: number;
+  size: number;
+  reset: boolean;
+}
+
 export interface CurrentJob {
-  content?: string;
+  stream?: string;
   error?: string;
   type: "sql" | "cli" | "none";
   job_id?: number;
 }
 
+export interface Snapshot {
+  version: number;
+  jobs: Job[];
+  counts: Record<string, number>;
+  job_arrays: JobArray[];
+  gpu_status: GPUStatus;
+  current_job: CurrentJob;
+  job_runner_log: JobRunnerLog | null;
+}
+
 export interface RemoveJobLogsResult {
   message: string;
   removed_count: number;
@@ -0,0 +1,63 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from sqljobscheduler.JobManager import JobQueue
+
+
+class DBBusyError(RuntimeError):
+    """Raised when too many database calls are already waiting"""
+
+
+class AsyncJobQueue:
+    """Async facade over a JobQueue for the async handlers of the dashboard
+
+    Every call runs in a small pool of DB threads, so a slow query never blocks the event
+    loop. At most `max_pending` calls can be running or waiting at once; more raise
+    DBBusyError instead of piling up behind a slow query.
+
+    Every JobQueue method is available as a coroutine, e.g. `await db.query_jobs(limit=50)`.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        max_workers: int = 4,
+        max_pending: int = 64,
+    ):
+        self.queue = queue
+        self.max_pending = max_pending
+        self._pending = 0
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="jobqueue-db"
+        )
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking function (DB or file access) in the DB threads"""
+        if self._pending >= self.max_pending:
+            raise DBBusyError(
+                f"Too many database calls in progress ({self._pending}). Try again later."
+            )
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            self._pending -= 1
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.queue, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def _call(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return _call
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,620 @@
+"""
+Online backups of the queue database, incremental snapshots, restore & integrity checks.
+
+The queue database and its archive of old jobs (see JobQueue.archive_jobs) are always backed
+up, snapshotted & restored together, so they never disagree on which jobs they hold.
+
+- `backup_db`: consistent copy of a live database with the SQLite backup API, copied a few
+  pages per step so writers are only briefly blocked. `backup_queue` copies the queue & its
+  archive at the same point in time.
+- `take_snapshot`: incremental snapshots in a directory. The first is a full copy
+  (`<database>/base_<id>.db`); each later one only stores the pages that changed since the
+  previous one (`<database>/snapshot_<id>.pages`), so snapshots can be taken often and
+  shipped elsewhere cheaply.
+- `restore_db`: restore a backup or a snapshot into the live databases (after verifying it),
+  while the JobRunner is stopped.
+- `verify_db`: `PRAGMA integrity_check` of a database.
+
+Settings are read from `JOBRUNNER.backup` in app_settings.json. The JobRunner takes a
+snapshot every `interval_hours` if `enabled` is true.
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import struct
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from sqljobscheduler import configSetup
+from sqljobscheduler.JobManager import get_archive_path, get_JobRunner_pid
+
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    # Directory of the snapshots, ~/.sqljobscheduler/backups if null
+    "dir": None,
+    "interval_hours": 6,
+    # Pages copied per step & pause between steps, during which writers can proceed
+    "pages_per_step": 1024,
+    "step_sleep_ms": 10,
+    # Snapshots kept. Older ones are merged into the base
+    "keep": 28,
+}
+# Restarts (the database changed during the copy) before copying the rest in one step
+MAX_BACKUP_RESTARTS = 3
+# Attempts at copying the queue & archive while no jobs are being archived
+MAX_CONSISTENT_ATTEMPTS = 5
+# Databases of a queue, each snapshotted in its own subdirectory
+DATABASES = ("queue", "archive")
+MANIFEST_NAME = "manifest.json"
+# Full copy each chain of snapshots starts from, in manifests written before it was
+# named after the snapshot (base_<id>.db)
+BASE_NAME = "base.db"
+# State of the database at the latest snapshot, to compare the next snapshot against
+CURRENT_NAME = "current.db"
+PAGE_HEADER = struct.Struct("<I")
+DELTA_HEADER = struct.Struct("<II")
+
+
+def get_backup_settings() -> Dict:
+    try:
+        settings = configSetup.get_app_settings().get("JOBRUNNER", {})
+    except (OSError, ValueError):
+        settings = {}
+    return {**DEFAULT_SETTINGS, **(settings.get("backup") or {})}
+
+
+def get_snapshot_dir(settings: Optional[Dict] = None) -> Path:
+    settings = settings or get_backup_settings()
+    return Path(settings["dir"]) if settings["dir"] else configSetup.get_backup_dir()
+
+
+def backup_db(
+    db_path: Union[str, Path],
+    dest_path: Union[str, Path],
+    pages_per_step: int = DEFAULT_SETTINGS["pages_per_step"],
+    step_sleep_ms: float = DEFAULT_SETTINGS["step_sleep_ms"],
+) -> Path:
+    """Copy a live database with the backup API, `pages_per_step` pages at a time
+
+    The read lock is only held during each step. A write by another connection between
+    steps restarts the copy; after MAX_BACKUP_RESTARTS restarts the rest is copied in one
+    step, so a busy queue cannot keep the backup from finishing.
+
+    Returns:
+        Path: the backup, written to a temporary file & renamed when complete
+    """
+    dest_path = Path(dest_path)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest_path.with_name(f".{dest_path.name}.tmp")
+    tmp_path.unlink(missing_ok=True)
+
+    restarts = 0
+    last_remaining = None
+
+    def _progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+        last_remaining = remaining
+        if restarts > MAX_BACKUP_RESTARTS:
+            raise _BackupRestarted()
+        # The backup API only sleeps when the database is locked; pause between steps so
+        # waiting writers get the database
+        if remaining:
+            time.sleep(step_sleep_ms / 1000)
+
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(tmp_path)
+    try:
+        try:
+            src.backup(
+                dst,
+                pages=pages_per_step,
+                progress=_progress,
+                sleep=step_sleep_ms / 1000,
+            )
+        except _BackupRestarted:
+            src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp_path, dest_path)
+    return dest_path
+
+
+class _BackupRestarted(Exception):
+    pass
+
+
+def get_database_paths(db_path: Union[str, Path]) -> Dict[str, Path]:
+    """Paths of the queue database & of its archive, by name (see DATABASES)"""
+    return {"queue": Path(db_path), "archive": get_archive_path(db_path)}
+
+
+def backup_queue(
+    db_path: Union[str, Path],
+    dest_path: Union[str, Path],
+    pages_per_step: int = DEFAULT_SETTINGS["pages_per_step"],
+    step_sleep_ms: float = DEFAULT_SETTINGS["step_sleep_ms"],
+) -> Dict[str, Path]:
+    """Copy the queue to dest_path & its archive (if any) next to it, at the same point in time
+
+    The archive only changes when jobs are archived, in transactions that also delete them
+    from the queue. It is copied first, then the queue; if the archive changed in the
+    meantime (PRAGMA data_version), both are copied again.
+
+    Returns:
+        Dict[str, Path]: Path of every database copied, by name
+    """
+    sources = get_database_paths(db_path)
+    dests = get_database_paths(dest_path)
+    for _ in range(MAX_CONSISTENT_ATTEMPTS):
+        if not sources["archive"].exists():
+            backup_db(sources["queue"], dests["queue"], pages_per_step, step_sleep_ms)
+            if sources["archive"].exists():
+                # Jobs were archived for the first time during the copy
+                continue
+            dests["archive"].unlink(missing_ok=True)
+            return {"queue": dests["queue"]}
+
+        watcher = sqlite3.connect(sources["archive"])
+        try:
+            version = watcher.execute("PRAGMA data_version").fetchone()[0]
+            backup_db(
+                sources["archive"], dests["archive"], pages_per_step, step_sleep_ms
+            )
+            backup_db(sources["queue"], dests["queue"], pages_per_step, step_sleep_ms)
+            if watcher.execute("PRAGMA data_version").fetchone()[0] == version:
+                return dests
+        finally:
+            watcher.close()
+    raise RuntimeError(
+        f"Jobs kept being archived during {MAX_CONSISTENT_ATTEMPTS} attempts at backing up {db_path}"
+    )
+
+
+def verify_db(db_path: Union[str, Path]) -> List[str]:
+    """Check the integrity of a database
+
+    Returns:
+        List[str]: Problems found, empty if the database is intact
+    """
+    if not Path(db_path).exists():
+        return [f"{db_path} does not exist"]
+    try:
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+            problems = [row[0] for row in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    return [] if problems == ["ok"] else problems
+
+
+def _read_manifest(snapshot_dir: Path) -> Dict:
+    manifest_path = snapshot_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {"base": None, "snapshots": []}
+    return json.loads(manifest_path.read_text())
+
+
+def _write_manifest(snapshot_dir: Path, manifest: Dict) -> None:
+    tmp_path = snapshot_dir / f".{MANIFEST_NAME}.tmp"
+    tmp_path.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, snapshot_dir / MANIFEST_NAME)
+
+
+def _get_base_name(manifest: Dict) -> str:
+    """File name of the full copy of every database in the chain of a manifest"""
+    return manifest.get("base_name", BASE_NAME)
+
+
+def _get_page_size(db_path: Path) -> int:
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def _write_delta(old_path: Path, new_path: Path, delta_path: Path, page_size: int):
+    """Write the pages of new_path that differ from old_path
+
+    Returns:
+        tuple: Number of pages changed & of pages in the new database
+    """
+    num_pages = new_path.stat().st_size // page_size
+    num_changed = 0
+    # A database that did not exist at the previous snapshot is compared with nothing
+    old_file = open(old_path, "rb") if old_path.exists() else io.BytesIO()
+    with old_file as old, open(new_path, "rb") as new:
+        with gzip.open(delta_path, "wb", compresslevel=1) as delta:
+            delta.write(DELTA_HEADER.pack(page_size, num_pages))
+            for page_no in range(num_pages):
+                page = new.read(page_size)
+                if old.read(page_size) != page:
+                    delta.write(PAGE_HEADER.pack(page_no))
+                    delta.write(page)
+                    num_changed += 1
+    return num_changed, num_pages
+
+
+def _apply_delta(db_path: Path, delta_path: Path) -> None:
+    """Write the pages of a snapshot into a copy of the database it was taken after"""
+    db_path.touch()
+    with gzip.open(delta_path, "rb") as delta, open(db_path, "r+b") as db:
+        page_size, num_pages = DELTA_HEADER.unpack(delta.read(DELTA_HEADER.size))
+        while header := delta.read(PAGE_HEADER.size):
+            (page_no,) = PAGE_HEADER.unpack(header)
+            db.seek(page_no * page_size)
+            db.write(delta.read(page_size))
+        db.truncate(num_pages * page_size)
+
+
+def _get_latest_entry(manifest: Dict, name: str) -> Optional[Dict]:
+    """Entry of a database in the latest snapshot, None if it did not exist then"""
+    latest = manifest["snapshots"][-1] if manifest["snapshots"] else manifest["base"]
+    return latest["databases"].get(name)
+
+
+def take_snapshot(
+    db_path: Union[str, Path],
+    snapshot_dir: Union[str, Path],
+    pages_per_step: int = DEFAULT_SETTINGS["pages_per_step"],
+    step_sleep_ms: float = DEFAULT_SETTINGS["step_sleep_ms"],
+    keep: int = DEFAULT_SETTINGS["keep"],
+) -> Dict:
+    """Take an incremental snapshot of the live queue & its archive
+
+    Both are copied with backup_queue and compared page by page with the previous
+    snapshot; only the changed pages are stored. The first snapshot (or one after a page
+    size changed) is a full copy. Beyond `keep` snapshots, the oldest are merged into the
+    base.
+
+    Returns:
+        Dict: Manifest entry of the snapshot (id, created & per database its file, changed
+            & total pages)
+    """
+    snapshot_dir = Path(snapshot_dir)
+    for name in DATABASES:
+        (snapshot_dir / name).mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(snapshot_dir)
+    new_paths = backup_queue(
+        db_path, snapshot_dir / "queue" / "new.db", pages_per_step, step_sleep_ms
+    )
+    # The archive copy is named after the queue copy; keep it in its own directory
+    if "archive" in new_paths:
+        new_paths["archive"] = new_paths["archive"].rename(
+            snapshot_dir / "archive" / "new.db"
+        )
+    page_sizes = {name: _get_page_size(path) for name, path in new_paths.items()}
+    snapshot_id = (
+        manifest["snapshots"][-1]["id"] + 1
+        if manifest["snapshots"]
+        else (manifest["base"] or {}).get("id", 0) + 1
+    )
+    created = datetime.now().isoformat(timespec="seconds")
+
+    full = manifest["base"] is None
+    for name, page_size in page_sizes.items():
+        latest = None if full else _get_latest_entry(manifest, name)
+        if latest is not None and (
+            latest["page_size"] != page_size
+            or not (snapshot_dir / name / CURRENT_NAME).exists()
+        ):
+            full = True
+
+    # current.db is removed until the manifest is written, so a crash in between leads to
+    # a full snapshot next time instead of a delta against the wrong pages
+    if full:
+        # Full snapshot: start a new chain. The previous one stays intact until the
+        # manifest points to the new base
+        base_name = f"base_{snapshot_id:06d}.db"
+        databases = {}
+        for name, new_path in new_paths.items():
+            shutil.copyfile(new_path, snapshot_dir / name / base_name)
+            num_pages = new_path.stat().st_size // page_sizes[name]
+            databases[name] = {
+                "file": f"{name}/{base_name}",
+                "page_size": page_sizes[name],
+                "changed_pages": num_pages,
+                "num_pages": num_pages,
+            }
+        for name in DATABASES:
+            (snapshot_dir / name / CURRENT_NAME).unlink(missing_ok=True)
+        manifest = {
+            "base": {"id": snapshot_id, "created": created, "databases": databases},
+            "snapshots": [],
+            "base_name": base_name,
+        }
+        _write_manifest(snapshot_dir, manifest)
+        # Only now delete the previous chain
+        for name in DATABASES:
+            if name in new_paths:
+                new_paths[name].replace(snapshot_dir / name / CURRENT_NAME)
+            for path in (snapshot_dir / name).iterdir():
+                if path.name not in (base_name, CURRENT_NAME):
+                    path.unlink()
+        return manifest["base"]
+
+    databases = {}
+    for name in DATABASES:
+        current_path = snapshot_dir / name / CURRENT_NAME
+        if name not in new_paths:
+            # The database was deleted (e.g. the archive by clear_db)
+            current_path.unlink(missing_ok=True)
+            continue
+        delta_name = f"{name}/snapshot_{snapshot_id:06d}.pages"
+        num_changed, num_pages = _write_delta(
+            current_path, new_paths[name], snapshot_dir / delta_name, page_sizes[name]
+        )
+        current_path.unlink()
+        databases[name] = {
+            "file": delta_name,
+            "page_size": page_sizes[name],
+            "changed_pages": num_changed,
+            "num_pages": num_pages,
+        }
+    snapshot = {"id": snapshot_id, "created": created, "databases": databases}
+    manifest["snapshots"].append(snapshot)
+
+    _write_manifest(snapshot_dir, manifest)
+    for name, new_path in new_paths.items():
+        new_path.replace(snapshot_dir / name / CURRENT_NAME)
+
+    # Merge the oldest snapshots into the base
+    base_name = _get_base_name(manifest)
+    while len(manifest["snapshots"]) > keep:
+        oldest = manifest["snapshots"].pop(0)
+        for name in DATABASES:
+            base_path = snapshot_dir / name / base_name
+            if name in oldest["databases"]:
+                _apply_delta(
+                    base_path, snapshot_dir / oldest["databases"][name]["file"]
+                )
+            else:
+                base_path.unlink(missing_ok=True)
+        manifest["base"] = {
+            "id": oldest["id"],
+            "created": oldest["created"],
+            "databases": {
+                name: {**entry, "file": f"{name}/{base_name}"}
+                for name, entry in oldest["databases"].items()
+            },
+        }
+        _write_manifest(snapshot_dir, manifest)
+        for entry in oldest["databases"].values():
+            (snapshot_dir / entry["file"]).unlink()
+    return snapshot
+
+
+def format_snapshot(snapshot: Dict) -> str:
+    """Changed & total pages of every database of a snapshot, e.g. for logs"""
+    return ", ".join(
+        f"{name} {entry['changed_pages']}/{entry['num_pages']} pages changed"
+        for name, entry in snapshot["databases"].items()
+    )
+
+
+def list_snapshots(snapshot_dir: Union[str, Path]) -> List[Dict]:
+    """Snapshots that can be restored, oldest first (the base included)"""
+    manifest = _read_manifest(Path(snapshot_dir))
+    if manifest["base"] is None:
+        return []
+    return [manifest["base"]] + manifest["snapshots"]
+
+
+def build_snapshot(
+    snapshot_dir: Union[str, Path],
+    dest_path: Union[str, Path],
+    snapshot_id: Optional[int] = None,
+) -> Dict[str, Path]:
+    """Reconstruct the queue (into dest_path) & its archive at a snapshot (the latest by default)
+
+    Returns:
+        Dict[str, Path]: Path of every database that existed at the snapshot, by name
+    """
+    snapshot_dir = Path(snapshot_dir)
+    manifest = _read_manifest(snapshot_dir)
+    if manifest["base"] is None:
+        raise FileNotFoundError(f"No snapshots in {snapshot_dir}")
+    snapshot_ids = [manifest["base"]["id"]] + [s["id"] for s in manifest["snapshots"]]
+    if snapshot_id is None:
+        snapshot_id = snapshot_ids[-1]
+    if snapshot_id not in snapshot_ids:
+        raise ValueError(
+            f"No snapshot {snapshot_id} in {snapshot_dir} (available: {snapshot_ids})"
+        )
+
+    dest_paths = get_database_paths(dest_path)
+    for name, path in dest_paths.items():
+        path.unlink(missing_ok=True)
+        if name in manifest["base"]["databases"]:
+            shutil.copyfile(snapshot_dir / name / _get_base_name(manifest), path)
+    for snapshot in manifest["snapshots"]:
+        if snapshot["id"] > snapshot_id:
+            break
+        for name, path in dest_paths.items():
+            if name in snapshot["databases"]:
+                _apply_delta(path, snapshot_dir / snapshot["databases"][name]["file"])
+            else:
+                path.unlink(missing_ok=True)
+    return {name: path for name, path in dest_paths.items() if path.exists()}
+
+
+def restore_db(
+    source: Union[str, Path],
+    db_path: Union[str, Path],
+    snapshot_id: Optional[int] = None,
+) -> None:
+    """Restore the queue & its archive from a backup (see backup_queue) or a snapshot directory
+
+    Every database is verified first. They are then written into the live databases with
+    the backup API, so connections that are open meanwhile see either the old or the
+    restored database, never a mix. An archive that did not exist at the backup is
+    deleted.
+
+    Raises:
+        RuntimeError: The JobRunner is running; it would keep working on the jobs it
+            had in memory & write over the restored queue
+    """
+    runner_pid = get_JobRunner_pid()
+    if runner_pid is not None:
+        raise RuntimeError(
+            f"JobRunner is running (pid {runner_pid}), stop it before restoring"
+        )
+    source = Path(source)
+    db_path = Path(db_path)
+    restore_dir = db_path.parent / f".{db_path.stem}.restore"
+    restore_dir.mkdir(exist_ok=True)
+    try:
+        if source.is_dir():
+            restored = build_snapshot(source, restore_dir / db_path.name, snapshot_id)
+        else:
+            restored = {}
+            for name, path in get_database_paths(source).items():
+                if path.exists():
+                    restored[name] = get_database_paths(restore_dir / db_path.name)[
+                        name
+                    ]
+                    shutil.copyfile(path, restored[name])
+        if "queue" not in restored:
+            raise FileNotFoundError(f"No queue database in {source}")
+        for path in restored.values():
+            problems = verify_db(path)
+            if problems:
+                raise ValueError(
+                    f"{path.name} of {source} failed the integrity check: {'; '.join(problems[:5])}"
+                )
+
+        for name, live_path in get_database_paths(db_path).items():
+            if name not in restored:
+                live_path.unlink(missing_ok=True)
+                continue
+            with (
+                sqlite3.connect(restored[name]) as src,
+                sqlite3.connect(live_path) as dst,
+            ):
+                src.backup(dst)
+    finally:
+        shutil.rmtree(restore_dir, ignore_errors=True)
+
+
+def snapshot_if_due(db_path: Union[str, Path], settings: Dict) -> Optional[Dict]:
+    """Take a snapshot if the latest is older than `interval_hours`
+
+    Returns:
+        Dict: Manifest entry of the new snapshot, None if none was due
+    """
+    snapshot_dir = get_snapshot_dir(settings)
+    snapshots = list_snapshots(snapshot_dir)
+    if snapshots:
+        age = datetime.now() - datetime.fromisoformat(snapshots[-1]["created"])
+        if age.total_seconds() < settings["interval_hours"] * 3600:
+            return None
+    return take_snapshot(
+        db_path,
+        snapshot_dir,
+        pages_per_step=settings["pages_per_step"],
+        step_sleep_ms=settings["step_sleep_ms"],
+        keep=settings["keep"],
+    )
+
+
+def main(args):
+    settings = get_backup_settings()
+    db_path = configSetup.get_queue_db_path()
+    snapshot_dir = Path(args.dir) if args.dir else get_snapshot_dir(settings)
+
+    if args.backup:
+        start = time.time()
+        dest_paths = backup_queue(
+            db_path, args.backup, settings["pages_per_step"], settings["step_sleep_ms"]
+        )
+        print(
+            f"Backed up {db_path} to {', '.join(str(path) for path in dest_paths.values())} in {time.time() - start:.1f} s"
+        )
+    if args.snapshot:
+        snapshot = take_snapshot(
+            db_path,
+            snapshot_dir,
+            pages_per_step=settings["pages_per_step"],
+            step_sleep_ms=settings["step_sleep_ms"],
+            keep=settings["keep"],
+        )
+        print(
+            f"Snapshot {snapshot['id']} in {snapshot_dir}: {format_snapshot(snapshot)}"
+        )
+    if args.list:
+        for snapshot in list_snapshots(snapshot_dir):
+            print(
+                f"{snapshot['id']:6d}  {snapshot['created']}  {format_snapshot(snapshot)}"
+            )
+    if args.verify is not None:
+        paths = (
+            [Path(args.verify)]
+            if args.verify
+            else [
+                path for path in get_database_paths(db_path).values() if path.exists()
+            ]
+        )
+        corrupt = False
+        for path in paths:
+            problems = verify_db(path)
+            if problems:
+                corrupt = True
+                print(f"{path} is corrupt:")
+                print("\n".join(problems))
+            else:
+                print(f"{path}: ok")
+        if corrupt:
+            raise SystemExit(1)
+    if args.restore:
+        restore_db(args.restore, db_path, args.snapshotId)
+        print(f"Restored {db_path} from {args.restore}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Back up, snapshot, verify & restore the queue database"
+    )
+    parser.add_argument(
+        "--backup",
+        metavar="PATH",
+        help="Write a full backup of the queue to PATH (and of its archive next to it)",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Take an incremental snapshot (only the pages changed since the last one)",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the snapshots that can be restored"
+    )
+    parser.add_argument(
+        "--dir",
+        default=None,
+        help="Snapshot directory (default: JOBRUNNER.backup.dir or ~/.sqljobscheduler/backups)",
+    )
+    parser.add_argument(
+        "--verify",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Check the integrity of the queue & its archive (or of the database at PATH)",
+    )
+    parser.add_argument(
+        "--restore",
+        metavar="SOURCE",
+        help="Restore the queue & its archive from a backup file or a snapshot directory. Stop the JobRunner first",
+    )
+    parser.add_argument(
+        "--snapshotId",
+        type=int,
+        default=None,
+        help="Snapshot to restore from a snapshot directory (default: the latest)",
+    )
+    main(parser.parse_args())
@@ -0,0 +1,234 @@
+"""
+Compression for the dashboard: negotiated gzip/brotli for API responses and precompressed
+static assets.
+
+Brotli is optional (`pip install sqljobscheduler[compression]`); without it everything
+falls back to gzip.
+"""
+
+import gzip
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Responses smaller than this are sent as is, as compressing them gains nothing
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Suffixes of static files worth precompressing (images & fonts are already compressed)
+PRECOMPRESS_SUFFIXES = {".html", ".js", ".mjs", ".css", ".json", ".svg", ".map", ".txt"}
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "text/",
+    "image/svg+xml",
+)
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def get_supported_encodings() -> List[str]:
+    """Encodings this server can produce, preferred first"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(
+    accept_encoding: str, available: Optional[List[str]] = None
+) -> Optional[str]:
+    """Pick the preferred encoding the client accepts (q=0 means refused)"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, *params = [item.strip() for item in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if name:
+            accepted[name] = q
+
+    for encoding in available or get_supported_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def _add_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if vary is None:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+class CompressionMiddleware:
+    """Compress responses above MIN_COMPRESS_SIZE with the best encoding the client accepts
+
+    Only compressible content types are buffered and compressed. Streams (e.g. Server-Sent
+    Events), already encoded responses (precompressed assets) and partial responses pass
+    through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = MIN_COMPRESS_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+        body_parts = []
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or content_type.startswith("text/event-stream")
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(body_parts)
+            headers = MutableHeaders(raw=start_message["headers"])
+            _add_vary(headers)
+            if len(body) >= self.minimum_size:
+                body = compress(body, encoding)
+                headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            start_message["headers"] = headers.raw
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def precompress_dir(directory: Path, minimum_size: int = MIN_COMPRESS_SIZE) -> int:
+    """Write .gz (and .br) variants next to the compressible files of a directory
+
+    Variants that are newer than their file are kept, so this only does work after a
+    new build.
+
+    Returns:
+        int: Number of variants written
+    """
+    num_written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = Path(root) / name
+            if path.suffix not in PRECOMPRESS_SUFFIXES:
+                continue
+            stat = path.stat()
+            if stat.st_size < minimum_size:
+                continue
+
+            data = None
+            for encoding in get_supported_encodings():
+                variant = path.with_name(path.name + ENCODING_SUFFIXES[encoding])
+                if variant.exists() and variant.stat().st_mtime >= stat.st_mtime:
+                    continue
+                if data is None:
+                    data = path.read_bytes()
+                tmp_variant = variant.with_name(variant.name + ".tmp")
+                tmp_variant.write_bytes(compress(data, encoding))
+                tmp_variant.replace(variant)
+                num_written += 1
+    return num_written
+
+
+def get_precompressed_response(
+    path: str,
+    scope,
+    media_type: Optional[str] = None,
+    headers: Optional[dict] = None,
+) -> Optional[FileResponse]:
+    """FileResponse of the precompressed variant of a file the client accepts, if any"""
+    available = [
+        encoding
+        for encoding in get_supported_encodings()
+        if os.path.exists(path + ENCODING_SUFFIXES[encoding])
+    ]
+    if not available:
+        return None
+    encoding = choose_encoding(
+        Headers(scope=scope).get("accept-encoding", ""), available
+    )
+    if encoding is None:
+        return None
+
+    response = FileResponse(
+        path + ENCODING_SUFFIXES[encoding],
+        media_type=media_type,
+        headers={**(headers or {}), "Content-Encoding": encoding},
+    )
+    _add_vary(response.headers)
+    return response
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves .br/.gz variants (see precompress_dir) when accepted
+
+    With `immutable`, responses are cached by browsers for a year without revalidation,
+    which is only right for files whose name changes with their content (Vite's hashed
+    assets).
+    """
+
+    def __init__(self, *args, immutable: bool = False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else "no-cache"
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if isinstance(response, FileResponse) and response.status_code == 200:
+            precompressed = get_precompressed_response(
+                str(response.path), scope, media_type=response.media_type
+            )
+            if precompressed is not None:
+                response = precompressed
+            else:
+                _add_vary(response.headers)
+        response.headers["Cache-Control"] = self.cache_control
+        return response
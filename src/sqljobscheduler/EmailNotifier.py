@@ -31,7 +31,12 @@ class EmailNotifier:
 
     @staticmethod
     def mask_email(email: str) -> str:
-        """Mask email address"""
+        """Mask email address (or each of a comma-separated list)"""
+        if "," in email:
+            return ", ".join(
+                EmailNotifier.mask_email(address.strip())
+                for address in email.split(",")
+            )
         parts = email.split("@")
         if len(parts) == 2:
             username = parts[0]
@@ -147,6 +152,33 @@ class EmailNotifier:
         body += f"\nError: {error}"
         self.send_email(recipient, subject, body)
 
+    def notify_array_start(
+        self, recipient: str, array_id: str, script: str, num_tasks: int
+    ) -> None:
+        """Notify when the first task of a job array starts"""
+        subject = f"Job Array {array_id} Started"
+        body = f"Your job array has started.\nJob Array ID: {array_id}\nScript: {script}\nTasks: {num_tasks}"
+        started_time = self.get_time_str()
+        body += f"\nStarted at: {started_time}"
+        self.send_email(recipient, subject, body)
+
+    def notify_array_complete(
+        self,
+        recipient: str,
+        array_id: str,
+        script: str,
+        num_tasks: int,
+        completed: int,
+        failed: int,
+    ) -> None:
+        """Notify when all tasks of a job array are done"""
+        subject = f"Job Array {array_id} Finished"
+        body = f"Your job array has finished.\nJob Array ID: {array_id}\nScript: {script}\nTasks: {num_tasks}"
+        body += f"\nCompleted: {completed}\nFailed: {failed}"
+        finished_time = self.get_time_str()
+        body += f"\nFinished at: {finished_time}"
+        self.send_email(recipient, subject, body)
+
     @staticmethod
     def get_time_str() -> str:
         """Get current time as string"""
@@ -0,0 +1,196 @@
+import json
+import logging
+import os
+import subprocess
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from sqljobscheduler import configSetup
+
+# Snippet run inside the activated env to dump what activation produced
+_ENV_DUMP_SNIPPET = (
+    "import json, os, sys; "
+    "print(json.dumps({'environ': dict(os.environ), 'python_exec': sys.executable}))"
+)
+
+
+@dataclass
+class ResolvedEnv:
+    name: str
+    prefix: str
+    python_exec: str
+    env_delta: Dict[str, str]
+    conda_meta_mtime: float
+
+
+class EnvCache:
+    """Resolve conda environments once and reuse the result for every job.
+
+    Activating an env through `conda activate` costs several seconds per job. Instead each
+    env is resolved a single time to the environment variables activation sets and the
+    python executable it points to. The result is kept in memory and on disk, and is
+    invalidated whenever the mtime of the env's `conda-meta` directory changes (i.e.
+    packages were installed, updated or removed).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        env_settings: Optional[Dict[str, Dict]] = None,
+    ):
+        self.cache_dir = Path(cache_dir or configSetup.get_env_cache_dir())
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.env_settings = env_settings or {}
+        self.conda_exe = os.environ.get("CONDA_EXE", "conda")
+        self._envs: Dict[str, ResolvedEnv] = {}
+
+    @staticmethod
+    def _get_conda_meta_mtime(prefix: str) -> float:
+        """Get the mtime of the conda-meta directory of an env (0 if missing)"""
+        try:
+            return (Path(prefix) / "conda-meta").stat().st_mtime
+        except OSError:
+            return 0.0
+
+    def _cache_file(self, env_name: str) -> Path:
+        return self.cache_dir / f"{env_name}.json"
+
+    def _is_stale(self, resolved: ResolvedEnv) -> bool:
+        """Check if the env was modified since it was resolved"""
+        return (
+            self._get_conda_meta_mtime(resolved.prefix) != resolved.conda_meta_mtime
+            or not Path(resolved.python_exec).exists()
+        )
+
+    def _load_from_disk(self, env_name: str) -> Optional[ResolvedEnv]:
+        cache_file = self._cache_file(env_name)
+        if not cache_file.exists():
+            return None
+        try:
+            with open(cache_file, "r") as f:
+                return ResolvedEnv(**json.load(f))
+        except Exception as e:
+            logging.warning(f"Ignoring unreadable env cache {cache_file}: {e}")
+            return None
+
+    def _save_to_disk(self, resolved: ResolvedEnv) -> None:
+        cache_file = self._cache_file(resolved.name)
+        tmp_file = cache_file.with_suffix(".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(asdict(resolved), f, indent=2)
+        tmp_file.replace(cache_file)
+
+    def _resolve(self, env_name: str) -> ResolvedEnv:
+        """Activate the env once via `conda run` and record the resulting environment"""
+        result = subprocess.run(
+            [
+                self.conda_exe,
+                "run",
+                "--no-capture-output",
+                "-n",
+                env_name,
+                "python",
+                "-c",
+                _ENV_DUMP_SNIPPET,
+            ],
+            capture_output=True,
+            text=True,
+            env={k: v for k, v in os.environ.items() if k != "PYTHONPATH"},
+        )
+        if result.returncode != 0:
+            raise RuntimeError(
+                f"Failed to resolve python env '{env_name}': {result.stderr.strip()}"
+            )
+
+        dumped = json.loads(result.stdout.strip().splitlines()[-1])
+        activated = dumped["environ"]
+        env_delta = {
+            key: value
+            for key, value in activated.items()
+            if os.environ.get(key) != value
+            and not key.startswith("CONDA_RUN")
+            and key not in ("SHLVL", "_", "PWD", "OLDPWD")
+        }
+        prefix = activated.get("CONDA_PREFIX") or str(
+            Path(dumped["python_exec"]).parent.parent
+        )
+
+        return ResolvedEnv(
+            name=env_name,
+            prefix=prefix,
+            python_exec=dumped["python_exec"],
+            env_delta=env_delta,
+            conda_meta_mtime=self._get_conda_meta_mtime(prefix),
+        )
+
+    def get(self, env_name: str) -> ResolvedEnv:
+        """Get the resolved env, resolving it only if it is not cached or is stale"""
+        resolved = self._envs.get(env_name) or self._load_from_disk(env_name)
+        if resolved is None or self._is_stale(resolved):
+            logging.info(f"Resolving python env '{env_name}'")
+            resolved = self._resolve(env_name)
+            self._save_to_disk(resolved)
+        self._envs[env_name] = resolved
+        return resolved
+
+    def invalidate(self, env_name: Optional[str] = None) -> None:
+        """Drop one (or every) cached env so it is resolved again on next use"""
+        if env_name is not None:
+            names = {env_name}
+        else:
+            names = set(self._envs) | {f.stem for f in self.cache_dir.glob("*.json")}
+        for name in names:
+            self._envs.pop(name, None)
+            self._cache_file(name).unlink(missing_ok=True)
+
+    def get_env_vars(self, env_name: str) -> Dict[str, str]:
+        """Environment variables to run a job in the env with, including per-env overrides"""
+        env_vars = dict(self.get(env_name).env_delta)
+        overrides = self.env_settings.get(env_name, {}).get("env_vars") or {}
+        env_vars.update({key: str(value) for key, value in overrides.items()})
+        return env_vars
+
+    def get_python_exec(self, env_name: str, path2python_exec: str) -> str:
+        """Use the given interpreter if it is a path, otherwise the one of the env"""
+        if os.sep in path2python_exec:
+            return path2python_exec
+        return self.get(env_name).python_exec
+
+    def get_cpu_affinity(self, env_name: Optional[str]) -> Optional[str]:
+        """CPU list (taskset format, e.g. '0-7') configured for the env, if any"""
+        if env_name is None:
+            return None
+        return self.env_settings.get(env_name, {}).get("cpu_affinity")
+
+
+def main(args):
+    env_settings = configSetup.get_app_settings()["JOBRUNNER"].get("env_settings", {})
+    cache = EnvCache(env_settings=env_settings)
+    if args.invalidate:
+        cache.invalidate(args.env)
+        print("Env cache invalidated")
+        return
+    if args.env is None:
+        print("No env given. Use --env ENV_NAME")
+        return
+    resolved = cache.get(args.env)
+    print(f"Env: {resolved.name}")
+    print(f"Prefix: {resolved.prefix}")
+    print(f"Python: {resolved.python_exec}")
+    for key, value in cache.get_env_vars(args.env).items():
+        print(f"    {key}={value}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Resolve and cache python envs")
+    parser.add_argument("--env", default=None, help="Name of the conda env")
+    parser.add_argument(
+        "--invalidate",
+        action="store_true",
+        help="Drop the cached env (all envs if --env is not given)",
+    )
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,218 @@
+import fcntl
+import json
+import logging
+import os
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import psutil
+
+GPU_LEDGER_FILE = Path(tempfile.gettempdir()) / "gpu_ledger.json"
+
+
+def detect_gpu_capacities() -> Dict[str, int]:
+    """Get the total memory (MB) of every GPU via nvidia-smi
+
+    Returns:
+        Dict[str, int]: Total memory per device index, empty if nvidia-smi is not available
+    """
+    try:
+        result = subprocess.run(
+            [
+                "nvidia-smi",
+                "--query-gpu=index,memory.total",
+                "--format=csv,noheader,nounits",
+            ],
+            capture_output=True,
+            text=True,
+        )
+    except FileNotFoundError:
+        return {}
+    if result.returncode != 0:
+        return {}
+
+    capacities = {}
+    for line in result.stdout.strip().splitlines():
+        index, total = [part.strip() for part in line.split(",")]
+        capacities[index] = int(float(total))
+    return capacities
+
+
+def get_gpu_memory_by_pid() -> Dict[int, int]:
+    """Get the GPU memory (MB) currently used by each process via nvidia-smi"""
+    try:
+        result = subprocess.run(
+            [
+                "nvidia-smi",
+                "--query-compute-apps=pid,used_memory",
+                "--format=csv,noheader,nounits",
+            ],
+            capture_output=True,
+            text=True,
+        )
+    except FileNotFoundError:
+        return {}
+    if result.returncode != 0:
+        return {}
+
+    usage = {}
+    for line in result.stdout.strip().splitlines():
+        try:
+            pid, used = [part.strip() for part in line.split(",")]
+            usage[int(pid)] = usage.get(int(pid), 0) + int(float(used))
+        except ValueError:
+            continue
+    return usage
+
+
+class GPULedger:
+    """Per-device GPU memory accounting shared between processes
+
+    Every device has a capacity (MB) and a list of allocations (one per running job with
+    the memory it is expected to use). Jobs are placed on a device only if the sum of the
+    allocations fits in its capacity. The ledger is a JSON file guarded by an flock, so
+    allocations of processes that died are dropped the next time it is read.
+    """
+
+    def __init__(
+        self,
+        capacities: Dict[str, int],
+        max_jobs_per_device: Optional[int] = None,
+        ledger_file: Path = GPU_LEDGER_FILE,
+    ):
+        self.capacities = {str(device): int(mb) for device, mb in capacities.items()}
+        self.max_jobs_per_device = max_jobs_per_device
+        self.ledger_file = Path(ledger_file)
+        self.lock_file = self.ledger_file.with_suffix(".lock")
+
+    @contextmanager
+    def _locked(self):
+        """Load the ledger under an exclusive lock and write it back afterwards"""
+        with open(self.lock_file, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                allocations = {}
+                if self.ledger_file.exists():
+                    try:
+                        with open(self.ledger_file, "r") as f:
+                            allocations = json.load(f).get("allocations", {})
+                    except (OSError, ValueError) as e:
+                        logging.warning(f"Resetting unreadable GPU ledger: {e}")
+
+                # Drop allocations of dead processes & unknown devices
+                allocations = {
+                    device: [
+                        alloc
+                        for alloc in allocations.get(device, [])
+                        if psutil.pid_exists(alloc["pid"])
+                    ]
+                    for device in self.capacities
+                }
+
+                yield allocations
+
+                tmp_file = self.ledger_file.with_suffix(".tmp")
+                with open(tmp_file, "w") as f:
+                    json.dump(
+                        {"capacities": self.capacities, "allocations": allocations},
+                        f,
+                        indent=2,
+                    )
+                tmp_file.replace(self.ledger_file)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _used(device_allocations: List[Dict]) -> int:
+        return sum(alloc["mem_mb"] for alloc in device_allocations)
+
+    def allocate(
+        self,
+        job_id: int,
+        mem_mb: int,
+        user: Optional[str],
+        script: str,
+        pid: int,
+    ) -> Optional[str]:
+        """Reserve memory for a job on the device where it fits best
+
+        Returns:
+            Optional[str]: Device index the job was placed on, or None if no device has room
+        """
+        with self._locked() as allocations:
+            best_device = None
+            best_free = None
+            for device, capacity in self.capacities.items():
+                device_allocations = allocations[device]
+                if (
+                    self.max_jobs_per_device is not None
+                    and len(device_allocations) >= self.max_jobs_per_device
+                ):
+                    continue
+                free = capacity - self._used(device_allocations) - mem_mb
+                # Best fit: the device with the least room left keeps bigger gaps open
+                if free >= 0 and (best_free is None or free < best_free):
+                    best_device, best_free = device, free
+
+            if best_device is not None:
+                allocations[best_device].append(
+                    {
+                        "job_id": job_id,
+                        "mem_mb": int(mem_mb),
+                        "user": user,
+                        "script": script,
+                        "pid": pid,
+                        "time started": datetime.now().isoformat(),
+                    }
+                )
+            return best_device
+
+    def release(self, job_id: int) -> None:
+        """Free the memory reserved for a job"""
+        with self._locked() as allocations:
+            for device in allocations:
+                allocations[device] = [
+                    alloc for alloc in allocations[device] if alloc["job_id"] != job_id
+                ]
+
+    def get_allocations(self) -> Dict[str, List[Dict]]:
+        """Get the allocations per device"""
+        with self._locked() as allocations:
+            return {device: list(allocs) for device, allocs in allocations.items()}
+
+    def get_free_capacity(self) -> Dict[str, int]:
+        """Get the unreserved memory (MB) per device"""
+        with self._locked() as allocations:
+            return {
+                device: self.capacities[device] - self._used(allocs)
+                for device, allocs in allocations.items()
+            }
+
+
+def main():
+    capacities = detect_gpu_capacities()
+    if not capacities and GPU_LEDGER_FILE.exists():
+        with open(GPU_LEDGER_FILE, "r") as f:
+            capacities = json.load(f).get("capacities", {})
+    if not capacities:
+        print("No GPUs found")
+        return
+
+    ledger = GPULedger(capacities)
+    free = ledger.get_free_capacity()
+    for device, allocs in ledger.get_allocations().items():
+        print(
+            f"GPU {device}: {free[device]} / {ledger.capacities[device]} MB free, {len(allocs)} job(s)"
+        )
+        for alloc in allocs:
+            print(
+                f"    Job {alloc['job_id']}: {alloc['mem_mb']} MB | {alloc['user']} | {os.path.basename(alloc['script'])}"
+            )
+
+
+if __name__ == "__main__":
+    main()
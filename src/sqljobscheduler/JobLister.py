@@ -1,11 +1,23 @@
 import argparse
+import csv
+import json
+import os
+import sys
+import time
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
 
 from tabulate import tabulate
 
 from sqljobscheduler.configSetup import get_queue_db_path
-from sqljobscheduler.JobManager import JobQueue
+from sqljobscheduler.JobManager import (
+    Job,
+    JobQueue,
+    JobStatus,
+    StatsBucket,
+    parse_param_value,
+)
 
 
 def shorten_path(path_str: str, parts: int = 3) -> str:
@@ -18,49 +30,291 @@ def get_basename(path_str: str) -> str:
     return Path(path_str).name
 
 
+# Rows per tabulate grid, so tables are printed as they are read
+TABLE_CHUNK_ROWS = 500
+# Fields of the csv & jsonl formats
+RECORD_FIELDS = [
+    "id",
+    "programPath",
+    "path2python_exec",
+    "python_env",
+    "parameters",
+    "array_id",
+    "array_task",
+    "user",
+    "email_address",
+    "status",
+    "created_at",
+    "started_at",
+    "completed_at",
+    "error_message",
+]
+
+
+def format_job_row(job: Job) -> Dict:
+    """Row of a job for the table format"""
+    return {
+        "ID": f"{job.id:05d}",
+        "Program": get_basename(job.programPath).replace(".py", ""),
+        "Python Exec": shorten_path(job.path2python_exec),
+        "Python Env": job.python_env if job.python_env is not None else "-",
+        "Array": f"{job.array_id:05d}[{job.array_task}]"
+        if job.array_id is not None
+        else "-",
+        "User": job.user,
+        "Email": job.email_address,
+        "Status": job.status.value,
+        "Created": job.created_at.strftime("%Y-%m-%d %H:%M"),
+        "Started": job.started_at.strftime("%Y-%m-%d %H:%M") if job.started_at else "-",
+        "Completed": job.completed_at.strftime("%Y-%m-%d %H:%M")
+        if job.completed_at
+        else "-",
+        "Error": (job.error_message[:50] + "...")
+        if job.error_message and len(job.error_message) > 50
+        else job.error_message or "-",
+    }
+
+
+def job_to_record(job: Job) -> Dict:
+    """Complete, machine-readable record of a job for the csv & jsonl formats"""
+    record = {field: getattr(job, field) for field in RECORD_FIELDS}
+    record["status"] = job.status.value
+    for field in ("created_at", "started_at", "completed_at"):
+        record[field] = record[field].isoformat() if record[field] else None
+    return record
+
+
+def write_jobs(jobs: Iterable[Job], output_format: str, header: bool = True) -> int:
+    """Write jobs to stdout as they come in
+
+    Returns:
+        int: Number of jobs written
+    """
+    num_jobs = 0
+    if output_format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=RECORD_FIELDS)
+        if header:
+            writer.writeheader()
+        for num_jobs, job in enumerate(jobs, start=1):
+            record = job_to_record(job)
+            record["parameters"] = json.dumps(record["parameters"])
+            writer.writerow(record)
+    elif output_format == "jsonl":
+        for num_jobs, job in enumerate(jobs, start=1):
+            sys.stdout.write(json.dumps(job_to_record(job)) + "\n")
+    else:
+        rows = []
+        for num_jobs, job in enumerate(jobs, start=1):
+            rows.append(format_job_row(job))
+            if len(rows) == TABLE_CHUNK_ROWS:
+                print(tabulate(rows, headers="keys", tablefmt="grid"))
+                rows = []
+        if rows:
+            print(tabulate(rows, headers="keys", tablefmt="grid"))
+    sys.stdout.flush()
+    return num_jobs
+
+
+def parse_param_filter(param_filter: str) -> Tuple[str, Any]:
+    """Parameter filter given as KEY=VALUE (VALUE parsed as JSON if valid)"""
+    key, sep, value = param_filter.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got '{param_filter}'")
+    return key, parse_param_value(value)
+
+
+# Moves the cursor home & clears the screen, like `watch` between refreshes
+CLEAR_SCREEN = "\033[H\033[2J"
+
+
+def _matches_filters(
+    job: Job,
+    status: Optional[JobStatus],
+    since: Optional[datetime],
+    params: Optional[Dict],
+) -> bool:
+    return (
+        (status is None or job.status == status)
+        and (since is None or job.created_at >= since)
+        and all(
+            job.parameters.get(key) == value for key, value in (params or {}).items()
+        )
+    )
+
+
+def watch_jobs(
+    queue: JobQueue,
+    args,
+    status: Optional[JobStatus],
+    since: Optional[datetime],
+    params: Optional[Dict] = None,
+):
+    """List the jobs, then every `args.watch` seconds query only the jobs that changed
+
+    The table is redrawn in place, like `watch`; csv & jsonl print the changed jobs.
+    """
+    change_seq = queue.get_last_change_seq()
+    jobs = queue.iter_jobs(status=status, since=since, params=params)
+    redraw = args.format == "table"
+    if redraw:
+        shown = {job.id: job for job in jobs}
+        _draw_jobs(shown, args.watch)
+    else:
+        write_jobs(jobs, args.format)
+    try:
+        while True:
+            time.sleep(args.watch)
+            changed, change_seq = queue.get_jobs_changed_since(change_seq)
+            if redraw:
+                for job in changed:
+                    if _matches_filters(job, status, since, params):
+                        shown[job.id] = job
+                    else:
+                        # e.g. a running job that finished, with --status running
+                        shown.pop(job.id, None)
+                _draw_jobs(shown, args.watch)
+                continue
+            changed = [
+                job for job in changed if _matches_filters(job, status, since, params)
+            ]
+            if changed:
+                write_jobs(changed, args.format, header=False)
+    except KeyboardInterrupt:
+        pass
+
+
+def _draw_jobs(jobs: Dict[int, Job], interval: float) -> None:
+    """Redraw the table of jobs (newest first) from the top of the screen"""
+    sys.stdout.write(CLEAR_SCREEN)
+    print(
+        f"Every {interval:g}s, {len(jobs)} job(s) at {datetime.now().strftime('%H:%M:%S')}"
+    )
+    write_jobs(
+        sorted(jobs.values(), key=lambda job: (job.created_at, job.id), reverse=True),
+        "table",
+    )
+
+
 def main(args):
     # Use the data directory for the database
     db_path = get_queue_db_path()
 
     queue = JobQueue(str(db_path))
-    jobs = queue.get_all_jobs()
+    if args.search:
+        print_search_results(queue, args.search)
+        return
+
+    # Filter jobs based on status, days and parameters in SQL
+    status = JobStatus(args.status) if args.status else None
+    since = datetime.now() - timedelta(days=args.days) if args.days else None
+    params = dict(args.param)
+
+    if args.watch:
+        watch_jobs(queue, args, status, since, params)
+        return
+
+    num_jobs = write_jobs(
+        queue.iter_jobs(status=status, since=since, params=params), args.format
+    )
+    if args.format != "table":
+        return
 
-    # Filter jobs based on status and days
-    if args.status:
-        jobs = [job for job in jobs if job.status == args.status]
+    if not num_jobs:
+        print("No jobs found in the queue.")
+
+    print_job_arrays(queue, args)
+    print_summary(queue, args)
+
+    cache_stats = queue.get_cache_stats()
+    if cache_stats["reused_jobs"]:
+        print(
+            f"\nResult reuse: {cache_stats['reused_jobs']} job(s) reused earlier results, saving {cache_stats['gpu_seconds_saved'] / 3600:.2f} GPU hours"
+        )
+
+
+def print_job_arrays(queue: JobQueue, args):
+    """Print the progress of job arrays that are unfinished or within the time window"""
+    job_arrays = queue.get_job_arrays()
     if args.days:
         cutoff_date = datetime.now() - timedelta(days=args.days)
-        jobs = [job for job in jobs if job.created_at >= cutoff_date]
-
-    # Convert jobs to a list of dictionaries for display
-    job_rows = []
-    for job in jobs:
-        job_rows.append(
-            {
-                "ID": f"{job.id:05d}",
-                "Program": get_basename(job.programPath).replace(".py", ""),
-                "Python Exec": shorten_path(job.path2python_exec),
-                "Python Env": job.python_env if job.python_env is not None else "-",
-                "User": job.user,
-                "Email": job.email_address,
-                "Status": job.status.value,
-                "Created": job.created_at.strftime("%Y-%m-%d %H:%M"),
-                "Started": job.started_at.strftime("%Y-%m-%d %H:%M")
-                if job.started_at
-                else "-",
-                "Completed": job.completed_at.strftime("%Y-%m-%d %H:%M")
-                if job.completed_at
-                else "-",
-                "Error": (job.error_message[:50] + "...")
-                if job.error_message and len(job.error_message) > 50
-                else job.error_message or "-",
-            }
-        )
+        job_arrays = [
+            job_array
+            for job_array in job_arrays
+            if not job_array.finished or job_array.created_at >= cutoff_date
+        ]
+    if not job_arrays:
+        return
+
+    array_rows = [
+        {
+            "Array ID": f"{job_array.id:05d}",
+            "Program": get_basename(job_array.programPath).replace(".py", ""),
+            "User": job_array.user,
+            "Tasks": job_array.num_tasks,
+            "Pending": job_array.pending,
+            "Running": job_array.running,
+            "Completed": job_array.completed,
+            "Failed": job_array.failed,
+            "Progress": f"{job_array.progress * 100:.0f}%",
+            "Created": job_array.created_at.strftime("%Y-%m-%d %H:%M"),
+        }
+        for job_array in job_arrays
+    ]
+    print("\nJob Arrays:")
+    print(tabulate(array_rows, headers="keys", tablefmt="grid"))
+
+
+def print_summary(queue: JobQueue, args):
+    """Print totals of the time window, read from the daily rollups"""
+    since = datetime.now() - timedelta(days=args.days) if args.days else None
+    stats = queue.get_stats(since=since, bucket=StatsBucket.DAY)
+    totals = {
+        key: sum(row[key] for row in stats["throughput"])
+        for key in ("submitted", "completed", "failed", "gpu_seconds")
+    }
+    if not totals["submitted"] and not totals["completed"] + totals["failed"]:
+        return
+
+    def _fmt_duration(seconds):
+        return "-" if seconds is None else str(timedelta(seconds=round(seconds)))
+
+    window = f"last {args.days} days" if args.days else "all time"
+    print(
+        f"\nSummary ({window}): {totals['submitted']} submitted, {totals['completed']} completed, "
+        f"{totals['failed']} failed, {totals['gpu_seconds'] / 3600:.2f} GPU hours | "
+        f"median wait {_fmt_duration(stats['wait_time']['p50'])}, "
+        f"median run {_fmt_duration(stats['run_time']['p50'])}"
+    )
 
-    if job_rows:
-        print(tabulate(job_rows, headers="keys", tablefmt="grid"))
-    else:
-        print("No jobs found in the queue.")
+
+def print_search_results(queue: JobQueue, query: str, limit: int = 50):
+    """Print the jobs & JobRunner log lines matching a full-text search"""
+    results = queue.search(query, limit=limit)
+    if not results:
+        print(f"No jobs or logs match '{query}'.")
+        return
+
+    result_rows = [
+        {
+            "Job/Log": f"{result['job_id']:05d}"
+            if result["type"] == "job"
+            else f"{result['log_file']}:{result['line_no']}",
+            "Program": get_basename(result["program"]).replace(".py", "")
+            if result["type"] == "job"
+            else "-",
+            "Status": result["status"] if result["type"] == "job" else "-",
+            "Match": result["snippet"],
+        }
+        for result in results
+    ]
+    print(
+        tabulate(
+            result_rows,
+            headers="keys",
+            tablefmt="grid",
+            maxcolwidths=[None, None, None, 80],
+        )
+    )
 
 
 if __name__ == "__main__":
@@ -74,5 +328,35 @@ if __name__ == "__main__":
     parser.add_argument(
         "--days", type=int, default=7, help="Show jobs from the last N days"
     )
+    parser.add_argument(
+        "--param",
+        action="append",
+        default=[],
+        type=parse_param_filter,
+        metavar="KEY=VALUE",
+        help="Only jobs run with this parameter value, e.g. --param session=S01 (repeatable)",
+    )
+    parser.add_argument(
+        "--search",
+        default=None,
+        help='Full-text search over job parameters, errors & logs (e.g. "out of memory")',
+    )
+    parser.add_argument(
+        "--format",
+        choices=["table", "csv", "jsonl"],
+        default="table",
+        help="Output format. csv & jsonl list every field and stream with constant memory",
+    )
+    parser.add_argument(
+        "--watch",
+        type=float,
+        default=None,
+        metavar="N",
+        help="Keep running and redraw the jobs every N seconds (csv & jsonl: print the jobs that changed)",
+    )
     args = parser.parse_args()
-    main(args)
+    try:
+        main(args)
+    except BrokenPipeError:
+        # Output piped into e.g. `head` that exited early
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
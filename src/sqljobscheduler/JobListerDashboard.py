@@ -1,18 +1,57 @@
+import asyncio
+import hashlib
+import hmac
 import json
+import math
 import os
-import subprocess
-from datetime import datetime, timedelta
+import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from fastapi.staticfiles import StaticFiles
 
 from sqljobscheduler import JobManager, LockFileUtils, configSetup
+from sqljobscheduler.AsyncJobQueue import AsyncJobQueue, DBBusyError
+from sqljobscheduler.Compression import (
+    CompressionMiddleware,
+    PrecompressedStaticFiles,
+    get_precompressed_response,
+    precompress_dir,
+)
+from sqljobscheduler.JobOutputStream import JobOutputHub
+from sqljobscheduler.JobSubmission import (
+    RateLimiter,
+    SubmissionError,
+    get_submission_settings,
+    iter_ndjson,
+    parse_json_jobs,
+    read_limited,
+    validate_job,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the snapshot refresh & precompress the frontend, stop the refresh on shutdown"""
+    await start_snapshot_refresh()
+    await precompress_frontend()
+    try:
+        yield
+    finally:
+        await stop_snapshot_refresh()
+
 
-app = FastAPI(title="GPU Job Scheduler Dashboard")
+app = FastAPI(title="GPU Job Scheduler Dashboard", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -21,7 +60,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+# gzip/brotli for large API responses, negotiated via Accept-Encoding
+app.add_middleware(CompressionMiddleware)
 
 # Get the project root directory (3 levels up from this file)
 PROJECT_ROOT = Path(__file__).parent.parent.parent
@@ -32,12 +74,13 @@ TSX_OUTPUT_DIR = PROJECT_ROOT / "frontend4JL" / "dist"
 # Mount static files
 app.mount(
     "/dist",
-    StaticFiles(directory=str(TSX_OUTPUT_DIR)),
+    PrecompressedStaticFiles(directory=str(TSX_OUTPUT_DIR)),
     name="dist",
 )
+# Vite puts a content hash in the names of assets, so they can be cached forever
 app.mount(
     "/assets",
-    StaticFiles(directory=str(TSX_OUTPUT_DIR / "assets")),
+    PrecompressedStaticFiles(directory=str(TSX_OUTPUT_DIR / "assets"), immutable=True),
     name="assets",
 )
 app.mount(
@@ -48,22 +91,73 @@ app.mount(
 
 # Constants
 DB_PATH = configSetup.get_queue_db_path()
+# Changes on every start so ETags from a previous run never match
+ETAG_PREFIX = uuid.uuid4().hex[:8]
+
+# Long-lived queue so changes can be detected via PRAGMA data_version
+QUEUE = JobManager.JobQueue(DB_PATH)
+# Handlers go through DB threads so a slow query never blocks the event loop
+DB = AsyncJobQueue(QUEUE)
+
+
+def _is_job_running(job_id: int) -> bool:
+    job = QUEUE.get_job(job_id)
+    return job is not None and job.status == JobManager.JobStatus.RUNNING
+
+
+# Single reader per running job's output, shared by all streaming clients
+OUTPUT_HUB = JobOutputHub(configSetup.get_job_output_file, _is_job_running)
 
 
 def get_current_time():
     return datetime.now().strftime("%m/%d/%Y %H:%M")
 
 
+# Max bytes of a log returned per request when tailing
+LOG_CHUNK_SIZE = 1024 * 1024
+
+
 def read_output_file(file_path: Path) -> str:
     try:
-        result = subprocess.run(
-            ["/usr/bin/cat", str(file_path)], capture_output=True, text=True
-        )
-        return result.stdout
+        return Path(file_path).read_text(errors="replace")
     except FileNotFoundError:
         return "Error: File not found"
 
 
+def read_file_from_offset(
+    file_path: Path, offset: int, max_bytes: int = LOG_CHUNK_SIZE
+) -> dict:
+    """Read the bytes of a file appended since the given offset
+
+    If the file is now smaller than the offset (it was truncated or replaced), reading
+    restarts at 0 and `reset` is set. When the chunk is cut at `max_bytes`, it ends at the
+    last complete line so lines are never split between requests.
+
+    Returns:
+        dict: content, offset & next_offset the content spans, file size and reset flag
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        reset = offset > size
+        if reset:
+            offset = 0
+        f.seek(offset)
+        data = f.read(max_bytes)
+
+    if offset + len(data) < size:
+        last_newline = data.rfind(b"\n")
+        if last_newline != -1:
+            data = data[: last_newline + 1]
+
+    return {
+        "content": data.decode(errors="replace"),
+        "offset": offset,
+        "next_offset": offset + len(data),
+        "size": size,
+        "reset": reset,
+    }
+
+
 def _get_job_runner_logs() -> List[Path]:
     """Get all job runner logs sorted by modification time
 
@@ -115,56 +209,23 @@ def read_job_runner_log(log_idx: int = 0) -> Optional[str]:
     return None
 
 
-async def get_current_job_output() -> dict:
-    tmux4WA_dir = configSetup.get_log_dir() / "tmux4WA"
-    tmux4WA_dir.mkdir(parents=True, exist_ok=True)
-    current_job_log = tmux4WA_dir / "current_job"
-
-    with open(
-        configSetup.get_server_service_dir(__file__)
-        / "templates"
-        / "app_settings.json",
-        "r",
-    ) as f:
-        app_settings = json.load(f)
-        socket_name = app_settings["JOBRUNNER"]["script_name"]
-
+def get_current_job_output() -> dict:
+    """Get the job currently running & where to stream its output from"""
     if LockFileUtils.check_gpu_lock_file():
         lock_info = LockFileUtils.get_current_gpu_job(verbose=False)
         if lock_info["ctype"] == "sql":
-            try:
-                result = subprocess.run(
-                    [
-                        "/usr/bin/tmux",
-                        "-S",
-                        f"/tmp/tmux-{os.getuid()}/{socket_name}",
-                        "capture-pane",
-                        "-t",
-                        f"job_{lock_info['job_id']:05d}",
-                        "-p",
-                        "-S",
-                        "-",
-                    ],
-                    capture_output=True,
-                    text=True,
-                )
-                current_job_log.write_text(result.stdout)
-                return {
-                    "job_id": lock_info["job_id"],
-                    "content": read_output_file(current_job_log),
-                    "type": "sql",
-                    "error": None,
-                }
-            except Exception as e:
-                return {"error": f"Failed to capture tmux output: {e}", "type": "sql"}
+            return {
+                "job_id": lock_info["job_id"],
+                "stream": f"/api/jobs/{lock_info['job_id']}/output/stream",
+                "type": "sql",
+                "error": None,
+            }
         else:
             return {
                 "error": "CLI job currently running. Cannot display output",
                 "type": "cli",
             }
     else:
-        if current_job_log.exists():
-            current_job_log.unlink()
         return {"error": "No job currently running", "type": "none"}
 
 
@@ -176,13 +237,120 @@ def get_basename(path_str: str) -> str:
     return Path(path_str).name
 
 
+# Newest jobs included in the snapshot
+SNAPSHOT_JOBS_LIMIT = 1000
+# Seconds between checks of whether the snapshot is outdated
+SNAPSHOT_POLL_INTERVAL = 1.0
+
+_snapshot: Optional[Dict] = None
+_snapshot_signature: Optional[tuple] = None
+_snapshot_version = 0
+_snapshot_task: Optional[asyncio.Task] = None
+
+
+def _get_snapshot_signature() -> tuple:
+    """Cheap fingerprint of what the snapshot is built from: DB, GPU lock & job runner logs"""
+    try:
+        lock_mtime = Path(LockFileUtils.GPU_LOCK_FILE).stat().st_mtime_ns
+    except FileNotFoundError:
+        lock_mtime = None
+
+    log_sizes = []
+    log_dir = configSetup.get_log_dir() / "job_runner"
+    if log_dir.exists():
+        for log_file in log_dir.glob("JR_*.log"):
+            try:
+                log_sizes.append((log_file.name, log_file.stat().st_size))
+            except FileNotFoundError:
+                continue
+
+    return QUEUE.get_change_count(), lock_mtime, tuple(sorted(log_sizes))
+
+
+def _build_snapshot(version: int) -> Dict:
+    """Read everything the dashboard displays"""
+    return {
+        "version": version,
+        "jobs": [
+            format_job(job) for job in QUEUE.query_jobs(limit=SNAPSHOT_JOBS_LIMIT)
+        ],
+        "counts": QUEUE.count_jobs_by_status(),
+        "job_arrays": [format_job_array(a) for a in QUEUE.get_job_arrays()],
+        "gpu_status": read_gpu_status(),
+        "current_job": get_current_job_output(),
+        "job_runner_log": list_job_runner_logs(),
+    }
+
+
+async def refresh_snapshot() -> None:
+    """Rebuild the snapshot, only if the DB, the GPU lock or the logs changed"""
+    global _snapshot, _snapshot_signature, _snapshot_version
+    signature = await DB.run(_get_snapshot_signature)
+    if _snapshot is not None and signature == _snapshot_signature:
+        return
+    snapshot = await DB.run(_build_snapshot, _snapshot_version + 1)
+    _snapshot, _snapshot_signature = snapshot, signature
+    _snapshot_version += 1
+
+
+async def _refresh_snapshot_periodically() -> None:
+    while True:
+        try:
+            await refresh_snapshot()
+        except Exception as e:
+            print(f"SQLJobScheduler NOTE: Failed to refresh dashboard snapshot: {e}")
+        await asyncio.sleep(SNAPSHOT_POLL_INTERVAL)
+
+
+async def start_snapshot_refresh():
+    global _snapshot_task
+    _snapshot_task = asyncio.create_task(_refresh_snapshot_periodically())
+
+
+async def precompress_frontend():
+    """Write .gz/.br variants of the built frontend once, instead of per request"""
+    try:
+        await asyncio.to_thread(precompress_dir, TSX_OUTPUT_DIR)
+    except OSError as e:
+        print(f"SQLJobScheduler NOTE: Could not precompress frontend assets: {e}")
+
+
+async def stop_snapshot_refresh():
+    if _snapshot_task is not None:
+        _snapshot_task.cancel()
+    DB.shutdown(wait=False)
+
+
+@app.exception_handler(DBBusyError)
+async def db_busy_handler(request: Request, e: DBBusyError):
+    return JSONResponse(status_code=503, content={"detail": str(e)})
+
+
+async def get_snapshot() -> Dict:
+    """Get the cached snapshot, kept up to date by the background refresh task"""
+    try:
+        if _snapshot is None or _snapshot_task is None or _snapshot_task.done():
+            await refresh_snapshot()
+        return _snapshot
+    except DBBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error building snapshot: {str(e)}"
+        )
+
+
 @app.get("/")
-async def read_root():
-    return FileResponse(str(TSX_OUTPUT_DIR / "index.html"))
+async def read_root(request: Request):
+    index_file = str(TSX_OUTPUT_DIR / "index.html")
+    headers = {"Cache-Control": "no-cache"}
+    response = get_precompressed_response(
+        index_file, request.scope, media_type="text/html", headers=headers
+    )
+    return response or FileResponse(index_file, headers=headers)
 
 
-@app.get("/api/gpu-status")
-async def get_gpu_status():
+def read_gpu_status() -> dict:
     if LockFileUtils.check_gpu_lock_file():
         lock_info = LockFileUtils.get_current_gpu_job(verbose=False)
         if lock_info:
@@ -198,6 +366,11 @@ async def get_gpu_status():
     return {"status": "available"}
 
 
+@app.get("/api/gpu-status")
+async def get_gpu_status():
+    return (await get_snapshot())["gpu_status"]
+
+
 def mask_email(email: str) -> str:
     """Mask an email address for privacy.
     Example: 'ahuro12293@gmail.com' -> 'a********@gmail.com'
@@ -214,74 +387,382 @@ def mask_email(email: str) -> str:
     return f"{masked_local}@{domain}"
 
 
-@app.get("/api/jobs")
-async def get_jobs():
-    def _prepare_params4display(parameters: dict) -> str:
-        # Create a copy of parameters to avoid modifying the original
-        masked_params = parameters.copy()
+def prepare_params4display(parameters: dict) -> str:
+    # Create a copy of parameters to avoid modifying the original
+    masked_params = parameters.copy()
+
+    if "path" in masked_params.keys():
+        masked_params["path"] = shorten_path(masked_params["path"], parts=2)
+
+    # Remove email from parameters
+    if "email" in masked_params.keys():
+        del masked_params["email"]
 
-        if "path" in masked_params.keys():
-            masked_params["path"] = shorten_path(masked_params["path"], parts=2)
+    # Prettify the output using pprint
+    return json.dumps(masked_params, indent=0)
+
+
+def format_job(job: JobManager.Job) -> dict:
+    """Format a job for display"""
+    return {
+        "id": f"{job.id:05d}",
+        "program": get_basename(job.programPath).replace(".py", ""),
+        "python_exec": shorten_path(job.path2python_exec),
+        "array": f"{job.array_id:05d}[{job.array_task}]"
+        if job.array_id is not None
+        else "-",
+        "user": job.user,
+        "email": mask_email(job.email_address),
+        "status": job.status.value,
+        "created": job.created_at.strftime("%Y-%m-%d %H:%M"),
+        "started": job.started_at.strftime("%Y-%m-%d %H:%M") if job.started_at else "-",
+        "completed": job.completed_at.strftime("%Y-%m-%d %H:%M")
+        if job.completed_at
+        else "-",
+        "parameters": prepare_params4display(job.parameters),
+        "error": (job.error_message[:50] + "...")
+        if job.error_message and len(job.error_message) > 50
+        else job.error_message or "-",
+    }
 
-        # Remove email from parameters
-        if "email" in masked_params.keys():
-            del masked_params["email"]
 
-        # Prettify the output using pprint
-        return json.dumps(masked_params, indent=0)
+async def _get_etag(request: Request, *extra: str) -> str:
+    """Strong ETag for the current state of the DB, the query of the request & `extra`"""
+    query_hash = hashlib.sha1(
+        str((sorted(request.query_params.multi_items()), extra)).encode()
+    ).hexdigest()[:12]
+    return f'"{ETAG_PREFIX}-{await DB.get_change_count()}-{query_hash}"'
 
+
+@app.get("/api/snapshot")
+async def get_dashboard_snapshot(request: Request):
+    """Everything the dashboard displays in one response
+
+    Jobs (newest first, up to SNAPSHOT_JOBS_LIMIT), job counts per status, job arrays, GPU
+    status, current job and the list of job runner logs. The snapshot is shared by all
+    clients and only rebuilt when the DB, the GPU lock file or a job runner log changes.
+    Unchanged polls with `If-None-Match` get a `304`.
+    """
+    snapshot = await get_snapshot()
+    etag = f'"{ETAG_PREFIX}-s{snapshot["version"]}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=snapshot, headers=headers)
+
+
+@app.get("/api/jobs")
+async def get_jobs(
+    request: Request,
+    status: Optional[JobManager.JobStatus] = None,
+    user: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    """List jobs, newest first
+
+    Filter by status, user, creation date range (end date inclusive) and parameter values
+    (`param.<key>=<value>`, values parsed as JSON if valid). With `limit`, the response
+    is one page and the `X-Next-Cursor` header holds the cursor for the next page.
+    Responses carry an ETag, and unchanged polls with `If-None-Match` get a `304`.
+    """
     try:
-        queue = JobManager.JobQueue(DB_PATH)
-        jobs = queue.get_all_jobs()
-        if not jobs:
-            return []
-
-        jobs_data = [
-            {
-                "id": f"{job.id:05d}",
-                "program": get_basename(job.programPath).replace(".py", ""),
-                "python_exec": shorten_path(job.path2python_exec),
-                "user": job.user,
-                "email": mask_email(job.email_address),
-                "status": job.status.value,
-                "created": job.created_at.strftime("%Y-%m-%d %H:%M"),
-                "started": job.started_at.strftime("%Y-%m-%d %H:%M")
-                if job.started_at
-                else "-",
-                "completed": job.completed_at.strftime("%Y-%m-%d %H:%M")
-                if job.completed_at
-                else "-",
-                "parameters": _prepare_params4display(job.parameters),
-                "error": (job.error_message[:50] + "...")
-                if job.error_message and len(job.error_message) > 50
-                else job.error_message or "-",
-            }
-            for job in jobs
-        ]
+        etag = await _get_etag(request)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        jobs = await DB.query_jobs(
+            status=status,
+            user=user,
+            since=datetime.combine(start_date, datetime.min.time())
+            if start_date
+            else None,
+            until=datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+            if end_date
+            else None,
+            limit=limit,
+            cursor=cursor,
+            params={
+                key[len("param.") :]: JobManager.parse_param_value(value)
+                for key, value in request.query_params.items()
+                if key.startswith("param.")
+            },
+        )
+        if limit is not None and len(jobs) == limit:
+            headers["X-Next-Cursor"] = JobManager.JobQueue.encode_cursor(jobs[-1])
+
+        jobs_data = [format_job(job) for job in jobs]
 
-        return jobs_data
+        return JSONResponse(content=jobs_data, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+    except DBBusyError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching jobs: {str(e)}")
 
 
-@app.get("/api/job-runner-log")
-async def get_job_runner_log():
+def format_job_array(job_array: JobManager.JobArray) -> dict:
+    """Format a job array & the progress of its tasks for display"""
+    return {
+        "id": f"{job_array.id:05d}",
+        "program": get_basename(job_array.programPath).replace(".py", ""),
+        "user": job_array.user,
+        "created": job_array.created_at.strftime("%Y-%m-%d %H:%M"),
+        "num_tasks": job_array.num_tasks,
+        "pending": job_array.pending,
+        "running": job_array.running,
+        "completed": job_array.completed,
+        "failed": job_array.failed,
+        "progress": round(job_array.progress * 100, 1),
+    }
+
+
+SUBMISSION_SETTINGS = get_submission_settings()
+SUBMISSION_RATE_LIMITER = RateLimiter(SUBMISSION_SETTINGS["rate_limit_jobs_per_minute"])
+NDJSON_CONTENT_TYPES = (
+    "application/x-ndjson",
+    "application/ndjson",
+    "application/jsonl",
+)
+
+
+def _authenticate_submission(request: Request) -> str:
+    """User of the bearer token of a request"""
+    scheme, _, given = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer":
+        for token, user in SUBMISSION_SETTINGS["tokens"].items():
+            if hmac.compare_digest(token.encode(), given.encode()):
+                return user
+    raise SubmissionError(401, "Missing or invalid submission token")
+
+
+async def _add_job_batch(jobs: List[dict], user: str, job_ids: List[int]) -> None:
+    """Rate limit & add a batch of validated jobs in one transaction, appending their IDs
+
+    Jobs that will be coalesced into an identical queued job add nothing, so they do not
+    count against the rate limit. If the limit is reached part way through the batch, the
+    jobs before that point are still added.
+    """
+    job_hashes = [
+        JobManager.get_job_hash(
+            job["programPath"],
+            job["path2python_exec"],
+            job["python_env"],
+            job["parameters"],
+        )
+        if job["coalesce"]
+        else None
+        for job in jobs
+    ]
+    queued = await DB.get_queued_job_hashes({h for h in job_hashes if h is not None})
+    # Index of every job that is added as a new job
+    new_jobs = []
+    for i, job_hash in enumerate(job_hashes):
+        if job_hash is None or job_hash not in queued:
+            new_jobs.append(i)
+            if job_hash is not None:
+                queued.add(job_hash)
+
+    granted, retry_after = SUBMISSION_RATE_LIMITER.acquire(user, len(new_jobs))
+    num_allowed = new_jobs[granted] if granted < len(new_jobs) else len(jobs)
+    if num_allowed:
+        job_ids += await DB.add_jobs(jobs[:num_allowed])
+    if retry_after:
+        raise SubmissionError(
+            429,
+            f"Rate limit of {SUBMISSION_SETTINGS['rate_limit_jobs_per_minute']} jobs per minute exceeded for {user}. Retry in {retry_after:.0f} s.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+@app.post("/api/jobs", status_code=201)
+async def submit_jobs(request: Request):
+    """Add jobs to the queue
+
+    The body is a job object or an array of jobs (`application/json`), or one job per line
+    (`application/x-ndjson`) which is added while it streams in. Jobs are added in batched
+    transactions. On an error the response lists the IDs of the jobs already added.
+    """
+    job_ids: List[int] = []
+    try:
+        if not SUBMISSION_SETTINGS["enabled"]:
+            raise SubmissionError(
+                403, "Job submission is disabled (JOBLISTER.job_submission.enabled)"
+            )
+        if not SUBMISSION_SETTINGS["tokens"]:
+            # Without tokens any web page could make a browser submit jobs
+            raise SubmissionError(
+                403,
+                "Job submission needs at least one token (JOBLISTER.job_submission.tokens)",
+            )
+        user = _authenticate_submission(request)
+
+        content_type = request.headers.get("content-type", "").split(";")[0].strip()
+        if content_type != "application/json" and content_type not in (
+            NDJSON_CONTENT_TYPES
+        ):
+            raise SubmissionError(
+                415,
+                f"Unsupported Content-Type '{content_type}'. Use application/json or application/x-ndjson",
+            )
+
+        max_bytes = int(SUBMISSION_SETTINGS["max_request_mb"] * 1024 * 1024)
+        max_jobs = SUBMISSION_SETTINGS["max_jobs_per_request"]
+        batch_size = SUBMISSION_SETTINGS["batch_size"]
+        content_length = request.headers.get("content-length")
+        if content_length and int(content_length) > max_bytes:
+            raise SubmissionError(413, f"Request body exceeds {max_bytes} bytes")
+
+        if content_type in NDJSON_CONTENT_TYPES:
+            batch = []
+            num_jobs = 0
+            async for line_no, item in iter_ndjson(request.stream(), max_bytes):
+                num_jobs += 1
+                if num_jobs > max_jobs:
+                    raise SubmissionError(
+                        413, f"More than {max_jobs} jobs in a request"
+                    )
+                batch.append(validate_job(item, line_no, user))
+                if len(batch) >= batch_size:
+                    await _add_job_batch(batch, user, job_ids)
+                    batch = []
+            if batch:
+                await _add_job_batch(batch, user, job_ids)
+        else:
+            items = parse_json_jobs(await read_limited(request.stream(), max_bytes))
+            if len(items) > max_jobs:
+                raise SubmissionError(413, f"More than {max_jobs} jobs in a request")
+            # Validate every job before adding any
+            jobs = [validate_job(item, i, user) for i, item in enumerate(items)]
+            for start in range(0, len(jobs), batch_size):
+                await _add_job_batch(jobs[start : start + batch_size], user, job_ids)
+
+        return JSONResponse(status_code=201, content={"job_ids": job_ids})
+    except SubmissionError as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": e.detail, "job_ids": job_ids},
+            headers=e.headers,
+        )
+    except DBBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error adding jobs: {str(e)}")
+
+
+@app.get("/api/job-arrays")
+async def get_job_arrays():
+    return (await get_snapshot())["job_arrays"]
+
+
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    try:
+        cache_stats = await DB.get_cache_stats()
+        return {
+            **cache_stats,
+            "gpu_hours_saved": round(cache_stats["gpu_seconds_saved"] / 3600, 2),
+        }
+    except DBBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error fetching cache stats: {str(e)}"
+        )
+
+
+@app.get("/api/stats")
+async def get_stats(
+    request: Request,
+    days: Optional[int] = Query(None, ge=1),
+    bucket: JobManager.StatsBucket = JobManager.StatsBucket.HOUR,
+):
+    """Queue analytics over the last `days` (all of history by default)
+
+    Throughput per hour or day, queue wait & run time percentiles, failure rates per
+    program & user and the current backlog, all computed in SQL.
+    """
+    try:
+        # The backlog age & the `days` window move with time, even when the DB does not
+        now = datetime.now().replace(second=0, microsecond=0)
+        etag = await _get_etag(request, now.isoformat())
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+
+        since = now - timedelta(days=days) if days is not None else None
+        stats = await DB.get_stats(since=since, bucket=bucket)
+        return JSONResponse(content=stats, headers=headers)
+    except DBBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing stats: {str(e)}")
+
+
+@app.get("/api/search")
+async def search(
+    q: str = Query(..., min_length=1), limit: int = Query(50, ge=1, le=500)
+):
+    """Full-text search over job programs, parameters, errors, tmux logs & JobRunner logs"""
+    try:
+        return {"query": q, "results": await DB.search(q, limit=limit)}
+    except DBBusyError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching: {str(e)}")
+
+
+def list_job_runner_logs() -> Optional[dict]:
+    """List the job runner logs (names, sizes & dates), None if there are none"""
     log_files = _get_job_runner_logs()  # Already sorted by date
     if not log_files:
-        raise HTTPException(status_code=404, detail="No log files found")
+        return None
 
     # Get the dates for all available logs
     dates = _get_job_runner_log_dates()
 
     return {
         "log_files": [log_file.name for log_file in log_files],
-        "content": [read_output_file(log_file) for log_file in log_files],
-        "availableDates": dates,
+        "sizes": [log_file.stat().st_size for log_file in log_files],
+        "availableDates": [log_date.isoformat() for log_date in dates],
     }
 
 
+@app.get("/api/job-runner-log")
+async def get_job_runner_log():
+    """List the job runner logs (names, sizes & dates) without their content"""
+    job_runner_log = (await get_snapshot())["job_runner_log"]
+    if job_runner_log is None:
+        raise HTTPException(status_code=404, detail="No log files found")
+    return job_runner_log
+
+
+@app.get("/api/job-runner-log/{log_date}")
+async def tail_job_runner_log(log_date: date, offset: int = Query(0, ge=0)):
+    """Get the content of the job runner log of a date appended since `offset` bytes
+
+    Poll with the returned `next_offset` to only receive new lines.
+    """
+    log_file = (
+        configSetup.get_log_dir()
+        / "job_runner"
+        / f"JR_{log_date.strftime('%Y%m%d')}.log"
+    )
+    try:
+        chunk = await asyncio.to_thread(read_file_from_offset, log_file, offset)
+        return {"log_file": log_file.name, **chunk}
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"No log file for {log_date}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error reading log: {str(e)}")
+
+
 @app.delete("/api/remove_job_logs")
-async def remove_job_logs():
+def remove_job_logs():
     try:
         log_files = _get_job_runner_logs()
         today = datetime.now().date()
@@ -322,7 +803,45 @@ async def remove_job_logs():
 
 @app.get("/api/current-job")
 async def get_current_job():
-    return await get_current_job_output()
+    return (await get_snapshot())["current_job"]
+
+
+def _format_sse(batch: Optional[List[tuple]]) -> str:
+    if batch is None:
+        return ": keepalive\n\n"
+    data = "".join(f"data: {line}\n" for _, line in batch)
+    return f"id: {batch[-1][0]}\n{data}\n"
+
+
+@app.get("/api/jobs/{job_id}/output/stream")
+async def stream_job_output(job_id: int, request: Request):
+    """Stream the output of a job as Server-Sent Events
+
+    Each event carries the new lines of output (one `data:` field per line) and the byte
+    offset in the output file after its last line as id, so a reconnecting EventSource
+    (which sends `Last-Event-ID`) only gets the lines it missed. An `end` event is sent
+    once the job finished.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    after_offset = (
+        int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    )
+    stream = OUTPUT_HUB.get_stream(job_id, after_offset)
+
+    async def events():
+        try:
+            yield "retry: 5000\n\n"
+            async for batch in stream.subscribe(after_offset):
+                yield _format_sse(batch)
+            yield "event: end\ndata: \n\n"
+        finally:
+            OUTPUT_HUB.release(job_id)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 if __name__ == "__main__":
@@ -1,8 +1,10 @@
 import base64
 import os
+import sqlite3
 import subprocess
-from datetime import datetime
+from datetime import datetime, time, timedelta
 from pathlib import Path
+from typing import Optional
 
 import altair as alt
 import pandas as pd
@@ -12,26 +14,122 @@ from sqljobscheduler import JobManager, configSetup
 from sqljobscheduler.LockFileUtils import check_gpu_lock_file, get_current_gpu_job
 
 
-def create_gpu_usage_chart(jobs_df):
-    """Create a timeline chart of GPU usage"""
-    # Filter for jobs that have both start and end times
-    usage_df = jobs_df[jobs_df["Started"] != "-"].copy()
-    usage_df["Started"] = pd.to_datetime(usage_df["Started"])
-    usage_df["Completed"] = pd.to_datetime(usage_df["Completed"].replace("-", pd.NaT))
+# The timeline shows at most this many time bins, whatever the visible range
+MAX_TIMELINE_BINS = 500
+MIN_TIMELINE_RESOLUTION = pd.Timedelta(minutes=1)
 
-    # For running jobs, use current time as end
-    usage_df.loc[usage_df["Completed"].isna(), "Completed"] = pd.Timestamp.now()
 
-    # Create timeline chart
+def get_timeline_resolution(start: pd.Timestamp, end: pd.Timestamp) -> pd.Timedelta:
+    """Bin size showing the visible range in at most MAX_TIMELINE_BINS bins"""
+    return max(MIN_TIMELINE_RESOLUTION, (end - start) / MAX_TIMELINE_BINS).ceil("min")
+
+
+def merge_usage_intervals(
+    usage_df: pd.DataFrame, resolution: pd.Timedelta
+) -> pd.DataFrame:
+    """Snap job intervals to bins of `resolution` and merge overlapping ones per user
+
+    Args:
+        usage_df (pd.DataFrame): One row per job with User, Program, Status, Started &
+            Completed
+        resolution (pd.Timedelta): Bin size. Jobs less than a bin apart become one bar.
+
+    Returns:
+        pd.DataFrame: One row per merged interval with User, Started, Completed, Jobs,
+            Failed & Programs
+    """
+    if usage_df.empty:
+        return pd.DataFrame(
+            columns=["User", "Started", "Completed", "Jobs", "Failed", "Programs"]
+        )
+    df = usage_df.assign(
+        Started=usage_df["Started"].dt.floor(resolution),
+        Completed=usage_df["Completed"].dt.ceil(resolution),
+        User=usage_df["User"].fillna("-"),
+    ).sort_values(["User", "Started"])
+
+    # An interval starts a new bar if it begins after every earlier interval of its user ended
+    latest_end = df.groupby("User")["Completed"].cummax()
+    previous_end = latest_end.groupby(df["User"]).shift()
+    bar = (previous_end.isna() | (df["Started"] > previous_end)).cumsum()
+
+    return (
+        df.groupby(bar)
+        .agg(
+            User=("User", "first"),
+            Started=("Started", "min"),
+            Completed=("Completed", "max"),
+            Jobs=("Status", "size"),
+            Failed=("Status", lambda status: int((status == "failed").sum())),
+            Programs=("Program", lambda programs: ", ".join(programs.unique()[:3])),
+        )
+        .reset_index(drop=True)
+    )
+
+
+@st.cache_data(max_entries=32)
+def load_gpu_timeline(
+    db_path: str, change_count: int, start: pd.Timestamp, end: pd.Timestamp
+) -> pd.DataFrame:
+    """Merged GPU usage intervals of the jobs that ran between `start` & `end`
+
+    Only jobs overlapping the visible range are read, and they are binned to a resolution
+    of the range, so zooming in re-queries the range at more detail.
+    """
+    with sqlite3.connect(db_path) as conn:
+        usage_df = pd.read_sql(
+            """
+            SELECT user AS User, programPath AS Program, status AS Status,
+                   datetime(started_at / 1000000, 'unixepoch', 'localtime') AS Started,
+                   datetime(completed_at / 1000000, 'unixepoch', 'localtime') AS Completed
+            FROM jobs
+            WHERE started_at < ? AND reused_from IS NULL
+              AND (completed_at >= ? OR status = ?)
+            """,
+            conn,
+            params=(
+                JobManager.to_epoch_us(end.to_pydatetime()),
+                JobManager.to_epoch_us(start.to_pydatetime()),
+                JobManager.JobStatus.RUNNING.value,
+            ),
+        )
+    usage_df["Started"] = pd.to_datetime(usage_df["Started"], errors="coerce")
+    usage_df["Completed"] = pd.to_datetime(usage_df["Completed"], errors="coerce")
+    # Running jobs last until now
+    usage_df["Completed"] = usage_df["Completed"].fillna(pd.Timestamp.now())
+    usage_df = usage_df.dropna(subset=["Started"])
+    usage_df["Started"] = usage_df["Started"].clip(lower=start)
+    usage_df["Completed"] = usage_df["Completed"].clip(upper=end)
+    usage_df["Program"] = (
+        usage_df["Program"]
+        .str.rsplit("/", n=1)
+        .str[-1]
+        .str.replace(".py", "", regex=False)
+    )
+    return merge_usage_intervals(usage_df, get_timeline_resolution(start, end))
+
+
+@st.cache_data
+def get_first_job_start(db_path: str, change_count: int) -> Optional[pd.Timestamp]:
+    """Creation time of the first job that ran (indexed, unlike started_at)"""
+    with sqlite3.connect(db_path) as conn:
+        first = conn.execute(
+            "SELECT MIN(created_at) FROM jobs WHERE started_at IS NOT NULL"
+        ).fetchone()[0]
+    return pd.Timestamp(JobManager.from_epoch_us(first)) if first else None
+
+
+def create_gpu_usage_chart(timeline_df: pd.DataFrame):
+    """Create a timeline chart of GPU usage from merged intervals (see load_gpu_timeline)"""
     chart = (
-        alt.Chart(usage_df)
+        alt.Chart(timeline_df)
         .mark_bar()
         .encode(
             x="Started",
             x2="Completed",
             y="User",
-            color="Status",
-            tooltip=["Program", "User", "Started", "Completed", "Status"],
+            color=alt.Color("Failed:Q", scale=alt.Scale(scheme="orangered")),
+            tooltip=["User", "Started", "Completed", "Jobs", "Failed", "Programs"],
         )
         .properties(height=200, title="GPU Usage Timeline")
     )
@@ -39,6 +137,36 @@ def create_gpu_usage_chart(jobs_df):
     return chart
 
 
+def display_gpu_timeline(db_path: str, change_count: int):
+    """GPU usage timeline of a range picked with a slider, re-queried when it changes"""
+    st.divider()
+    st.subheader("GPU Usage Timeline")
+    first_start = get_first_job_start(db_path, change_count)
+    if first_start is None:
+        st.info("No jobs have run yet")
+        return
+
+    now = pd.Timestamp.now().ceil("h")
+    first_start = min(first_start.floor("h"), now - pd.Timedelta(hours=1))
+    start, end = st.slider(
+        "Visible range",
+        min_value=first_start.to_pydatetime(),
+        max_value=now.to_pydatetime(),
+        value=(
+            max(first_start, now - pd.Timedelta(days=7)).to_pydatetime(),
+            now.to_pydatetime(),
+        ),
+        step=timedelta(hours=1),
+        format="YYYY-MM-DD HH:mm",
+    )
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    timeline_df = load_gpu_timeline(db_path, change_count, start, end)
+    st.caption(
+        f"{len(timeline_df)} bars at a resolution of {get_timeline_resolution(start, end)}"
+    )
+    st.altair_chart(create_gpu_usage_chart(timeline_df), use_container_width=True)
+
+
 def get_current_time():
     return datetime.now().strftime("%m/%d/%Y %H:%M")
 
@@ -124,6 +252,67 @@ def display_curr_job_tmux_output():
         st.warning("No job currently running")
 
 
+@st.cache_resource
+def get_queue(db_path: str) -> JobManager.JobQueue:
+    """Queue shared by all sessions, so its change count tracks the database across reruns"""
+    return JobManager.JobQueue(db_path)
+
+
+@st.cache_data(max_entries=16)
+def load_jobs_df(db_path: str, change_count: int, day: str) -> pd.DataFrame:
+    """Load the pending jobs & the jobs created on `day` as a display-ready DataFrame
+
+    Filtering happens in SQL and formatting on whole columns. `change_count` (see
+    JobQueue.get_change_count) is only part of the cache key: reruns & other sessions
+    reuse the DataFrame until the database changes.
+    """
+    day_start = datetime.combine(datetime.fromisoformat(day).date(), time())
+    with sqlite3.connect(db_path) as conn:
+        df = pd.read_sql(
+            """
+            SELECT id, programPath, path2python_exec, user, email_address, status,
+                   strftime('%Y-%m-%d %H:%M', created_at / 1000000, 'unixepoch', 'localtime')
+                       AS created_at,
+                   strftime('%Y-%m-%d %H:%M', started_at / 1000000, 'unixepoch', 'localtime')
+                       AS started_at,
+                   strftime('%Y-%m-%d %H:%M', completed_at / 1000000, 'unixepoch', 'localtime')
+                       AS completed_at,
+                   error_message
+            FROM jobs
+            WHERE status = ? OR jobs.created_at >= ?
+            ORDER BY jobs.created_at DESC
+            """,
+            conn,
+            params=(
+                JobManager.JobStatus.PENDING.value,
+                JobManager.to_epoch_us(day_start),
+            ),
+        )
+
+    error = df["error_message"].fillna("")
+    return pd.DataFrame(
+        {
+            "ID": df["id"].astype(str).str.zfill(5),
+            "Program": df["programPath"]
+            .str.rsplit("/", n=1)
+            .str[-1]
+            .str.replace(".py", "", regex=False),
+            # Last 3 parts of the path, as shorten_path
+            "Python Exec": df["path2python_exec"].str.split("/").str[-3:].str.join("/"),
+            "User": df["user"],
+            "Email": df["email_address"],
+            "Status": df["status"],
+            # Formatted by SQLite, as the timestamps are epoch microseconds
+            "Created": df["created_at"].fillna("-"),
+            "Started": df["started_at"].fillna("-"),
+            "Completed": df["completed_at"].fillna("-"),
+            "Error": error.where(error.str.len() <= 50, error.str[:50] + "...").replace(
+                "", "-"
+            ),
+        }
+    )
+
+
 def shorten_path(path_str: str, parts: int = 3) -> str:
     """Shorten a path to show only the last N parts"""
     return str(Path(*Path(path_str).parts[-parts:]))
@@ -217,60 +406,20 @@ def main():
     gpu_status_sidebar()
 
     # Initialize queue
-    db_path = "/mnt/EnvsDrive/scripts_dev/SQLJobScheduler/queueDB/analysis_jobs.db"
-    queue = JobManager.JobQueue(db_path)
+    db_path = str(configSetup.get_queue_db_path())
+    queue = get_queue(db_path)
 
     st.subheader("Job Queue")
 
-    # Get all jobs and convert to DataFrame
-    jobs = queue.get_all_jobs()
-    if not jobs:
-        st.error("No jobs found in the database.")
-        return
-
-    today = datetime.now()
-
-    filtered_jobs = [
-        job
-        for job in jobs
-        if job.status == JobManager.JobStatus.PENDING
-        or job.created_at.date() == today.date()
-    ]
-
-    if not filtered_jobs:
+    change_count = queue.get_change_count()
+    df = load_jobs_df(db_path, change_count, datetime.now().date().isoformat())
+    if df.empty:
         st.info("No pending jobs found")
+        display_gpu_timeline(db_path, change_count)
         display_log_window()
         display_curr_job_tmux_output()
         return
 
-    df = pd.DataFrame(
-        [
-            {
-                "ID": f"{job.id:05d}",
-                "Program": get_basename(job.programPath).replace(".py", ""),
-                "Python Exec": shorten_path(job.path2python_exec),
-                "User": job.user,
-                "Email": job.email_address,
-                "Status": job.status.value,
-                "Created": job.created_at.strftime("%Y-%m-%d %H:%M"),
-                "Started": job.started_at.strftime("%Y-%m-%d %H:%M")
-                if job.started_at
-                else "-",
-                "Completed": job.completed_at.strftime("%Y-%m-%d %H:%M")
-                if job.completed_at
-                else "-",
-                "Error": (job.error_message[:50] + "...")
-                if job.error_message and len(job.error_message) > 50
-                else job.error_message or "-",
-            }
-            for job in jobs
-            if (
-                job.status == JobManager.JobStatus.PENDING
-                or job.created_at.date() == today.date()
-            )
-        ]
-    )
-
     # Filters
     status_filter = st.multiselect("Filter by Status", options=df["Status"].unique())
 
@@ -281,6 +430,8 @@ def main():
     # Display table
     st.dataframe(df, hide_index=True, use_container_width=True)
 
+    display_gpu_timeline(db_path, change_count)
+
     # Display Job Runner Log
     display_log_window()
     # Display Current Job Output
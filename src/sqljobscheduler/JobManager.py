@@ -1,16 +1,22 @@
+import base64
+import hashlib
 import json
+import math
 import os
+import re
 import shutil
 import sqlite3
+import threading
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import psutil
 
-from sqljobscheduler.configSetup import get_queue_db_path
+from sqljobscheduler import SearchIndex
+from sqljobscheduler.configSetup import get_log_dir, get_queue_db_path
 
 
 def get_JobRunner_pid():
@@ -19,6 +25,724 @@ def get_JobRunner_pid():
             return proc.info["pid"]
 
 
+def get_job_hash(
+    programPath: str,
+    path2python_exec: str,
+    python_env: Optional[str],
+    parameters: Dict,
+) -> str:
+    """Canonical hash of what a job runs: program, interpreter, env and sorted parameters"""
+    canonical = json.dumps(
+        {
+            "programPath": programPath,
+            "path2python_exec": path2python_exec,
+            "python_env": python_env,
+            "parameters": parameters,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# Files & subdirectories walked in the directories of a job's parameters before giving up
+# on result reuse
+MAX_FINGERPRINT_FILES = 10000
+
+
+def get_input_fingerprint(parameters: Dict) -> Optional[str]:
+    """Fingerprint (path, mtime, size) of every existing file in the parameters
+
+    Directories are walked, so every file in them (and in their subdirectories) counts.
+    Returns None (not reusable) once more than MAX_FINGERPRINT_FILES files & directories
+    were found, so a parameter like `/data` does not stat a whole file system.
+    """
+
+    def _iter_values(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                yield from _iter_values(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                yield from _iter_values(item)
+        else:
+            yield value
+
+    entries = []
+    num_walked = 0
+    for value in _iter_values(parameters):
+        if not isinstance(value, str) or os.sep not in value:
+            continue
+        try:
+            stat = os.stat(value)
+        except (OSError, ValueError):
+            continue
+        if not os.path.isdir(value):
+            entries.append((value, stat.st_mtime_ns, stat.st_size))
+            continue
+        # A directory's own mtime & size do not change when a file in it is rewritten
+        entries.append((value, None, None))
+        for dir_path, dir_names, file_names in os.walk(value):
+            num_walked += len(dir_names) + len(file_names)
+            if num_walked > MAX_FINGERPRINT_FILES:
+                return None
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((file_path, stat.st_mtime_ns, stat.st_size))
+
+    return hashlib.sha256(json.dumps(sorted(entries)).encode()).hexdigest()
+
+
+def to_epoch_us(value: datetime) -> int:
+    """Microseconds since the epoch of a (naive, local) datetime, as timestamps are stored"""
+    return int(value.replace(microsecond=0).timestamp()) * 1_000_000 + value.microsecond
+
+
+def from_epoch_us(value: int) -> datetime:
+    """Naive local datetime of a stored timestamp
+
+    The float is exact to well under a microsecond until 2106, and fromtimestamp rounds to
+    the nearest microsecond, so this round-trips to_epoch_us (fold included).
+    """
+    return datetime.fromtimestamp(value / 1_000_000)
+
+
+def _decode_timestamp(value) -> Optional[datetime]:
+    """Datetime of a stored timestamp (ISO text in databases before migration 9)"""
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return from_epoch_us(value)
+
+
+def _encode_timestamp(value) -> Optional[int]:
+    return None if value is None else to_epoch_us(_decode_timestamp(value))
+
+
+def get_param_column(key: str) -> str:
+    """Name of the generated column of an indexed parameter key"""
+    if not key or '"' in key:
+        raise ValueError(f"Cannot index parameter key {key!r}")
+    return "param_" + re.sub(r"\W", "_", key)
+
+
+def _get_param_path(key: str) -> str:
+    """JSON path of a top-level parameter key, e.g. `$."session"`"""
+    return f'$."{key}"'
+
+
+def _get_param_sql_value(value: Any) -> Any:
+    """Value as json_extract returns it: lists & dicts as minified JSON, bools as 0/1"""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def parse_param_value(text: str) -> Any:
+    """Parameter value given as text (CLI, query string): JSON if valid, else the string"""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _backfill_job_hashes(conn: sqlite3.Connection) -> None:
+    """Compute job_hash for jobs added before the column existed"""
+    rows = conn.execute(
+        "SELECT id, programPath, path2python_exec, python_env, parameters FROM jobs"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE jobs SET job_hash = ? WHERE id = ?",
+        [
+            (get_job_hash(row[1], row[2], row[3], json.loads(row[4])), row[0])
+            for row in rows
+        ],
+    )
+
+
+# Histogram bins per doubling of a duration (4 keeps percentile estimates within ~10%)
+HISTOGRAM_BINS_PER_OCTAVE = 4
+
+
+def get_histogram_bin(seconds: float) -> int:
+    """Log-scale bin of a duration (durations under a second all go to bin 0)"""
+    if seconds < 1:
+        return 0
+    return int(math.log2(seconds) * HISTOGRAM_BINS_PER_OCTAVE)
+
+
+def get_histogram_bin_value(histogram_bin: int) -> float:
+    """Representative duration (seconds) of a bin: its geometric midpoint"""
+    return 2 ** ((histogram_bin + 0.5) / HISTOGRAM_BINS_PER_OCTAVE)
+
+
+def _record_rollups(
+    conn: sqlite3.Connection,
+    at: datetime,
+    user: Optional[str],
+    programPath: str,
+    submitted: int = 0,
+    started: int = 0,
+    completed: int = 0,
+    failed: int = 0,
+    wait_seconds: Optional[float] = None,
+    run_seconds: Optional[float] = None,
+) -> None:
+    """Add a job event to the hourly & daily rollups of the bucket `at` falls in
+
+    Runs on the caller's connection, so the rollups change in the same transaction as
+    the job itself.
+    """
+    for bucket, bucket_format in BUCKET_FORMATS.items():
+        key = (bucket.value, at.strftime(bucket_format), user or "", programPath)
+        conn.execute(
+            """
+            INSERT INTO job_rollups
+            (granularity, bucket, user, programPath,
+             submitted, started, completed, failed, wait_seconds, gpu_seconds)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (granularity, bucket, user, programPath) DO UPDATE SET
+                submitted = submitted + excluded.submitted,
+                started = started + excluded.started,
+                completed = completed + excluded.completed,
+                failed = failed + excluded.failed,
+                wait_seconds = wait_seconds + excluded.wait_seconds,
+                gpu_seconds = gpu_seconds + excluded.gpu_seconds
+            """,
+            (
+                *key,
+                submitted,
+                started,
+                completed,
+                failed,
+                wait_seconds or 0.0,
+                run_seconds or 0.0,
+            ),
+        )
+        for metric, seconds in (("wait", wait_seconds), ("run", run_seconds)):
+            if seconds is None:
+                continue
+            conn.execute(
+                """
+                INSERT INTO job_rollup_histograms
+                (granularity, bucket, metric, user, programPath, bin, count)
+                VALUES (?, ?, ?, ?, ?, ?, 1)
+                ON CONFLICT (granularity, bucket, metric, user, programPath, bin)
+                DO UPDATE SET count = count + 1
+                """,
+                (*key[:2], metric, *key[2:], get_histogram_bin(seconds)),
+            )
+
+
+def _backfill_rollups(conn: sqlite3.Connection, jobs_table: str = "jobs") -> None:
+    """Rebuild the rollup tables from the jobs & job arrays in the database
+
+    Args:
+        jobs_table (str, optional): Table or subquery to read the jobs from (e.g. ALL_JOBS
+            to include the archive).
+    """
+    conn.execute("DELETE FROM job_rollups")
+    conn.execute("DELETE FROM job_rollup_histograms")
+
+    rollups: Dict[tuple, List[float]] = {}
+    histograms: Dict[tuple, int] = {}
+
+    def _add(at, user, programPath, index, count=1, metric=None, seconds=None):
+        for bucket, bucket_format in BUCKET_FORMATS.items():
+            key = (bucket.value, at.strftime(bucket_format), user or "", programPath)
+            # submitted, started, completed, failed, wait_seconds, gpu_seconds
+            totals = rollups.setdefault(key, [0, 0, 0, 0, 0.0, 0.0])
+            totals[index] += count
+            if metric is not None:
+                totals[4 if metric == "wait" else 5] += seconds
+                hist_key = (*key[:2], metric, *key[2:], get_histogram_bin(seconds))
+                histograms[hist_key] = histograms.get(hist_key, 0) + 1
+
+    rows = conn.execute(
+        f"""
+        SELECT user, programPath, created_at, started_at, completed_at, status, reused_from
+        FROM {jobs_table}
+        """
+    ).fetchall()
+    for user, programPath, created_at, started_at, completed_at, status, reused in rows:
+        created_at = _decode_timestamp(created_at)
+        _add(created_at, user, programPath, 0)
+        if started_at is None:
+            continue
+        started_at = _decode_timestamp(started_at)
+        if reused is None:
+            wait_seconds = (started_at - created_at).total_seconds()
+            _add(started_at, user, programPath, 1, metric="wait", seconds=wait_seconds)
+        if completed_at is None or status not in (
+            JobStatus.COMPLETED.value,
+            JobStatus.FAILED.value,
+        ):
+            continue
+        completed_at = _decode_timestamp(completed_at)
+        index = 2 if status == JobStatus.COMPLETED.value else 3
+        if reused is None:
+            run_seconds = (completed_at - started_at).total_seconds()
+            _add(
+                completed_at,
+                user,
+                programPath,
+                index,
+                metric="run",
+                seconds=run_seconds,
+            )
+        else:
+            _add(completed_at, user, programPath, index)
+
+    # Array tasks count as submitted when the array is, even if not expanded yet
+    for user, programPath, created_at, num_unexpanded in conn.execute(
+        "SELECT user, programPath, created_at, num_tasks - next_task FROM job_arrays"
+    ).fetchall():
+        if num_unexpanded:
+            _add(
+                _decode_timestamp(created_at),
+                user,
+                programPath,
+                0,
+                count=num_unexpanded,
+            )
+
+    conn.executemany(
+        """
+        INSERT INTO job_rollups
+        (granularity, bucket, user, programPath,
+         submitted, started, completed, failed, wait_seconds, gpu_seconds)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [(*key, *totals) for key, totals in rollups.items()],
+    )
+    conn.executemany(
+        """
+        INSERT INTO job_rollup_histograms
+        (granularity, bucket, metric, user, programPath, bin, count)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        [(*key, count) for key, count in histograms.items()],
+    )
+
+
+CHANGE_SEQ_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_change_seq_insert AFTER INSERT ON jobs
+    BEGIN
+        UPDATE jobs SET change_seq = (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM jobs)
+        WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_change_seq_update AFTER UPDATE ON jobs
+    WHEN NEW.change_seq IS OLD.change_seq
+    BEGIN
+        UPDATE jobs SET change_seq = (SELECT COALESCE(MAX(change_seq), 0) + 1 FROM jobs)
+        WHERE id = NEW.id;
+    END
+    """,
+]
+
+
+def _iso_timestamp_sql(column: str, sep: str = " ") -> str:
+    """SQL showing an epoch-microsecond column as local ISO text, like before migration 9"""
+    return (
+        f"strftime('%Y-%m-%d{sep}%H:%M:%S', {column} / 1000000, 'unixepoch', 'localtime')"
+        f" || printf('.%06d', {column} % 1000000)"
+    )
+
+
+JOBS_ISO_VIEW = f"""
+    CREATE VIEW IF NOT EXISTS jobs_iso AS
+    SELECT id, programPath, python_env, path2python_exec, parameters,
+           {_iso_timestamp_sql("created_at")} AS created_at,
+           {_iso_timestamp_sql("started_at", "T")} AS started_at,
+           {_iso_timestamp_sql("completed_at", "T")} AS completed_at,
+           status, error_message, email_address, user, array_id, array_task,
+           job_hash, input_fingerprint, reused_from,
+           gpu_mem_mb, gpu_mem_peak_mb, gpu_device, change_seq
+    FROM jobs
+"""
+
+
+def _convert_timestamps_to_epoch(
+    conn: sqlite3.Connection, page_size: int = 10000
+) -> None:
+    """Rewrite the ISO text timestamps of jobs & job arrays as epoch microseconds"""
+    for table, columns in (
+        ("jobs", ("created_at", "started_at", "completed_at")),
+        ("job_arrays", ("created_at",)),
+    ):
+        select = (
+            f"SELECT id, {', '.join(columns)} FROM {table}"
+            " WHERE id > ? ORDER BY id LIMIT ?"
+        )
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        update = f"UPDATE {table} SET {assignments} WHERE id = ?"
+        last_id = 0
+        while True:
+            rows = conn.execute(select, (last_id, page_size)).fetchall()
+            if not rows:
+                break
+            conn.executemany(
+                update,
+                [
+                    (*(_encode_timestamp(value) for value in values), job_id)
+                    for job_id, *values in rows
+                ],
+            )
+            last_id = rows[-1][0]
+
+
+# Change sequence numbers drawn from a counter rather than MAX(change_seq), so they keep
+# increasing once the jobs holding the highest ones were archived
+CHANGE_SEQ_COUNTER_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_change_seq_insert AFTER INSERT ON jobs
+    BEGIN
+        UPDATE job_counters SET value = value + 1 WHERE name = 'change_seq';
+        UPDATE jobs SET change_seq = (
+            SELECT value FROM job_counters WHERE name = 'change_seq'
+        )
+        WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jobs_change_seq_update AFTER UPDATE ON jobs
+    WHEN NEW.change_seq IS OLD.change_seq
+    BEGIN
+        UPDATE job_counters SET value = value + 1 WHERE name = 'change_seq';
+        UPDATE jobs SET change_seq = (
+            SELECT value FROM job_counters WHERE name = 'change_seq'
+        )
+        WHERE id = NEW.id;
+    END
+    """,
+]
+
+
+def get_archive_path(db_path: Union[str, Path]) -> Path:
+    """Path of the archive database of a queue database (see JobQueue.archive_jobs)"""
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}_archive.db")
+
+
+def _connect_archive_readonly(conn: sqlite3.Connection) -> Optional[sqlite3.Connection]:
+    """Read-only connection to the archive of the database of `conn`, None if it has none
+
+    ATTACH is not allowed within the migration's transaction, so migrations read the
+    archive through a connection of its own.
+    """
+    db_file = next(
+        row[2] for row in conn.execute("PRAGMA database_list") if row[1] == "main"
+    )
+    if not db_file or not get_archive_path(db_file).exists():
+        return None
+    return sqlite3.connect(f"file:{get_archive_path(db_file)}?mode=ro", uri=True)
+
+
+def _get_archive_maxima(conn: sqlite3.Connection) -> Tuple[int, int]:
+    """Highest job id & change sequence number in the archive of the database of `conn`"""
+    archive = _connect_archive_readonly(conn)
+    if archive is None:
+        return 0, 0
+    try:
+        return archive.execute(
+            "SELECT COALESCE(MAX(id), 0), COALESCE(MAX(change_seq), 0) FROM jobs"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return 0, 0
+    finally:
+        archive.close()
+
+
+def _index_archived_jobs(conn: sqlite3.Connection) -> None:
+    """Add the archived jobs back to the search index (archiving used to drop them)"""
+    archive = _connect_archive_readonly(conn)
+    if archive is None:
+        return
+    try:
+        indexed = {row[0] for row in conn.execute("SELECT rowid FROM job_search")}
+        # Ids of archived jobs could be reused before migration 11; the queue's job wins
+        SearchIndex.index_jobs(
+            conn,
+            (
+                row
+                for row in archive.execute(
+                    "SELECT id, programPath, parameters, error_message FROM jobs"
+                )
+                if row[0] not in indexed
+            ),
+        )
+    except sqlite3.OperationalError:
+        pass
+    finally:
+        archive.close()
+
+
+def _rebuild_jobs_with_autoincrement(conn: sqlite3.Connection) -> None:
+    """Recreate the jobs table with AUTOINCREMENT, so the ids of archived jobs are not reused
+
+    Without it, SQLite gives new jobs the highest id in the table + 1, which once the
+    newest jobs were archived is the id of an archived job.
+    """
+    (table_sql,) = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'jobs'"
+    ).fetchone()
+    new_table_sql = re.sub(
+        r'^CREATE TABLE (IF NOT EXISTS )?"?jobs"?',
+        "CREATE TABLE jobs_new",
+        table_sql.strip(),
+        count=1,
+    )
+    new_table_sql = re.sub(
+        r"\bid INTEGER PRIMARY KEY\b",
+        "id INTEGER PRIMARY KEY AUTOINCREMENT",
+        new_table_sql,
+        count=1,
+    )
+    dependents = conn.execute(
+        """
+        SELECT sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND tbl_name = 'jobs' AND sql IS NOT NULL
+        """
+    ).fetchall()
+    # Views referencing jobs would fail the rename
+    views = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'view'"
+    ).fetchall()
+    # Generated columns (hidden 2 & 3) are computed, not copied
+    columns = ", ".join(
+        row[1] for row in conn.execute("PRAGMA table_xinfo(jobs)") if row[6] == 0
+    )
+
+    for name, _ in views:
+        conn.execute(f'DROP VIEW "{name}"')
+    conn.execute(new_table_sql)
+    conn.execute(f"INSERT INTO jobs_new ({columns}) SELECT {columns} FROM jobs")
+    conn.execute("DROP TABLE jobs")
+    conn.execute("ALTER TABLE jobs_new RENAME TO jobs")
+    for (sql,) in dependents:
+        conn.execute(sql)
+    for _, sql in views:
+        conn.execute(sql)
+
+    max_id = max(
+        conn.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0],
+        _get_archive_maxima(conn)[0],
+    )
+    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'jobs'")
+    conn.execute(
+        "INSERT INTO sqlite_sequence (name, seq) VALUES ('jobs', ?)", (max_id,)
+    )
+
+
+def _seed_change_seq_counter(conn: sqlite3.Connection) -> None:
+    max_change_seq = max(
+        conn.execute("SELECT COALESCE(MAX(change_seq), 0) FROM jobs").fetchone()[0],
+        _get_archive_maxima(conn)[1],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO job_counters (name, value) VALUES ('change_seq', ?)",
+        (max_change_seq,),
+    )
+
+
+# Schema migrations applied in order on top of the initial jobs table. Migration N (1-based)
+# brings the database to schema version N, which is stored in PRAGMA user_version. Each step
+# is either a SQL statement or a callable taking the connection.
+MIGRATIONS: List[List[Union[str, Callable[[sqlite3.Connection], None]]]] = [
+    # 1: job arrays
+    [
+        """
+        CREATE TABLE IF NOT EXISTS job_arrays (
+            id INTEGER PRIMARY KEY,
+            programPath TEXT NOT NULL,
+            python_env TEXT,
+            path2python_exec TEXT NOT NULL,
+            parameters TEXT NOT NULL,
+            grid TEXT NOT NULL,
+            num_tasks INTEGER NOT NULL,
+            next_task INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL,
+            email_address TEXT,
+            user TEXT
+        )
+        """,
+        "ALTER TABLE jobs ADD COLUMN array_id INTEGER REFERENCES job_arrays(id)",
+        "ALTER TABLE jobs ADD COLUMN array_task INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_array ON jobs (array_id, array_task)",
+    ],
+    # 2: content-addressed deduplication and result reuse
+    [
+        "ALTER TABLE jobs ADD COLUMN job_hash TEXT",
+        "ALTER TABLE jobs ADD COLUMN input_fingerprint TEXT",
+        "ALTER TABLE jobs ADD COLUMN reused_from INTEGER REFERENCES jobs(id)",
+        _backfill_job_hashes,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_hash ON jobs (job_hash, status)",
+    ],
+    # 3: GPU memory footprints for packing jobs onto GPUs
+    [
+        "ALTER TABLE jobs ADD COLUMN gpu_mem_mb INTEGER",
+        "ALTER TABLE jobs ADD COLUMN gpu_mem_peak_mb INTEGER",
+        "ALTER TABLE jobs ADD COLUMN gpu_device TEXT",
+        "ALTER TABLE job_arrays ADD COLUMN gpu_mem_mb INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_program ON jobs (programPath, status)",
+    ],
+    # 4: keyset pagination & filtering of job listings
+    [
+        "CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_user_created ON jobs (user, created_at, id)",
+    ],
+    # 5: queue analytics over finished jobs
+    [
+        "CREATE INDEX IF NOT EXISTS idx_jobs_completed ON jobs (completed_at, status)",
+    ],
+    # 6: hourly & daily rollups of job metrics, kept up to date on every status change
+    [
+        """
+        CREATE TABLE IF NOT EXISTS job_rollups (
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            user TEXT NOT NULL,
+            programPath TEXT NOT NULL,
+            submitted INTEGER NOT NULL DEFAULT 0,
+            started INTEGER NOT NULL DEFAULT 0,
+            completed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            wait_seconds REAL NOT NULL DEFAULT 0,
+            gpu_seconds REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (granularity, bucket, user, programPath)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS job_rollup_histograms (
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            metric TEXT NOT NULL,
+            user TEXT NOT NULL,
+            programPath TEXT NOT NULL,
+            bin INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (granularity, bucket, metric, user, programPath, bin)
+        ) WITHOUT ROWID
+        """,
+        _backfill_rollups,
+    ],
+    # 7: full-text search over jobs & logs
+    [*SearchIndex.SCHEMA, SearchIndex.backfill_jobs],
+    # 8: change sequence numbers, so watchers can query only the jobs changed since they
+    # last looked. Set by triggers for every writer; the WHEN clause stops recursion.
+    [
+        "ALTER TABLE jobs ADD COLUMN change_seq INTEGER",
+        "UPDATE jobs SET change_seq = id",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_change_seq ON jobs (change_seq)",
+        *CHANGE_SEQ_TRIGGERS,
+    ],
+    # 9: timestamps as integer microseconds since the epoch, with the view `jobs_iso`
+    # showing them as text for ad-hoc SQL
+    [
+        "DROP TRIGGER IF EXISTS jobs_change_seq_insert",
+        "DROP TRIGGER IF EXISTS jobs_change_seq_update",
+        _convert_timestamps_to_epoch,
+        *CHANGE_SEQ_TRIGGERS,
+        JOBS_ISO_VIEW,
+    ],
+    # 10: parameter keys indexed as generated columns (see JobQueue.add_param_index)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS param_indexes (
+            key TEXT PRIMARY KEY,
+            column_name TEXT NOT NULL UNIQUE
+        )
+        """,
+    ],
+    # 11: job ids & change sequence numbers that are never reused, also once the jobs
+    # holding the highest ones were archived
+    [
+        "DROP TRIGGER IF EXISTS jobs_change_seq_insert",
+        "DROP TRIGGER IF EXISTS jobs_change_seq_update",
+        _rebuild_jobs_with_autoincrement,
+        """
+        CREATE TABLE IF NOT EXISTS job_counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )
+        """,
+        _seed_change_seq_counter,
+        *CHANGE_SEQ_COUNTER_TRIGGERS,
+    ],
+    # 12: full-text search over archived jobs as well
+    [_index_archived_jobs],
+    # 13: only jobs added with reuse_results get their inputs fingerprinted
+    ["ALTER TABLE jobs ADD COLUMN reuse_results INTEGER NOT NULL DEFAULT 0"],
+]
+
+# Percentiles of queue wait & run time reported by get_stats
+STATS_PERCENTILES = (50, 90, 99)
+
+JOB_COLUMNS = """
+    id, programPath, path2python_exec, parameters,
+    created_at, started_at, completed_at,
+    status, error_message, email_address, user, python_env,
+    array_id, array_task, job_hash, reused_from,
+    gpu_mem_mb, gpu_mem_peak_mb, gpu_device
+"""
+# Every column of the jobs table, as copied into the archive
+ARCHIVE_COLUMNS = f"{JOB_COLUMNS.rstrip()}, input_fingerprint, change_seq"
+
+# Finished jobs older than the retention period are moved into this database, attached as
+# `archive` (see JobQueue.archive_jobs)
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.jobs (
+        id INTEGER PRIMARY KEY,
+        programPath TEXT NOT NULL,
+        path2python_exec TEXT NOT NULL,
+        parameters TEXT NOT NULL,
+        created_at INTEGER NOT NULL,
+        started_at INTEGER,
+        completed_at INTEGER,
+        status TEXT NOT NULL,
+        error_message TEXT,
+        email_address TEXT,
+        user TEXT,
+        python_env TEXT,
+        array_id INTEGER,
+        array_task INTEGER,
+        job_hash TEXT,
+        reused_from INTEGER,
+        gpu_mem_mb INTEGER,
+        gpu_mem_peak_mb INTEGER,
+        gpu_device TEXT,
+        input_fingerprint TEXT,
+        change_seq INTEGER
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_jobs_created ON jobs (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_jobs_status_created ON jobs (status, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_jobs_user_created ON jobs (user, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_jobs_array ON jobs (array_id, status)",
+]
+# The hot & archived jobs, for queries over all of them once the archive is attached
+ALL_JOBS = f"""(
+    SELECT {ARCHIVE_COLUMNS} FROM main.jobs
+    UNION ALL
+    SELECT {ARCHIVE_COLUMNS} FROM archive.jobs
+)"""
+# Jobs moved per transaction & free pages released per incremental vacuum step, so the
+# queue is never locked for long
+ARCHIVE_BATCH_SIZE = 500
+VACUUM_PAGES_PER_STEP = 1000
+
+
 class JobStatus(Enum):
     PENDING = "pending"
     RUNNING = "running"
@@ -26,20 +750,207 @@ class JobStatus(Enum):
     FAILED = "failed"
 
 
-@dataclass
+class StatsBucket(Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+
+# strftime formats that truncate a timestamp to the start of its bucket
+BUCKET_FORMATS = {
+    StatsBucket.HOUR: "%Y-%m-%d %H:00",
+    StatsBucket.DAY: "%Y-%m-%d",
+}
+
+
+JOB_FIELDS = [column.strip() for column in JOB_COLUMNS.split(",")]
+# Fields stored as read from the database and decoded on first access
+LAZY_JOB_FIELDS = ("parameters", "created_at", "started_at", "completed_at")
+_NOT_DECODED = object()
+
+
+def _decode_parameters(value) -> Dict:
+    return json.loads(value) if isinstance(value, (str, bytes)) else value
+
+
+class _LazyJobField:
+    """Job attribute kept as read from the database and decoded on first access"""
+
+    def __init__(self, decode: Callable):
+        self.decode = decode
+
+    def __set_name__(self, owner, name: str):
+        self.raw_slot = f"_{name}_raw"
+        self.decoded_slot = f"_{name}"
+
+    def __get__(self, job, owner=None):
+        if job is None:
+            return self
+        value = getattr(job, self.decoded_slot)
+        if value is _NOT_DECODED:
+            value = self.decode(getattr(job, self.raw_slot))
+            setattr(job, self.decoded_slot, value)
+        return value
+
+    def __set__(self, job, value):
+        setattr(job, self.raw_slot, value)
+        setattr(job, self.decoded_slot, _NOT_DECODED)
+
+
 class Job:
-    id: Optional[int]
+    """A job of the queue
+
+    Built straight from a database row (see `from_row`): `parameters` (JSON) and the
+    timestamps (epoch microseconds) are only decoded when first accessed, so listing many
+    jobs only pays for the fields that are used. `__slots__` keeps every job small.
+    """
+
+    __slots__ = (
+        *(
+            field
+            for field in JOB_FIELDS
+            if field not in LAZY_JOB_FIELDS and field != "status"
+        ),
+        "_status",
+        *(f"_{field}{suffix}" for field in LAZY_JOB_FIELDS for suffix in ("_raw", "")),
+    )
+
+    parameters = _LazyJobField(_decode_parameters)
+    created_at = _LazyJobField(_decode_timestamp)
+    started_at = _LazyJobField(_decode_timestamp)
+    completed_at = _LazyJobField(_decode_timestamp)
+
+    def __init__(
+        self,
+        id: Optional[int],
+        programPath: str,
+        path2python_exec: str,
+        parameters: Union[Dict, str],
+        created_at: Union[datetime, int, str],
+        started_at: Union[datetime, int, str, None],
+        completed_at: Union[datetime, int, str, None],
+        status: Union[JobStatus, str],
+        error_message: Optional[str],
+        python_env: Optional[str] = None,
+        email_address: Optional[str] = None,
+        user: Optional[str] = None,
+        array_id: Optional[int] = None,
+        array_task: Optional[int] = None,
+        job_hash: Optional[str] = None,
+        reused_from: Optional[int] = None,
+        gpu_mem_mb: Optional[int] = None,
+        gpu_mem_peak_mb: Optional[int] = None,
+        gpu_device: Optional[str] = None,
+    ):
+        values = locals()
+        for field in JOB_FIELDS:
+            setattr(self, field, values[field])
+
+    @classmethod
+    def from_row(cls, row) -> "Job":
+        """Job of a row selected with JOB_COLUMNS (extra trailing columns are ignored)"""
+        job = cls.__new__(cls)
+        # Slots are filled directly, as going through the descriptors costs as much as the
+        # query when listing many jobs
+        for slot, value in zip(_JOB_ROW_SLOTS, row):
+            setattr(job, slot, value)
+        job._parameters = job._created_at = _NOT_DECODED
+        job._started_at = job._completed_at = _NOT_DECODED
+        job._status = _JOB_STATUSES[job._status]
+        return job
+
+    @property
+    def status(self) -> JobStatus:
+        return self._status
+
+    @status.setter
+    def status(self, value: Union[JobStatus, str]) -> None:
+        self._status = JobStatus(value)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Job):
+            return NotImplemented
+        return all(
+            getattr(self, field) == getattr(other, field) for field in JOB_FIELDS
+        )
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in JOB_FIELDS)
+        return f"Job({fields})"
+
+
+# Slot of every column of JOB_COLUMNS (raw slots for the lazy fields)
+_JOB_ROW_SLOTS = [
+    f"_{field}_raw"
+    if field in LAZY_JOB_FIELDS
+    else "_status"
+    if field == "status"
+    else field
+    for field in JOB_FIELDS
+]
+_JOB_STATUSES = {status.value: status for status in JobStatus}
+
+
+@dataclass
+class JobArray:
+    """A job array: one job template run over a grid or list of parameters.
+
+    Tasks are only added to the jobs table when they are claimed, so pending tasks beyond
+    `next_task` are implied by the grid.
+    """
+
+    id: int
     programPath: str
     path2python_exec: str
     parameters: Dict
+    grid: Dict
+    num_tasks: int
+    next_task: int
     created_at: datetime
-    started_at: Optional[datetime]
-    completed_at: Optional[datetime]
-    status: JobStatus
-    error_message: Optional[str]
     python_env: Optional[str] = None
     email_address: Optional[str] = None
     user: Optional[str] = None
+    gpu_mem_mb: Optional[int] = None
+    pending: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.completed + self.failed == self.num_tasks
+
+    @property
+    def progress(self) -> float:
+        """Fraction of tasks that are done (completed or failed)"""
+        if self.num_tasks == 0:
+            return 1.0
+        return (self.completed + self.failed) / self.num_tasks
+
+
+def get_num_array_tasks(grid: Dict) -> int:
+    """Get the number of tasks of a job array grid spec"""
+    if "list" in grid:
+        return len(grid["list"])
+    num_tasks = 1
+    for values in grid["grid"].values():
+        num_tasks *= len(values)
+    return num_tasks
+
+
+def get_array_task_parameters(grid: Dict, task_idx: int) -> Dict:
+    """Get the parameters of a single task of a job array grid spec
+
+    For a grid, tasks follow the order of itertools.product over the grid values (last key
+    varies fastest), without expanding the grid.
+    """
+    if "list" in grid:
+        return dict(grid["list"][task_idx])
+
+    task_params = {}
+    for key, values in reversed(list(grid["grid"].items())):
+        task_idx, value_idx = divmod(task_idx, len(values))
+        task_params[key] = values[value_idx]
+    return {key: task_params[key] for key in grid["grid"]}
 
 
 class JobQueue:
@@ -49,11 +960,20 @@ class JobQueue:
             db_path = get_queue_db_path()
 
         self.db_path = Path(db_path)
+        # Cold store of old finished jobs, see archive_jobs
+        self.archive_path = get_archive_path(self.db_path)
         if not self.db_path.exists():
             print(
                 "SQLJobScheduler NOTE: Database file not found: Initializing new database."
             )
             self._init_db()
+        self._migrate()
+
+        # Long-lived connection only used to watch PRAGMA data_version
+        self._version_lock = threading.Lock()
+        self._version_conn = None
+        self._data_version = None
+        self._change_count = 0
 
     def _init_db(self):
         """Initialize SQLite database with jobs table"""
@@ -66,6 +986,8 @@ class JobQueue:
 
         try:
             with sqlite3.connect(self.db_path) as conn:
+                # Lets archive_jobs return freed pages to the OS in small steps
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
                 conn.execute("""
                     CREATE TABLE IF NOT EXISTS jobs (
                         id INTEGER PRIMARY KEY,
@@ -90,6 +1012,47 @@ class JobQueue:
         finally:
             os.umask(old_umask)
 
+    def _migrate(self):
+        """Apply any schema migrations the database is missing"""
+        with sqlite3.connect(self.db_path) as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                return
+
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-read in case another process migrated in the meantime
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                for new_version, steps in enumerate(
+                    MIGRATIONS[version:], start=version + 1
+                ):
+                    for step in steps:
+                        if callable(step):
+                            step(conn)
+                        else:
+                            conn.execute(step)
+                    conn.execute(f"PRAGMA user_version = {new_version}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _attach_archive(self, conn: sqlite3.Connection, create: bool = False) -> bool:
+        """Attach the archive database as `archive`, if there is one (or `create`)
+
+        Returns:
+            bool: Whether the archive is attached
+        """
+        if not create and not self.archive_path.exists():
+            return False
+        conn.execute("ATTACH DATABASE ? AS archive", (str(self.archive_path),))
+        return True
+
+    @staticmethod
+    def _row_to_job(row) -> Job:
+        return Job.from_row(row)
+
     def add_job(
         self,
         programPath: str,
@@ -98,82 +1061,779 @@ class JobQueue:
         email_address: Optional[str] = None,
         user: Optional[str] = None,
         python_env: Optional[str] = None,
+        coalesce: bool = True,
+        reuse_results: bool = False,
+        gpu_mem_mb: Optional[int] = None,
     ) -> int:
-        """Add a new job to the queue"""
+        """Add a new job to the queue
+
+        Args:
+            coalesce (bool, optional): If an identical job (same program, interpreter, env and
+                parameters) is pending or running, return its ID instead of adding a new job.
+                Its emails then also go to email_address. Defaults to True.
+            reuse_results (bool, optional): If an identical job added with reuse_results
+                already completed and the files in the parameters (and in directories in
+                them, up to MAX_FINGERPRINT_FILES files) are unchanged (mtime & size), add
+                the job as completed without running it again. Defaults to False.
+            gpu_mem_mb (int, optional): Expected GPU memory use in MB. Used to pack several jobs
+                onto one GPU. If not given, it is learned from earlier runs of the program.
+
+        Returns:
+            int: ID of the job (of the existing job if coalesced)
+        """
+
+        with sqlite3.connect(self.db_path) as conn:
+            return self._insert_job(
+                conn,
+                programPath,
+                path2python_exec,
+                parameters,
+                email_address=email_address,
+                user=user,
+                python_env=python_env,
+                coalesce=coalesce,
+                reuse_results=reuse_results,
+                gpu_mem_mb=gpu_mem_mb,
+            )
+
+    def add_jobs(self, jobs: List[Dict]) -> List[int]:
+        """Add several jobs in a single transaction
+
+        Args:
+            jobs (List[Dict]): Keyword arguments of add_job for every job
 
+        Returns:
+            List[int]: ID of every job, in order (of the existing job if coalesced)
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            return [self._insert_job(conn, **job) for job in jobs]
+
+    def get_queued_job_hashes(self, job_hashes: List[str]) -> set:
+        """Hashes (see get_job_hash) of the given ones that a pending or running job has"""
+        queued = set()
+        job_hashes = list(job_hashes)
+        with sqlite3.connect(self.db_path) as conn:
+            for start in range(0, len(job_hashes), 500):
+                chunk = job_hashes[start : start + 500]
+                queued.update(
+                    row[0]
+                    for row in conn.execute(
+                        f"""
+                        SELECT DISTINCT job_hash FROM jobs
+                        WHERE job_hash IN ({", ".join("?" * len(chunk))})
+                        AND status IN (?, ?)
+                        """,
+                        (*chunk, JobStatus.PENDING.value, JobStatus.RUNNING.value),
+                    )
+                )
+        return queued
+
+    def _insert_job(
+        self,
+        conn: sqlite3.Connection,
+        programPath: str,
+        path2python_exec: str,
+        parameters: Dict,
+        email_address: Optional[str] = None,
+        user: Optional[str] = None,
+        python_env: Optional[str] = None,
+        coalesce: bool = True,
+        reuse_results: bool = False,
+        gpu_mem_mb: Optional[int] = None,
+    ) -> int:
+        """Insert a job within the transaction of `conn` (see add_job)"""
         params_json = json.dumps(parameters)
+        job_hash = get_job_hash(programPath, path2python_exec, python_env, parameters)
+
+        if coalesce:
+            duplicate = conn.execute(
+                """
+                SELECT id, email_address FROM jobs
+                WHERE job_hash = ? AND status IN (?, ?)
+                ORDER BY id ASC
+                LIMIT 1
+                """,
+                (job_hash, JobStatus.PENDING.value, JobStatus.RUNNING.value),
+            ).fetchone()
+            if duplicate:
+                print(
+                    f"SQLJobScheduler NOTE: Identical job {duplicate[0]:05d} is already queued. Not adding a new job."
+                )
+                self._add_job_recipient(conn, duplicate[0], duplicate[1], email_address)
+                return duplicate[0]
+
+        reused_from = None
+        if reuse_results:
+            reused_from = self._find_reusable_job(conn, job_hash, parameters)
+
+        now = datetime.now()
+        status = JobStatus.PENDING if reused_from is None else JobStatus.COMPLETED
+        cursor = conn.execute(
+            """
+            INSERT INTO jobs 
+            (programPath, path2python_exec, parameters, created_at, started_at, completed_at, status, email_address, user, python_env, job_hash, reused_from, gpu_mem_mb, reuse_results)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            (
+                programPath,
+                path2python_exec,
+                params_json,
+                to_epoch_us(now),
+                to_epoch_us(now) if reused_from is not None else None,
+                to_epoch_us(now) if reused_from is not None else None,
+                status.value,
+                email_address,
+                user,
+                python_env,
+                job_hash,
+                reused_from,
+                gpu_mem_mb,
+                int(reuse_results),
+            ),
+        )
+        _record_rollups(
+            conn,
+            now,
+            user,
+            programPath,
+            submitted=1,
+            completed=int(reused_from is not None),
+        )
+        SearchIndex.index_job(conn, cursor.lastrowid)
+        if reused_from is not None:
+            print(
+                f"SQLJobScheduler NOTE: Inputs unchanged since job {reused_from:05d} completed. Reusing its results."
+            )
+        return cursor.lastrowid
 
+    @staticmethod
+    def _add_job_recipient(
+        conn: sqlite3.Connection,
+        job_id: int,
+        recipients: Optional[str],
+        email_address: Optional[str],
+    ) -> None:
+        """Also notify the submitter of a job coalesced into job `job_id` of its emails"""
+        addresses = [address.strip() for address in (recipients or "").split(",")]
+        addresses = [address for address in addresses if address]
+        if not email_address or email_address in addresses:
+            return
+        conn.execute(
+            "UPDATE jobs SET email_address = ? WHERE id = ?",
+            (", ".join(addresses + [email_address]), job_id),
+        )
+        print(
+            f"SQLJobScheduler NOTE: {email_address} will be notified about job {job_id:05d} as well."
+        )
+
+    def _find_reusable_job(
+        self, conn: sqlite3.Connection, job_hash: str, parameters: Dict
+    ) -> Optional[int]:
+        """Get the latest completed identical job that ran on the same inputs, if any"""
+        row = conn.execute(
+            """
+            SELECT id, input_fingerprint FROM jobs
+            WHERE job_hash = ? AND status = ? AND reused_from IS NULL
+            ORDER BY completed_at DESC
+            LIMIT 1
+            """,
+            (job_hash, JobStatus.COMPLETED.value),
+        ).fetchone()
+        if row is None or row[1] is None:
+            return None
+        if row[1] == get_input_fingerprint(parameters):
+            return row[0]
+        return None
+
+    def get_cache_stats(self) -> Dict:
+        """Get how many jobs reused earlier results and the GPU time that saved
+
+        Returns:
+            Dict: "reused_jobs" count and "gpu_seconds_saved", the summed run time of the
+            jobs whose results were reused
+        """
         with sqlite3.connect(self.db_path) as conn:
+            sources = ["main.jobs"]
+            if self._attach_archive(conn):
+                sources.append("archive.jobs")
+            # Run time of the reused job, wherever it is stored
+            run_seconds = ", ".join(
+                f"""
+                (SELECT (src.completed_at - src.started_at) / 1e6
+                 FROM {source} src WHERE src.id = j.reused_from)
+                """
+                for source in sources
+            )
+            jobs_table = ALL_JOBS if len(sources) > 1 else "jobs"
+            reused_jobs, gpu_seconds_saved = conn.execute(
+                f"""
+                SELECT COUNT(*), COALESCE(SUM(COALESCE({run_seconds}, 0)), 0)
+                FROM {jobs_table} j
+                WHERE j.reused_from IS NOT NULL
+                """
+            ).fetchone()
+        return {"reused_jobs": reused_jobs, "gpu_seconds_saved": gpu_seconds_saved}
+
+    def get_stats(
+        self,
+        since: Optional[datetime] = None,
+        bucket: StatsBucket = StatsBucket.HOUR,
+    ) -> Dict:
+        """Get queue analytics from the rollup tables
+
+        Reads one row per bucket (and user/program) instead of one per job, so the cost does
+        not grow with the number of jobs.
+
+        Args:
+            since (datetime, optional): Only buckets from the one containing this time on.
+                Defaults to all of history.
+            bucket (StatsBucket, optional): Size of the buckets.
+
+        Returns:
+            Dict: "throughput" (submitted, started, completed & failed jobs and GPU seconds per
+            bucket), "wait_time" & "run_time" percentiles (seconds, estimated from log-scale
+            histograms), "failures_by_program" & "failures_by_user" (finished, failed, failure
+            rate, share of finished jobs & GPU seconds) and the current "backlog"
+        """
+        bucket = StatsBucket(bucket)
+        since_bucket = since.strftime(BUCKET_FORMATS[bucket]) if since else ""
+        window = (bucket.value, since_bucket)
+
+        with sqlite3.connect(self.db_path) as conn:
+            throughput = [
+                {
+                    "bucket": bucket_start,
+                    "submitted": submitted,
+                    "started": started,
+                    "completed": completed,
+                    "failed": failed,
+                    "gpu_seconds": gpu_seconds,
+                }
+                for bucket_start, submitted, started, completed, failed, gpu_seconds in conn.execute(
+                    """
+                    SELECT bucket, SUM(submitted), SUM(started), SUM(completed),
+                           SUM(failed), SUM(gpu_seconds)
+                    FROM job_rollups
+                    WHERE granularity = ? AND bucket >= ?
+                    GROUP BY bucket
+                    ORDER BY bucket
+                    """,
+                    window,
+                )
+            ]
+
+            # Cumulative count per histogram bin, to find the bin of each percentile
+            histograms: Dict[str, List[tuple]] = {"wait": [], "run": []}
+            for metric, histogram_bin, cumulative, total in conn.execute(
+                """
+                SELECT metric, bin,
+                       SUM(SUM(count)) OVER (PARTITION BY metric ORDER BY bin),
+                       SUM(SUM(count)) OVER (PARTITION BY metric)
+                FROM job_rollup_histograms
+                WHERE granularity = ? AND bucket >= ?
+                GROUP BY metric, bin
+                """,
+                window,
+            ):
+                histograms[metric].append((histogram_bin, cumulative, total))
+
+            def _percentiles(metric: str) -> Dict[str, Optional[float]]:
+                result = {}
+                for p in STATS_PERCENTILES:
+                    result[f"p{p}"] = None
+                    for histogram_bin, cumulative, total in histograms[metric]:
+                        # Nearest rank: the bin holding value number ceil(p * n)
+                        if cumulative >= math.ceil(total * p / 100):
+                            result[f"p{p}"] = get_histogram_bin_value(histogram_bin)
+                            break
+                return result
+
+            def _failures_by(column: str) -> List[Dict]:
+                rows = conn.execute(
+                    f"""
+                    SELECT {column}, SUM(completed) + SUM(failed) AS finished, SUM(failed),
+                           SUM(gpu_seconds),
+                           1.0 * (SUM(completed) + SUM(failed))
+                               / SUM(SUM(completed) + SUM(failed)) OVER ()
+                    FROM job_rollups
+                    WHERE granularity = ? AND bucket >= ?
+                    GROUP BY {column}
+                    HAVING finished > 0
+                    ORDER BY 3 DESC, 2 DESC
+                    """,
+                    window,
+                ).fetchall()
+                return [
+                    {
+                        "name": name or None,
+                        "finished": finished,
+                        "failed": failed,
+                        "failure_rate": round(failed / finished, 4),
+                        "share": round(share, 4),
+                        "gpu_seconds": gpu_seconds,
+                    }
+                    for name, finished, failed, gpu_seconds, share in rows
+                ]
+
+            running, oldest_pending = conn.execute(
+                """
+                SELECT (SELECT COUNT(*) FROM jobs WHERE status = ?),
+                       (SELECT MIN(created_at) FROM jobs WHERE status = ?)
+                """,
+                (JobStatus.RUNNING.value, JobStatus.PENDING.value),
+            ).fetchone()
+
+            return {
+                "bucket": bucket.value,
+                "throughput": throughput,
+                "wait_time": _percentiles("wait"),
+                "run_time": _percentiles("run"),
+                "failures_by_program": _failures_by("programPath"),
+                "failures_by_user": _failures_by("user"),
+                "backlog": {
+                    "pending": self.count_pending_jobs(),
+                    "running": running,
+                    "oldest_pending_age_s": (
+                        datetime.now() - from_epoch_us(oldest_pending)
+                    ).total_seconds()
+                    if oldest_pending
+                    else None,
+                },
+            }
+
+    def add_job_array(
+        self,
+        programPath: str,
+        path2python_exec: str,
+        grid: Optional[Dict[str, List]] = None,
+        param_list: Optional[List[Dict]] = None,
+        parameters: Optional[Dict] = None,
+        email_address: Optional[str] = None,
+        user: Optional[str] = None,
+        python_env: Optional[str] = None,
+        gpu_mem_mb: Optional[int] = None,
+    ) -> int:
+        """Add a job array (parameter sweep) to the queue
+
+        Only the template and the grid spec are stored. Tasks are expanded one at a time
+        when they are claimed by `get_next_pending_job`.
+
+        Args:
+            grid (Dict[str, List], optional): Values per parameter. One task is run per combination.
+            param_list (List[Dict], optional): Parameters per task. Use instead of grid.
+            parameters (Dict, optional): Parameters shared by every task.
+            gpu_mem_mb (int, optional): Expected GPU memory use in MB of each task.
+
+        Returns:
+            int: ID of the job array
+        """
+        if (grid is None) == (param_list is None):
+            raise ValueError("Provide exactly one of grid or param_list")
+
+        grid_spec = {"grid": grid} if grid is not None else {"list": param_list}
+        num_tasks = get_num_array_tasks(grid_spec)
+        if num_tasks == 0:
+            raise ValueError("Job array has no tasks")
+
+        with sqlite3.connect(self.db_path) as conn:
+            now = datetime.now()
             cursor = conn.execute(
                 """
-                INSERT INTO jobs 
-                (programPath, path2python_exec, parameters, created_at, status, email_address, user, python_env)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO job_arrays
+                (programPath, path2python_exec, parameters, grid, num_tasks, created_at, email_address, user, python_env, gpu_mem_mb)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
                 (
                     programPath,
                     path2python_exec,
-                    params_json,
-                    datetime.now(),
-                    JobStatus.PENDING.value,
+                    json.dumps(parameters or {}),
+                    json.dumps(grid_spec),
+                    num_tasks,
+                    to_epoch_us(now),
                     email_address,
                     user,
                     python_env,
+                    gpu_mem_mb,
                 ),
             )
+            _record_rollups(conn, now, user, programPath, submitted=num_tasks)
             return cursor.lastrowid
 
+    def _expand_next_array_task(self, conn: sqlite3.Connection, array_row) -> None:
+        """Add the next task of a job array to the jobs table as a pending job"""
+        task_idx = array_row["next_task"]
+        claimed = conn.execute(
+            """
+            UPDATE job_arrays
+            SET next_task = next_task + 1
+            WHERE id = ? AND next_task = ?
+            """,
+            (array_row["id"], task_idx),
+        ).rowcount
+        if not claimed:
+            # Another process expanded this task already
+            return
+
+        task_params = {
+            **json.loads(array_row["parameters"]),
+            **get_array_task_parameters(json.loads(array_row["grid"]), task_idx),
+        }
+        job_hash = get_job_hash(
+            array_row["programPath"],
+            array_row["path2python_exec"],
+            array_row["python_env"],
+            task_params,
+        )
+        # Tasks keep the creation time of the array to keep their place in the queue
+        cursor = conn.execute(
+            """
+            INSERT INTO jobs
+            (programPath, path2python_exec, parameters, created_at, status, email_address, user, python_env, array_id, array_task, job_hash, gpu_mem_mb)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                array_row["programPath"],
+                array_row["path2python_exec"],
+                json.dumps(task_params),
+                array_row["created_at"],
+                JobStatus.PENDING.value,
+                array_row["email_address"],
+                array_row["user"],
+                array_row["python_env"],
+                array_row["id"],
+                task_idx,
+                job_hash,
+                array_row["gpu_mem_mb"],
+            ),
+        )
+        SearchIndex.index_job(conn, cursor.lastrowid)
+
     def get_next_pending_job(self) -> Optional[Job]:
-        """Get the next pending job"""
+        """Get the next pending job, expanding the next job array task if it is older"""
         with sqlite3.connect(self.db_path) as conn:
             conn.row_factory = sqlite3.Row
             row = conn.execute(
-                """
-                SELECT id, programPath, path2python_exec, parameters, 
-                       created_at, started_at, completed_at, 
-                       status, error_message, email_address, user, python_env
+                f"""
+                SELECT {JOB_COLUMNS}
                 FROM jobs 
                 WHERE status = ?
-                ORDER BY created_at ASC
+                ORDER BY created_at ASC, id ASC
                 LIMIT 1
                 """,
                 (JobStatus.PENDING.value,),
             ).fetchone()
 
+            array_row = conn.execute(
+                """
+                SELECT * FROM job_arrays
+                WHERE next_task < num_tasks
+                ORDER BY created_at ASC
+                LIMIT 1
+                """
+            ).fetchone()
+
+            if array_row and (
+                row is None or array_row["created_at"] < row["created_at"]
+            ):
+                self._expand_next_array_task(conn, array_row)
+                conn.commit()
+                row = conn.execute(
+                    f"""
+                    SELECT {JOB_COLUMNS}
+                    FROM jobs
+                    WHERE status = ?
+                    ORDER BY created_at ASC, id ASC
+                    LIMIT 1
+                    """,
+                    (JobStatus.PENDING.value,),
+                ).fetchone()
+
             if row:
-                return Job(
-                    **{
-                        **dict(row),
-                        "parameters": json.loads(row["parameters"]),
-                        "created_at": datetime.fromisoformat(row["created_at"]),
-                        "started_at": datetime.fromisoformat(row["started_at"])
-                        if row["started_at"]
-                        else None,
-                        "completed_at": datetime.fromisoformat(row["completed_at"])
-                        if row["completed_at"]
-                        else None,
-                        "status": JobStatus(row["status"]),
-                        "email_address": row["email_address"],
-                        "user": row["user"],
-                        "python_env": row["python_env"],
-                    }
+                return self._row_to_job(row)
+            return None
+
+    def count_pending_jobs(self) -> int:
+        """Count pending jobs, including job array tasks that are not expanded yet"""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                """
+                SELECT
+                    (SELECT COUNT(*) FROM jobs WHERE status = ?)
+                    + (SELECT COALESCE(SUM(num_tasks - next_task), 0) FROM job_arrays)
+                """,
+                (JobStatus.PENDING.value,),
+            ).fetchone()[0]
+
+    def get_newest_pending_submission(self) -> Optional[Dict]:
+        """User, email address & creation time of the newest pending job or job array
+
+        Unlike get_next_pending_job, this only reads: no job array task is expanded.
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                """
+                SELECT * FROM (
+                    SELECT user, email_address, created_at FROM jobs
+                    WHERE status = ?
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT 1
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT user, email_address, created_at FROM job_arrays
+                    WHERE next_task < num_tasks
+                    ORDER BY id DESC
+                    LIMIT 1
                 )
+                ORDER BY created_at DESC
+                LIMIT 1
+                """,
+                (JobStatus.PENDING.value,),
+            ).fetchone()
+        if row is None:
             return None
+        return {
+            "user": row[0],
+            "email_address": row[1],
+            "created_at": _decode_timestamp(row[2]),
+        }
+
+    def rebuild_rollups(self) -> None:
+        """Recompute the rollup tables from all jobs (e.g. after editing jobs by hand)"""
+        with sqlite3.connect(self.db_path) as conn:
+            _backfill_rollups(conn, ALL_JOBS if self._attach_archive(conn) else "jobs")
+
+    def get_param_indexes(self) -> Dict[str, str]:
+        """Get the indexed parameter keys & their generated columns"""
+        with sqlite3.connect(self.db_path) as conn:
+            return dict(conn.execute("SELECT key, column_name FROM param_indexes"))
+
+    def add_param_index(self, key: str) -> str:
+        """Index a parameter key, so query_jobs(params=...) on it is an index lookup
+
+        The key becomes a virtual generated column over `json_extract(parameters, ...)`
+        with an index, in the queue & the archive.
+
+        Returns:
+            str: Name of the generated column
+        """
+        column = get_param_column(key)
+        with sqlite3.connect(self.db_path) as conn:
+            conn.isolation_level = None
+            archived = self._attach_archive(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                indexed_key = conn.execute(
+                    "SELECT key FROM param_indexes WHERE column_name = ?", (column,)
+                ).fetchone()
+                if indexed_key is not None and indexed_key[0] != key:
+                    raise ValueError(
+                        f"Parameter key {key!r} has the same column as {indexed_key[0]!r}"
+                    )
+                conn.execute(
+                    "INSERT OR IGNORE INTO param_indexes (key, column_name) VALUES (?, ?)",
+                    (key, column),
+                )
+                self._add_param_columns(conn, "main")
+                if archived:
+                    self._add_param_columns(conn, "archive")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return column
+
+    def drop_param_index(self, key: str) -> None:
+        """Drop the generated column & index of a parameter key"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.isolation_level = None
+            schemas = ["main", "archive"] if self._attach_archive(conn) else ["main"]
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT column_name FROM param_indexes WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    for schema in schemas:
+                        if row[0] in self._get_job_columns(conn, schema):
+                            conn.execute(
+                                f"DROP INDEX IF EXISTS {schema}.idx_jobs_{row[0]}"
+                            )
+                            conn.execute(
+                                f"ALTER TABLE {schema}.jobs DROP COLUMN {row[0]}"
+                            )
+                    conn.execute("DELETE FROM param_indexes WHERE key = ?", (key,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _get_job_columns(conn: sqlite3.Connection, schema: str) -> List[str]:
+        # table_xinfo, unlike table_info, lists the generated columns
+        return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_xinfo(jobs)")]
+
+    def _add_param_columns(self, conn: sqlite3.Connection, schema: str) -> None:
+        """Add the generated columns & indexes of indexed parameters missing in a schema"""
+        columns = self._get_job_columns(conn, schema)
+        for key, column in conn.execute(
+            "SELECT key, column_name FROM main.param_indexes"
+        ):
+            if column in columns:
+                continue
+            path = _get_param_path(key).replace("'", "''")
+            conn.execute(
+                f"""
+                ALTER TABLE {schema}.jobs ADD COLUMN {column}
+                GENERATED ALWAYS AS (json_extract(parameters, '{path}')) VIRTUAL
+                """
+            )
+            conn.execute(
+                f"""
+                CREATE INDEX IF NOT EXISTS {schema}.idx_jobs_{column}
+                ON jobs ({column}, created_at, id)
+                """
+            )
+
+    def index_logs(self, log_dir: Optional[Path] = None) -> int:
+        """Add new JobRunner & tmux log lines to the search index (see SearchIndex.index_logs)"""
+        with sqlite3.connect(self.db_path) as conn:
+            self._attach_archive(conn)
+            return SearchIndex.index_logs(conn, log_dir or get_log_dir())
+
+    def rebuild_search_index(self) -> None:
+        """Index all jobs (archived ones included) & logs from scratch"""
+        with sqlite3.connect(self.db_path) as conn:
+            self._attach_archive(conn)
+            SearchIndex.backfill_jobs(conn)
+            conn.execute("DELETE FROM log_search")
+            conn.execute("DELETE FROM search_indexed_files")
+            SearchIndex.index_logs(conn, get_log_dir())
+
+    def search(self, query: str, limit: int = 50) -> List[Dict]:
+        """Full-text search over jobs (program, parameters, errors, tmux logs) & JobRunner logs
+
+        Args:
+            query (str): FTS5 query, e.g. `CUDA AND memory`, `"out of memory"`, `resnet*`,
+                `error_message:timeout`. Invalid syntax is searched as plain words.
+            limit (int, optional): Maximum number of results. Defaults to 50.
+
+        Returns:
+            List[Dict]: Matching jobs (archived ones included) & log lines, best match
+                first, with a snippet each
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            self._attach_archive(conn)
+            return SearchIndex.search(conn, query, limit)
+
+    def count_jobs_by_status(self) -> Dict[str, int]:
+        """Count jobs per status (array tasks that are not expanded yet count as pending)"""
+        counts = {status.value: 0 for status in JobStatus}
+        with sqlite3.connect(self.db_path) as conn:
+            for status, count in conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ):
+                counts[status] = count
+        counts[JobStatus.PENDING.value] = self.count_pending_jobs()
+        return counts
+
+    def get_job_arrays(self, array_id: Optional[int] = None) -> List[JobArray]:
+        """Get all job arrays (or the given one) with the status counts of their tasks"""
+        where = "" if array_id is None else "WHERE a.id = ?"
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            # Tasks that finished long ago may have been moved to the archive
+            if self._attach_archive(conn):
+                archived = """
+                    (SELECT COUNT(*) FROM archive.jobs x
+                     WHERE x.array_id = a.id AND x.status = 'completed') AS archived_completed,
+                    (SELECT COUNT(*) FROM archive.jobs x
+                     WHERE x.array_id = a.id AND x.status = 'failed') AS archived_failed
+                """
+            else:
+                archived = "0 AS archived_completed, 0 AS archived_failed"
+            rows = conn.execute(
+                f"""
+                SELECT a.*,
+                       COALESCE(SUM(j.status = 'pending'), 0) AS pending_rows,
+                       COALESCE(SUM(j.status = 'running'), 0) AS running,
+                       COALESCE(SUM(j.status = 'completed'), 0) AS completed,
+                       COALESCE(SUM(j.status = 'failed'), 0) AS failed,
+                       {archived}
+                FROM job_arrays a
+                LEFT JOIN main.jobs j ON j.array_id = a.id
+                {where}
+                GROUP BY a.id
+                ORDER BY a.created_at DESC
+                """,
+                () if array_id is None else (array_id,),
+            ).fetchall()
+            return [
+                JobArray(
+                    id=row["id"],
+                    programPath=row["programPath"],
+                    path2python_exec=row["path2python_exec"],
+                    parameters=json.loads(row["parameters"]),
+                    grid=json.loads(row["grid"]),
+                    num_tasks=row["num_tasks"],
+                    next_task=row["next_task"],
+                    created_at=from_epoch_us(row["created_at"]),
+                    python_env=row["python_env"],
+                    email_address=row["email_address"],
+                    user=row["user"],
+                    gpu_mem_mb=row["gpu_mem_mb"],
+                    pending=row["num_tasks"] - row["next_task"] + row["pending_rows"],
+                    running=row["running"],
+                    completed=row["completed"] + row["archived_completed"],
+                    failed=row["failed"] + row["archived_failed"],
+                )
+                for row in rows
+            ]
+
+    def get_job_array(self, array_id: int) -> Optional[JobArray]:
+        """Get a single job array with the status counts of its tasks"""
+        job_arrays = self.get_job_arrays(array_id)
+        return job_arrays[0] if job_arrays else None
 
     def update_job_status(
         self, job_id: int, status: JobStatus, error_message: Optional[str] = None
     ):
-        """Update job status"""
+        """Update job status (and the rollups of job metrics in the same transaction)"""
+        now = datetime.now()
         with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                """
+                SELECT parameters, created_at, started_at, user, programPath,
+                       reuse_results
+                FROM jobs WHERE id = ?
+                """,
+                (job_id,),
+            ).fetchone()
             if status == JobStatus.RUNNING:
+                # Fingerprint the inputs the job runs on, if its results may be reused
+                input_fingerprint = (
+                    get_input_fingerprint(json.loads(row[0]))
+                    if row and row[5]
+                    else None
+                )
                 conn.execute(
                     """
                     UPDATE jobs 
-                    SET status = ?, started_at = ?
+                    SET status = ?, started_at = ?, input_fingerprint = ?
                     WHERE id = ?
                     """,  # Remove extra comma after error_message
-                    (status.value, datetime.now().isoformat(), job_id),
+                    (
+                        status.value,
+                        to_epoch_us(now),
+                        input_fingerprint,
+                        job_id,
+                    ),
                 )
+                if row:
+                    wait_seconds = (now - from_epoch_us(row[1])).total_seconds()
+                    _record_rollups(
+                        conn, now, row[3], row[4], started=1, wait_seconds=wait_seconds
+                    )
             elif status in (JobStatus.COMPLETED, JobStatus.FAILED):
                 conn.execute(
                     """
@@ -181,48 +1841,361 @@ class JobQueue:
                     SET status = ?, completed_at = ?, error_message = ?
                     WHERE id = ?
                     """,
-                    (status.value, datetime.now().isoformat(), error_message, job_id),
+                    (status.value, to_epoch_us(now), error_message, job_id),
                 )
+                if row:
+                    _record_rollups(
+                        conn,
+                        now,
+                        row[3],
+                        row[4],
+                        completed=int(status == JobStatus.COMPLETED),
+                        failed=int(status == JobStatus.FAILED),
+                        run_seconds=(now - from_epoch_us(row[2])).total_seconds()
+                        if row[2]
+                        else None,
+                    )
+                SearchIndex.index_job(conn, job_id)
+
+    def record_gpu_usage(
+        self, job_id: int, gpu_device: Optional[str], gpu_mem_peak_mb: Optional[int]
+    ) -> None:
+        """Store the GPU a job ran on and the peak GPU memory (MB) it used"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "UPDATE jobs SET gpu_device = ?, gpu_mem_peak_mb = ? WHERE id = ?",
+                (gpu_device, gpu_mem_peak_mb, job_id),
+            )
+
+    def get_learned_gpu_mem(self, programPath: str, last_n: int = 10) -> Optional[int]:
+        """Get the highest peak GPU memory (MB) of the last completed runs of a program
+
+        Returns:
+            Optional[int]: Peak memory, or None if no run of the program was measured
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                """
+                SELECT MAX(gpu_mem_peak_mb) FROM (
+                    SELECT gpu_mem_peak_mb FROM jobs
+                    WHERE programPath = ? AND status = ? AND gpu_mem_peak_mb IS NOT NULL
+                    ORDER BY completed_at DESC
+                    LIMIT ?
+                )
+                """,
+                (programPath, JobStatus.COMPLETED.value, last_n),
+            ).fetchone()[0]
+
+    def get_change_count(self) -> int:
+        """Get a counter that increases whenever another connection commits to the database
+
+        Based on PRAGMA data_version, so checking it does not read any table. Meant for
+        long-lived queues (e.g. the dashboard) to tell whether anything changed between calls.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(
+                    self.db_path, check_same_thread=False
+                )
+            data_version = self._version_conn.execute("PRAGMA data_version").fetchone()[
+                0
+            ]
+            if data_version != self._data_version:
+                self._data_version = data_version
+                self._change_count += 1
+            return self._change_count
+
+    @staticmethod
+    def encode_cursor(job: Job) -> str:
+        """Encode the position of a job in a listing as a cursor for query_jobs"""
+        created_at = to_epoch_us(job.created_at)
+        return base64.urlsafe_b64encode(f"{created_at}|{job.id}".encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> tuple[int, int]:
+        created_at, job_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        # Cursors handed out before migration 9 hold the ISO text timestamp
+        if not created_at.isdigit():
+            created_at = to_epoch_us(datetime.fromisoformat(created_at))
+        return int(created_at), int(job_id)
+
+    def query_jobs(
+        self,
+        status: Optional[JobStatus] = None,
+        user: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        cursor: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Job]:
+        """Get jobs, newest first, filtered and paginated in SQL
+
+        Args:
+            status (JobStatus, optional): Only jobs with this status.
+            user (str, optional): Only jobs of this user.
+            since (datetime, optional): Only jobs created at or after this time.
+            until (datetime, optional): Only jobs created before this time.
+            limit (int, optional): Maximum number of jobs to return (page size).
+            cursor (str, optional): Only jobs after this position, from `encode_cursor` of the
+                last job of the previous page.
+            params (Dict[str, Any], optional): Only jobs whose parameters have these values.
+                Keys indexed with add_param_index are looked up in their index, others are
+                read with json_extract.
+        """
+        where = []
+        values = []
+        if status is not None:
+            status = JobStatus(status)
+            where.append("status = ?")
+            values.append(status.value)
+        if user is not None:
+            where.append("user = ?")
+            values.append(user)
+        if since is not None:
+            where.append("created_at >= ?")
+            values.append(to_epoch_us(since))
+        if until is not None:
+            where.append("created_at < ?")
+            values.append(to_epoch_us(until))
+        if cursor is not None:
+            cursor_created_at, cursor_id = self._decode_cursor(cursor)
+            # Row value comparison, so SQLite can seek the (created_at, id) index
+            where.append("(created_at, id) < (?, ?)")
+            values.extend([cursor_created_at, cursor_id])
+        if params:
+            param_columns = self.get_param_indexes()
+            for key, value in params.items():
+                if key in param_columns:
+                    column = param_columns[key]
+                else:
+                    column = "json_extract(parameters, ?)"
+                    values.append(_get_param_path(key))
+                if value is None:
+                    where.append(f"{column} IS NULL")
+                else:
+                    where.append(f"{column} = ?")
+                    values.append(_get_param_sql_value(value))
+
+        where = " WHERE " + " AND ".join(where) if where else ""
+        query = f"SELECT {JOB_COLUMNS} FROM main.jobs{where}"
+
+        with sqlite3.connect(self.db_path) as conn:
+            # Only finished jobs are archived, so pending & running ones are all hot
+            if (
+                status not in (JobStatus.PENDING, JobStatus.RUNNING)
+                and self._attach_archive(conn)
+                and self._archive_overlaps(conn, since)
+            ):
+                # Both selects seek their (created_at, id) index & are merged in order
+                query += f" UNION ALL SELECT {JOB_COLUMNS} FROM archive.jobs{where}"
+                values += values
+            query += " ORDER BY created_at DESC, id DESC"
+            if limit is not None:
+                query += " LIMIT ?"
+                values.append(int(limit))
+            rows = conn.execute(query, values).fetchall()
+            return [self._row_to_job(row) for row in rows]
+
+    @staticmethod
+    def _archive_overlaps(conn: sqlite3.Connection, since: Optional[datetime]) -> bool:
+        """Whether the attached archive holds jobs created at or after `since`"""
+        if since is None:
+            return True
+        newest = conn.execute("SELECT MAX(created_at) FROM archive.jobs").fetchone()[0]
+        return newest is not None and newest >= to_epoch_us(since)
+
+    def iter_jobs(
+        self,
+        status: Optional[JobStatus] = None,
+        user: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        batch_size: int = 1000,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> Iterator[Job]:
+        """Iterate over jobs, newest first, with the filters of query_jobs
+
+        Jobs are read in pages of `batch_size`, each in its own short read, so memory stays
+        constant and no read lock is held (which would block writers) while the caller
+        processes the jobs.
+        """
+        cursor = None
+        while True:
+            jobs = self.query_jobs(
+                status=status,
+                user=user,
+                since=since,
+                until=until,
+                limit=batch_size,
+                cursor=cursor,
+                params=params,
+            )
+            yield from jobs
+            if len(jobs) < batch_size:
+                return
+            cursor = self.encode_cursor(jobs[-1])
+
+    def get_last_change_seq(self) -> int:
+        """Sequence number of the latest change to a job (see get_jobs_changed_since)"""
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(
+                "SELECT value FROM job_counters WHERE name = 'change_seq'"
+            ).fetchone()[0]
+
+    def get_jobs_changed_since(self, change_seq: int) -> tuple[List[Job], int]:
+        """Get the jobs added or updated after a change sequence number
+
+        Args:
+            change_seq (int): Last sequence number seen, from get_last_change_seq or an
+                earlier call. 0 for all jobs.
+
+        Returns:
+            tuple: Changed jobs (oldest change first) & the sequence number to pass next time
+        """
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(
+                f"""
+                SELECT {JOB_COLUMNS}, change_seq FROM jobs
+                WHERE change_seq > ?
+                ORDER BY change_seq
+                """,
+                (change_seq,),
+            ).fetchall()
+        if not rows:
+            return [], change_seq
+        # change_seq is the last column, which _row_to_job ignores
+        return [self._row_to_job(row) for row in rows], rows[-1][-1]
+
+    def get_job(self, job_id: int) -> Optional[Job]:
+        """Get a single job by id"""
+        with sqlite3.connect(self.db_path) as conn:
+            row = conn.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None and self._attach_archive(conn):
+                row = conn.execute(
+                    f"SELECT {JOB_COLUMNS} FROM archive.jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+            return self._row_to_job(row) if row else None
 
     def get_all_jobs(self) -> List[Job]:
-        """Get all jobs in the queue"""
+        """Get all jobs in the queue (incl. archived jobs)"""
         with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
+            jobs_table = ALL_JOBS if self._attach_archive(conn) else "jobs"
             rows = conn.execute(
-                """
-                SELECT id, programPath, path2python_exec, parameters, 
-                       created_at, started_at, completed_at, 
-                       status, error_message, email_address, user, python_env
-                FROM jobs 
+                f"""
+                SELECT {JOB_COLUMNS}
+                FROM {jobs_table}
                 ORDER BY created_at DESC
                 """
             ).fetchall()
-            return [
-                Job(
-                    **{
-                        **dict(row),
-                        "parameters": json.loads(row["parameters"]),
-                        "created_at": datetime.fromisoformat(row["created_at"]),
-                        "started_at": datetime.fromisoformat(row["started_at"])
-                        if row["started_at"]
-                        else None,
-                        "completed_at": datetime.fromisoformat(row["completed_at"])
-                        if row["completed_at"]
-                        else None,
-                        "status": JobStatus(row["status"]),
-                        "email_address": row["email_address"],
-                        "user": row["user"],
-                        "python_env": row["python_env"],
-                    }
-                )
-                for row in rows
-            ]
+            return [self._row_to_job(row) for row in rows]
+
+    def archive_jobs(
+        self, older_than_days: float, batch_size: int = ARCHIVE_BATCH_SIZE
+    ) -> int:
+        """Move jobs that finished more than `older_than_days` ago into the archive
+
+        Jobs are moved in transactions of `batch_size` jobs, so the queue stays usable
+        meanwhile. Listings, job lookups, job array progress, rollups & full-text search
+        include archived jobs; result reuse only covers the jobs kept in the queue.
+        The freed pages are then returned to the OS by incremental vacuuming.
+
+        Returns:
+            int: Number of jobs archived
+        """
+        cutoff = to_epoch_us(datetime.now() - timedelta(days=older_than_days))
+        num_archived = 0
+        with sqlite3.connect(self.db_path) as conn:
+            conn.isolation_level = None
+            new_archive = not self.archive_path.exists()
+            self._attach_archive(conn, create=True)
+            for statement in ARCHIVE_SCHEMA:
+                conn.execute(statement)
+            self._add_param_columns(conn, "archive")
+            if new_archive:
+                self._set_permissions(self.archive_path)
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER)")
+
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    conn.execute("DELETE FROM archive_batch")
+                    num_batch = conn.execute(
+                        """
+                        INSERT INTO archive_batch
+                        SELECT id FROM main.jobs
+                        WHERE completed_at < ? AND status IN (?, ?)
+                        LIMIT ?
+                        """,
+                        (
+                            cutoff,
+                            JobStatus.COMPLETED.value,
+                            JobStatus.FAILED.value,
+                            batch_size,
+                        ),
+                    ).rowcount
+                    conn.execute(
+                        f"""
+                        INSERT INTO archive.jobs ({ARCHIVE_COLUMNS})
+                        SELECT {ARCHIVE_COLUMNS} FROM main.jobs
+                        WHERE id IN (SELECT id FROM archive_batch)
+                        """
+                    )
+                    conn.execute(
+                        "DELETE FROM main.jobs WHERE id IN (SELECT id FROM archive_batch)"
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                num_archived += num_batch
+                if num_batch < batch_size:
+                    break
+
+            if num_archived:
+                self._vacuum(conn)
+        return num_archived
+
+    def _vacuum(self, conn: sqlite3.Connection) -> None:
+        """Return the free pages of the queue database to the OS"""
+        if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] != 2:
+            # Databases created before archiving need one full VACUUM to switch modes
+            print(
+                "SQLJobScheduler NOTE: Enabling incremental vacuum. Compacting the database once."
+            )
+            conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM main")
+            return
+        # In steps, each its own short transaction, so writers are not blocked for long
+        while conn.execute("PRAGMA main.freelist_count").fetchone()[0]:
+            # executescript steps the pragma to the end (execute frees a single page)
+            conn.executescript(
+                f"PRAGMA main.incremental_vacuum({VACUUM_PAGES_PER_STEP})"
+            )
+
+    @staticmethod
+    def _set_permissions(path: Path) -> None:
+        """Let the group (e.g. the dashboard user) write to a database file"""
+        try:
+            os.chmod(path, 0o664)
+            shutil.chown(path, group="admin_group")
+        except Exception as e:
+            print(f"Error setting permissions of {path}: {e}")
 
     def clear_db(self):
         """Clear all jobs from the database"""
         with sqlite3.connect(self.db_path) as conn:
             conn.execute("DELETE FROM jobs")
+            conn.execute("DELETE FROM job_arrays")
+            conn.execute("DELETE FROM job_rollups")
+            conn.execute("DELETE FROM job_rollup_histograms")
+            conn.execute("DELETE FROM job_search")
             conn.commit()
+        self.archive_path.unlink(missing_ok=True)
         print("Database cleared successfully")
 
 
@@ -230,6 +2203,24 @@ def main(args):
     if args.clearJobs:
         queue = JobQueue()
         queue.clear_db()
+    if args.rebuildRollups:
+        queue = JobQueue()
+        queue.rebuild_rollups()
+        print("Rollups rebuilt successfully")
+    if args.rebuildSearchIndex:
+        queue = JobQueue()
+        queue.rebuild_search_index()
+        print("Search index rebuilt successfully")
+    for key in args.indexParam:
+        column = JobQueue().add_param_index(key)
+        print(f"Parameter '{key}' indexed as column {column}")
+    for key in args.dropParamIndex:
+        JobQueue().drop_param_index(key)
+        print(f"Index of parameter '{key}' dropped")
+    if args.archive is not None:
+        queue = JobQueue()
+        num_archived = queue.archive_jobs(args.archive)
+        print(f"{num_archived} job(s) archived to {queue.archive_path}")
 
 
 if __name__ == "__main__":
@@ -242,6 +2233,37 @@ if __name__ == "__main__":
         help="Clear all jobs from the database",
         type=bool,
     )
+    parser.add_argument(
+        "--rebuildRollups",
+        action="store_true",
+        help="Recompute the hourly & daily rollups of job metrics from all jobs",
+    )
+    parser.add_argument(
+        "--rebuildSearchIndex",
+        action="store_true",
+        help="Index all jobs & logs for full-text search from scratch",
+    )
+    parser.add_argument(
+        "--indexParam",
+        action="append",
+        default=[],
+        metavar="KEY",
+        help="Index a parameter key for fast lookups of jobs by its value (repeatable)",
+    )
+    parser.add_argument(
+        "--dropParamIndex",
+        action="append",
+        default=[],
+        metavar="KEY",
+        help="Drop the index of a parameter key (repeatable)",
+    )
+    parser.add_argument(
+        "--archive",
+        type=float,
+        default=None,
+        metavar="DAYS",
+        help="Move jobs that finished more than DAYS days ago into the archive database",
+    )
     args = parser.parse_args()
 
     main(args)
@@ -0,0 +1,253 @@
+import asyncio
+import re
+import time
+from collections import deque
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+# Lines of output kept in memory per job for clients that (re)connect
+RING_BUFFER_LINES = 5000
+# Bytes of an already existing output file read when a stream starts
+INITIAL_TAIL_BYTES = 256 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+# Bytes read from the output file at a time for subscribers behind the ring buffer
+CATCH_UP_BYTES = 1024 * 1024
+POLL_INTERVAL = 0.5
+# How often to check whether the job is still running while no output arrives
+RUNNING_CHECK_INTERVAL = 5.0
+KEEPALIVE_INTERVAL = 15.0
+
+# Terminal control sequences written to the tmux pane (colors, cursor moves, titles)
+_ANSI_ESCAPE = re.compile(
+    r"\x1b\[[0-?]*[ -/]*[@-~]|\x1b\][^\x07]*(\x07|\x1b\\)|\x1b[()=>]"
+)
+
+
+def clean_terminal_line(line: str) -> str:
+    """Strip control sequences from a line of pane output, keeping what a terminal shows"""
+    line = _ANSI_ESCAPE.sub("", line).rstrip("\r")
+    # Progress bars redraw the line with carriage returns: keep the last state
+    return line.rsplit("\r", 1)[-1]
+
+
+class JobOutputStream:
+    """Follows the output file of one job and fans its new lines out to subscribers
+
+    A single task reads the file (written by the JobRunner via tmux pipe-pane) and keeps
+    the last lines in a ring buffer. File reads and `is_running` (a DB query) run in
+    threads so they never block the event loop. Every line is numbered by the byte offset
+    in the file right after it, so subscribers only receive lines they have not seen yet,
+    however many of them there are, and a client can resume from its last offset even
+    after the stream was dropped and started again. Subscribers behind the ring buffer
+    catch up from the file.
+    """
+
+    def __init__(
+        self,
+        job_id: int,
+        output_file: Path,
+        is_running: Callable[[], bool],
+        max_lines: int = RING_BUFFER_LINES,
+        start_offset: Optional[int] = None,
+    ):
+        """
+        Args:
+            start_offset (int, optional): Byte offset in the output file to read from (the
+                last offset a client got). Defaults to the last INITIAL_TAIL_BYTES.
+        """
+        self.job_id = job_id
+        self.output_file = Path(output_file)
+        self.is_running = is_running
+        self.lines: deque = deque(maxlen=max_lines)
+        self.start_offset = start_offset
+        # Offset of the first line in the ring buffer, once the file is opened
+        self.buffer_start: Optional[int] = None
+        self.last_offset = 0
+        self.finished = False
+        self.num_subscribers = 0
+        self._changed = asyncio.Condition()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._follow())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _publish(
+        self, lines: List[Tuple[int, str]], finished: bool = False
+    ) -> None:
+        """Add (offset after the line, line) pairs"""
+        async with self._changed:
+            for offset, line in lines:
+                if len(self.lines) == self.lines.maxlen:
+                    self.buffer_start = self.lines[0][0]
+                self.last_offset = offset
+                self.lines.append((offset, clean_terminal_line(line)))
+            self.finished = self.finished or finished
+            self._changed.notify_all()
+
+    async def _wait_for_file(self):
+        """Open the output file once the job creates it, None if the job ended without one"""
+        while True:
+            try:
+                return await asyncio.to_thread(open, self.output_file, "rb")
+            except FileNotFoundError:
+                if not await asyncio.to_thread(self.is_running):
+                    return None
+            await asyncio.sleep(RUNNING_CHECK_INTERVAL)
+
+    async def _follow(self) -> None:
+        f = await self._wait_for_file()
+        if f is None:
+            await self._publish([], finished=True)
+            return
+
+        with f:
+            size = f.seek(0, 2)
+            if self.start_offset is not None and 0 <= self.start_offset <= size:
+                # Resume where a reconnecting client left off
+                offset = f.seek(self.start_offset)
+            else:
+                # Start near the end of long outputs, dropping the first (partial) line
+                offset = f.seek(max(0, size - INITIAL_TAIL_BYTES))
+                if size > INITIAL_TAIL_BYTES:
+                    offset += len(f.readline())
+            self.buffer_start = offset
+            partial = b""
+
+            job_ended = False
+            last_running_check = time.monotonic()
+            while True:
+                data = await asyncio.to_thread(f.read, READ_CHUNK_SIZE)
+                if data:
+                    *complete, partial = (partial + data).split(b"\n")
+                    lines = []
+                    for line in complete:
+                        offset += len(line) + 1
+                        lines.append((offset, line.decode(errors="replace")))
+                    await self._publish(lines)
+                    continue
+
+                if job_ended:
+                    tail = (
+                        [(offset + len(partial), partial.decode(errors="replace"))]
+                        if partial
+                        else []
+                    )
+                    await self._publish(tail, finished=True)
+                    return
+
+                if time.monotonic() - last_running_check > RUNNING_CHECK_INTERVAL:
+                    last_running_check = time.monotonic()
+                    # Read once more, as output may be written right before the job ends
+                    job_ended = not await asyncio.to_thread(self.is_running)
+                    continue
+                await asyncio.sleep(POLL_INTERVAL)
+
+    def _lines_after(self, offset: Optional[int]) -> List[Tuple[int, str]]:
+        if offset is None:
+            return list(self.lines)
+        return [
+            (line_offset, line)
+            for line_offset, line in self.lines
+            if line_offset > offset
+        ]
+
+    def _read_lines(self, start: int, end: int) -> List[Tuple[int, str]]:
+        """(offset, line) of the complete lines of the output file between two offsets"""
+        with open(self.output_file, "rb") as f:
+            f.seek(start)
+            data = f.read(min(end - start, CATCH_UP_BYTES))
+        lines = []
+        for line in data.split(b"\n")[:-1]:
+            start += len(line) + 1
+            lines.append((start, clean_terminal_line(line.decode(errors="replace"))))
+        return lines
+
+    async def subscribe(
+        self, after_offset: Optional[int] = None
+    ) -> AsyncIterator[Optional[List[Tuple[int, str]]]]:
+        """Yield batches of (offset, line) as they arrive
+
+        Args:
+            after_offset (int, optional): Only lines after this byte offset (e.g. the last
+                one a reconnecting client got). Defaults to everything in the ring buffer.
+
+        Yields None when no line arrived for KEEPALIVE_INTERVAL seconds and stops once the
+        job finished and every line was sent.
+        """
+        offset = after_offset
+        self.num_subscribers += 1
+        try:
+            while True:
+                async with self._changed:
+                    batch = self._lines_after(offset)
+                    if not batch and not self.finished:
+                        try:
+                            await asyncio.wait_for(
+                                self._changed.wait(), KEEPALIVE_INTERVAL
+                            )
+                        except asyncio.TimeoutError:
+                            pass
+                        batch = self._lines_after(offset)
+                    finished = self.finished
+                    behind = offset is not None and offset < (self.buffer_start or 0)
+                    buffer_start = self.buffer_start
+
+                if behind:
+                    # Lines that already left the ring buffer are read from the file
+                    batch = await asyncio.to_thread(
+                        self._read_lines, offset, buffer_start
+                    )
+                    if not batch:
+                        offset = buffer_start
+                        continue
+
+                if batch:
+                    offset = batch[-1][0]
+                    yield batch
+                elif finished:
+                    return
+                else:
+                    yield None
+        finally:
+            self.num_subscribers -= 1
+
+
+class JobOutputHub:
+    """One JobOutputStream per job shared by every client, dropped when nobody listens"""
+
+    def __init__(
+        self,
+        get_output_file: Callable[[int], Path],
+        is_running: Callable[[int], bool],
+    ):
+        self.get_output_file = get_output_file
+        self.is_running = is_running
+        self._streams: Dict[int, JobOutputStream] = {}
+
+    def get_stream(
+        self, job_id: int, after_offset: Optional[int] = None
+    ) -> JobOutputStream:
+        """Stream of a job, started from `after_offset` (see JobOutputStream) if new"""
+        stream = self._streams.get(job_id)
+        if stream is None:
+            stream = JobOutputStream(
+                job_id,
+                self.get_output_file(job_id),
+                lambda: self.is_running(job_id),
+                start_offset=after_offset,
+            )
+            stream.start()
+            self._streams[job_id] = stream
+        return stream
+
+    def release(self, job_id: int) -> None:
+        """Stop following a job's output once its last subscriber left"""
+        stream = self._streams.get(job_id)
+        if stream is not None and stream.num_subscribers == 0:
+            stream.stop()
+            del self._streams[job_id]
@@ -1,19 +1,42 @@
-import json
 import logging
 import os
+import shlex
 import signal
 import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+import psutil
 from libtmux import Server
 
-from sqljobscheduler import EmailNotifier, JobManager, LockFileUtils, configSetup
+from sqljobscheduler import Backup, JobManager, LockFileUtils, configSetup
+from sqljobscheduler.EmailNotifier import EmailNotifier
+from sqljobscheduler.EnvCache import EnvCache
+from sqljobscheduler.GPULedger import (
+    GPULedger,
+    detect_gpu_capacities,
+    get_gpu_memory_by_pid,
+)
+from sqljobscheduler.WarmWorker import WarmWorkerPool
 
 # import argparse
 
 
+@dataclass
+class RunningJob:
+    """A job running in its tmux session while packed onto a GPU"""
+
+    job: JobManager.Job
+    session_name: str
+    tmux_log_file: Path
+    pane: Any
+    device: str
+    mem_mb: int
+    peak_mem_mb: int = 0
+
+
 class JobRunner:
     def __init__(self, queue: JobManager.JobQueue, log_dir_str: str = "logs"):
         self.queue = queue
@@ -38,16 +61,44 @@ class JobRunner:
 
         self._init_stats()
 
-        # Load app_settings.json to get the socket name
-        with open(
-            configSetup.get_server_service_dir(__file__)
-            / "templates"
-            / "app_settings.json",
-            "r",
-        ) as f:
-            app_settings = json.load(f)
+        # Load app_settings.json to get the socket name & per-env settings
+        app_settings = configSetup.get_app_settings()
 
         self.socket_name = app_settings["JOBRUNNER"]["script_name"]
+        self.env_cache = EnvCache(
+            env_settings=app_settings["JOBRUNNER"].get("env_settings", {})
+        )
+        self.warm_workers = WarmWorkerPool(
+            socket_dir=configSetup.get_config_dir() / "warm_workers",
+            worker_settings=app_settings["JOBRUNNER"].get("warm_workers"),
+        )
+        self.packing_settings = app_settings["JOBRUNNER"].get("gpu_packing") or {}
+        self.archive_settings = app_settings["JOBRUNNER"].get("archive") or {}
+        self.backup_settings = {
+            **Backup.DEFAULT_SETTINGS,
+            **(app_settings["JOBRUNNER"].get("backup") or {}),
+        }
+        self.gpu_ledger = self._setup_gpu_ledger()
+
+    def _setup_gpu_ledger(self) -> Optional[GPULedger]:
+        """Set up per-GPU memory accounting if packing jobs onto GPUs is enabled"""
+        if not self.packing_settings.get("enabled", False):
+            return None
+
+        capacities = (
+            self.packing_settings.get("capacities_mb") or detect_gpu_capacities()
+        )
+        if not capacities:
+            logging.warning(
+                "GPU packing enabled but no GPUs were found. Running one job at a time"
+            )
+            return None
+
+        logging.info(f"GPU packing enabled. GPU capacities (MB): {capacities}")
+        return GPULedger(
+            capacities=capacities,
+            max_jobs_per_device=self.packing_settings.get("max_jobs_per_device"),
+        )
 
     def _init_stats(self) -> None:
         self.stats = {
@@ -112,9 +163,46 @@ class JobRunner:
         if datetime.now().date() != self.current_log_date:
             # End the current log file
             _end_log_file()
+            self._index_logs()
+            self._archive_jobs()
             self._init_stats()
             self._setup_logging()
 
+    def _index_logs(self):
+        """Add new log lines (incl. tmux logs of failed jobs) to the search index"""
+        try:
+            self.queue.index_logs(self.log_dir)
+        except Exception as e:
+            logging.warning(f"Could not update the search index: {str(e)}")
+
+    def _archive_jobs(self):
+        """Move old finished jobs into the archive (once a day, if enabled)"""
+        if not self.archive_settings.get("enabled", False):
+            return
+        try:
+            num_archived = self.queue.archive_jobs(
+                self.archive_settings.get("after_days", 90),
+                batch_size=self.archive_settings.get(
+                    "batch_size", JobManager.ARCHIVE_BATCH_SIZE
+                ),
+            )
+            logging.info(f"Archived {num_archived} job(s)")
+        except Exception as e:
+            logging.warning(f"Could not archive jobs: {str(e)}")
+
+    def _backup_if_due(self):
+        """Take an incremental snapshot of the queue every `interval_hours` (if enabled)"""
+        if not self.backup_settings.get("enabled", False):
+            return
+        try:
+            snapshot = Backup.snapshot_if_due(self.queue.db_path, self.backup_settings)
+            if snapshot is not None:
+                logging.info(
+                    f"Queue snapshot {snapshot['id']}: {Backup.format_snapshot(snapshot)}"
+                )
+        except Exception as e:
+            logging.warning(f"Could not back up the queue: {str(e)}")
+
     def _mask_email_in_parameters(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
         """Mask email addresses in parameters dictionary"""
         masked_params = parameters.copy()
@@ -124,25 +212,156 @@ class JobRunner:
                 masked_params[key] = EmailNotifier.mask_email(value)
         return masked_params
 
-    def run_job(
+    def _notify_job(
+        self, job: JobManager.Job, event: str, error: Optional[str] = None
+    ) -> None:
+        """Send the email for a job event ("started", "completed" or "failed")
+
+        Tasks of a job array do not send an email each. Instead, the first task sends the
+        start email for the array and the array sends a summary once all tasks are done.
+        """
+        if job.array_id is not None:
+            if event == "started" and job.array_task == 0:
+                job_array = self.queue.get_job_array(job.array_id)
+                self.notifier.notify_array_start(
+                    recipient=job.email_address,
+                    array_id=job.array_id,
+                    script=job.programPath,
+                    num_tasks=job_array.num_tasks if job_array else 0,
+                )
+            return
+
+        if event == "started":
+            self.notifier.notify_job_start(
+                recipient=job.email_address,
+                job_id=job.id,
+                script=job.programPath,
+                pid=int(self.pid),
+            )
+        elif event == "completed":
+            self.notifier.notify_job_complete(
+                recipient=job.email_address,
+                job_id=job.id,
+                script=job.programPath,
+                pid=int(self.pid),
+            )
+        else:
+            self.notifier.notify_job_failed(
+                recipient=job.email_address,
+                job_id=job.id,
+                script=job.programPath,
+                pid=int(self.pid),
+                error=error,
+            )
+
+    def _notify_array_if_finished(self, job: JobManager.Job) -> None:
+        """Send the summary email of a job array once its last task is done"""
+        if job.array_id is None:
+            return
+        job_array = self.queue.get_job_array(job.array_id)
+        if job_array is not None and job_array.finished:
+            logging.info(
+                f"Job array {job.array_id} finished: {job_array.completed} completed, {job_array.failed} failed"
+            )
+            self.notifier.notify_array_complete(
+                recipient=job.email_address,
+                array_id=job.array_id,
+                script=job.programPath,
+                num_tasks=job_array.num_tasks,
+                completed=job_array.completed,
+                failed=job_array.failed,
+            )
+
+    def _prepare_environment(
         self, job: JobManager.Job
-    ) -> tuple[JobManager.JobStatus, Optional[str]]:
-        """Run job in a tmux session and wait for completion"""
+    ) -> tuple[str, Optional[Dict[str, str]], Optional[str]]:
+        """Get the python exec & env vars to run the job with from the env cache.
+
+        Returns:
+            tuple: python exec, env vars for the tmux session, and a fallback `conda activate`
+            command that is only set if the env could not be resolved
+        """
+        if job.python_env is None:
+            return job.path2python_exec, None, None
+
+        try:
+            python_exec = self.env_cache.get_python_exec(
+                job.python_env, job.path2python_exec
+            )
+            return python_exec, self.env_cache.get_env_vars(job.python_env), None
+        except Exception as e:
+            logging.warning(
+                f"Could not use cached env for '{job.python_env}' ({e}). Falling back to conda activate"
+            )
+            conda_setup = f"conda activate {job.python_env}"
+            env_vars = (
+                self.env_cache.env_settings.get(job.python_env, {}).get("env_vars")
+                or {}
+            )
+            for key, value in env_vars.items():
+                conda_setup += f" && export {key}={value}"
+            return job.path2python_exec, None, conda_setup
+
+    def _get_warm_worker_cmd(
+        self,
+        job: JobManager.Job,
+        python_exec: str,
+        environment: Optional[Dict[str, str]],
+        cpu_affinity: Optional[str],
+    ) -> Optional[list[str]]:
+        """Get the command to run the job in the warm worker of its env
+
+        Returns:
+            Optional[list[str]]: Command without job parameters, or None if the worker could not be started
+        """
+        try:
+            self.warm_workers.get_worker(
+                env_name=job.python_env,
+                python_exec=python_exec,
+                env_vars=environment,
+                cpu_affinity=cpu_affinity,
+            )
+        except Exception as e:
+            logging.warning(
+                f"Could not start warm worker for '{job.python_env}' ({e}). Running job in a new interpreter"
+            )
+            return None
+
+        logging.info(f"Running job {job.id} in warm worker for '{job.python_env}'")
+        return self.warm_workers.build_command(
+            job.python_env, job.programPath, job_id=job.id
+        )
+
+    def _build_job_command(
+        self, job: JobManager.Job
+    ) -> tuple[str, Optional[Dict[str, str]], Optional[str]]:
+        """Build the shell command that runs the job
+
+        Returns:
+            tuple: full command, env vars for the tmux session, and a fallback `conda activate`
+            command (only set if the env could not be resolved)
+        """
         # ZSHRC = str(self.root_dir / "ServerService" / "zshrc4jobrunner")
         # zsh_setup = f"exec zsh -f && source {ZSHRC} && clear"
 
         cmd = []
-        if job.python_env is not None:
-            # zsh_setup = "exec zsh && sleep 1"
-            conda_setup = f"conda activate {job.python_env}"
-        else:
-            conda_setup = None
+        python_exec, environment, conda_setup = self._prepare_environment(job)
+
+        cpu_affinity = self.env_cache.get_cpu_affinity(job.python_env)
+        warm_worker_cmd = None
+        if conda_setup is None and self.warm_workers.uses_warm_worker(job.python_env):
+            warm_worker_cmd = self._get_warm_worker_cmd(
+                job, python_exec, environment, cpu_affinity
+            )
 
-        if job.python_env == "caiman":
-            conda_setup = f"{conda_setup} && export MKL_NUM_THREADS=1 && export OPENBLAS_NUM_THREADS=1 && export VECLIB_MAXIMUM_THREADS=1"
+        if warm_worker_cmd is not None:
+            cmd.extend(warm_worker_cmd)
+        else:
+            if cpu_affinity is not None:
+                cmd.append(f"taskset -c {cpu_affinity}")
 
-        cmd.append(job.path2python_exec)
-        cmd.append(job.programPath)
+            cmd.append(python_exec)
+            cmd.append(job.programPath)
         # cmd.append("--from_sql")
 
         # Add parameters
@@ -153,8 +372,27 @@ class JobRunner:
                 else:
                     cmd.append(f"--{key} {value}")
 
+        return " ".join(cmd), environment, conda_setup
+
+    def _get_tmux_server(self) -> Server:
+        return Server(socket_path=f"/tmp/tmux-{os.getuid()}/{self.socket_name}")
+
+    def _start_job_session(
+        self,
+        server: Server,
+        job: JobManager.Job,
+        extra_env: Optional[Dict[str, str]] = None,
+    ) -> tuple[str, Path, Any]:
+        """Send the job's start email and start the job in a new tmux session
+
+        Returns:
+            tuple: tmux session name, path of the log written if the job fails, and the pane
+        """
+        full_cmd, environment, conda_setup = self._build_job_command(job)
+        if extra_env:
+            environment = {**(environment or {}), **extra_env}
+
         session_name = f"job_{job.id:05d}"
-        full_cmd = " ".join(cmd)
 
         tmux_logs = Path(self.log_dir) / "tmux"
         tmux_logs.mkdir(exist_ok=True)
@@ -163,7 +401,88 @@ class JobRunner:
             / f"tmux_{job.id:05d}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
         )
 
-        server = Server(socket_path=f"/tmp/tmux-{os.getuid()}/{self.socket_name}")
+        # Send email notification that job is starting
+        self._notify_job(job, "started")
+
+        # Create new session
+        session = server.new_session(
+            session_name=session_name,
+            kill_session=True,
+            attach=False,
+            environment=environment,
+        )
+
+        pane = session.active_window.panes[0]
+
+        # Single writer of the job's output, which the dashboard streams to its clients
+        output_file = configSetup.get_job_output_file(job.id)
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        output_file.unlink(missing_ok=True)
+        pane.cmd("pipe-pane", "-o", f"cat >> {shlex.quote(str(output_file))}")
+
+        # Setup session to use a modified zshrc config
+        # pane.send_keys(zsh_setup)
+
+        if conda_setup is not None:
+            # pane.send_keys(zsh_setup)
+            pane.send_keys(conda_setup)
+
+        time.sleep(0.5)
+        pane.send_keys("tmux set-option history-limit 1000000")
+        time.sleep(0.5)
+
+        # Send the command with error handling
+        pane.send_keys(
+            f"""
+            {full_cmd} && {{
+                echo "Job completed successfully";
+                exit 0;
+                }}|| {{ 
+                echo "Job failed with exit code $?";
+                tmux capture-pane -p -S - > {tmux_log_file};
+                exit 1;
+        }}
+        """.strip()
+        )
+
+        logging.info(f"Started job {job.id} in tmux session: {session_name}")
+        return session_name, tmux_log_file, pane
+
+    def _get_job_result(
+        self, job: JobManager.Job, tmux_log_file: Path
+    ) -> tuple[JobManager.JobStatus, Optional[str]]:
+        """Get the outcome of a finished job session & send the matching email"""
+        # Readers that are still streaming the output keep their open file
+        configSetup.get_job_output_file(job.id).unlink(missing_ok=True)
+
+        if tmux_log_file.exists():
+            self.stats["failed"] += 1
+            error_msg = f"Job {job.id} failed. See tmux log: {tmux_log_file}"
+            logging.error(error_msg)
+            self._notify_job(job, "failed", error=error_msg)
+            return JobManager.JobStatus.FAILED, error_msg
+
+        self.stats["completed"] += 1
+        logging.info(f"Job {job.id} completed successfully")
+        self._notify_job(job, "completed")
+        return JobManager.JobStatus.COMPLETED, None
+
+    def _handle_session_error(
+        self, job: JobManager.Job, e: Exception
+    ) -> tuple[JobManager.JobStatus, Optional[str]]:
+        self.stats["failed"] += 1
+        error_msg = (
+            f"Error in handling wrapper for tmux processing for job {job.id}: {e}"
+        )
+        logging.error(error_msg)
+        self._notify_job(job, "failed", error=error_msg)
+        return JobManager.JobStatus.FAILED, error_msg
+
+    def run_job(
+        self, job: JobManager.Job
+    ) -> tuple[JobManager.JobStatus, Optional[str]]:
+        """Run job in a tmux session and wait for completion"""
+        server = self._get_tmux_server()
         LockFileUtils.gpu_lock_check_timer(duration=600)
 
         job_status = JobManager.JobStatus.FAILED
@@ -180,102 +499,208 @@ class JobRunner:
             )
 
         try:
-            # Send email notification that job is starting
-            self.notifier.notify_job_start(
-                recipient=job.email_address,
-                job_id=job.id,
-                script=job.programPath,
-                pid=int(self.pid),
-            )
+            session_name, tmux_log_file, _ = self._start_job_session(server, job)
 
-            # Create new session
-            session = server.new_session(
-                session_name=session_name,
-                kill_session=True,
-                attach=False,
-            )
+            # Wait for session to end
+            while server.has_session(session_name):
+                time.sleep(5)
 
-            pane = session.active_window.panes[0]
+            job_status, error_msg = self._get_job_result(job, tmux_log_file)
 
-            # Setup session to use a modified zshrc config
-            # pane.send_keys(zsh_setup)
+        except Exception as e:
+            job_status, error_msg = self._handle_session_error(job, e)
 
-            if conda_setup is not None:
-                # pane.send_keys(zsh_setup)
-                pane.send_keys(conda_setup)
-
-            time.sleep(0.5)
-            pane.send_keys("tmux set-option history-limit 1000000")
-            time.sleep(0.5)
-
-            # Send the command with error handling
-            pane.send_keys(
-                f"""
-                {full_cmd} && {{
-                    echo "Job completed successfully";
-                    exit 0;
-                    }}|| {{ 
-                    echo "Job failed with exit code $?";
-                    tmux capture-pane -p -S - > {tmux_log_file};
-                    exit 1;
-            }}
-            """.strip()
-            )
+        finally:
+            self.no_job_count = 0
+            logging.info("Removing GPU lock file")
+            LockFileUtils.remove_gpu_lock_file()
 
-            logging.info(f"Started job {job.id} in tmux session: {session_name}")
+        return job_status, error_msg
 
-            # Wait for session to end
-            while server.has_session(session_name):
-                time.sleep(5)
+    def _estimate_gpu_mem(self, job: JobManager.Job) -> int:
+        """Expected GPU memory (MB) of a job: declared, learned from earlier runs, or a whole GPU
+
+        Capped at the largest GPU, so a job expected to need more still gets a whole GPU
+        instead of never fitting anywhere (and blocking the queue behind it).
+        """
+        max_capacity = max(self.gpu_ledger.capacities.values())
+        if job.gpu_mem_mb is not None:
+            mem_mb = int(job.gpu_mem_mb)
+        elif (learned := self.queue.get_learned_gpu_mem(job.programPath)) is not None:
+            margin = self.packing_settings.get("learned_margin", 1.2)
+            mem_mb = int(learned * margin)
+        elif self.packing_settings.get("default_mem_mb") is not None:
+            mem_mb = int(self.packing_settings["default_mem_mb"])
+        else:
+            # Unknown footprint: claim a whole GPU
+            mem_mb = max_capacity
 
-            if tmux_log_file.exists():
-                self.stats["failed"] += 1
-                error_msg = f"Job {job.id} failed. See tmux log: {tmux_log_file}"
-                logging.error(error_msg)
-                self.notifier.notify_job_failed(
-                    recipient=job.email_address,
+        if mem_mb > max_capacity:
+            logging.warning(
+                f"Job {job.id} expects {mem_mb} MB of GPU memory, more than the largest GPU ({max_capacity} MB). Running it on a whole GPU"
+            )
+            mem_mb = max_capacity
+        return mem_mb
+
+    def _get_job_gpu_mem(
+        self, running_job: RunningJob, gpu_mem_by_pid: Dict[int, int]
+    ) -> int:
+        """Sum the GPU memory (MB) used by the processes of a job
+
+        These are the processes running in the job's pane and, for jobs in a warm worker
+        (forked by the worker, outside the pane), the job's process & its children.
+        """
+        root_pids = [running_job.pane.pane_pid]
+        pid_file = self.warm_workers.get_pid_file(running_job.job.id)
+        try:
+            root_pids.append(pid_file.read_text())
+        except (OSError, ValueError):
+            pass
+
+        pids = set()
+        for root_pid in root_pids:
+            try:
+                root_proc = psutil.Process(int(root_pid))
+                pids.add(root_proc.pid)
+                pids.update(child.pid for child in root_proc.children(recursive=True))
+            except (psutil.Error, TypeError, ValueError):
+                continue
+        return sum(gpu_mem_by_pid.get(pid, 0) for pid in pids)
+
+    def _finish_packed_job(self, running_job: RunningJob) -> None:
+        """Record the outcome of a packed job and free its GPU memory"""
+        job = running_job.job
+        job_status, error_msg = self._get_job_result(job, running_job.tmux_log_file)
+        self.gpu_ledger.release(job.id)
+        self.queue.record_gpu_usage(
+            job.id, running_job.device, running_job.peak_mem_mb or None
+        )
+        self.queue.update_job_status(job.id, job_status, error_msg)
+        self._notify_array_if_finished(job)
+        logging.info(
+            f"Job {job.id} {job_status.value} (GPU {running_job.device}, peak {running_job.peak_mem_mb} MB)"
+        )
+        self._index_logs()
+
+    def run_pending_jobs_packed(self) -> None:
+        """Process pending jobs, running several at once on a GPU while their memory fits
+
+        Jobs are started in queue order. Each is placed on the GPU where its expected memory
+        fits best (see GPULedger). When the next job does not fit anywhere, the runner waits
+        for running jobs to finish.
+        """
+        self._check_log_rotation()
+        self._backup_if_due()
+        logging.info("Starting packed job processing run")
+
+        server = self._get_tmux_server()
+        running_jobs: Dict[int, RunningJob] = {}
+        num_started = 0
+        job = None
+
+        while self.running:
+            can_start = not self.paused and not self.kill
+            lock_info = LockFileUtils.get_current_gpu_job(verbose=False)
+            if lock_info is not None and lock_info.get("ctype") == "cli":
+                # CLI jobs do not declare their memory, so they get the GPUs to themselves
+                can_start = False
+                if not running_jobs:
+                    LockFileUtils.gpu_lock_check_timer(duration=600)
+                    continue
+
+            while can_start:
+                if job is None:
+                    job = self.queue.get_next_pending_job()
+                if job is None:
+                    break
+
+                mem_mb = self._estimate_gpu_mem(job)
+                device = self.gpu_ledger.allocate(
                     job_id=job.id,
+                    mem_mb=mem_mb,
+                    user=job.user,
                     script=job.programPath,
                     pid=int(self.pid),
-                    error=error_msg,
                 )
-            else:
-                self.stats["completed"] += 1
-                logging.info(f"Job {job.id} completed successfully")
-                self.notifier.notify_job_complete(
-                    recipient=job.email_address,
-                    job_id=job.id,
-                    script=job.programPath,
-                    pid=int(self.pid),
+                if device is None:
+                    break
+
+                self.stats["total"] += 1
+                num_started += 1
+                logging.info(
+                    f"Processing job {job.id}: {job.programPath} on GPU {device} ({mem_mb} MB)"
                 )
-                job_status = JobManager.JobStatus.COMPLETED
-                error_msg = None
+                masked_params = self._mask_email_in_parameters(job.parameters)
+                logging.info(f"Parameters: {masked_params}")
+                self.queue.update_job_status(job.id, JobManager.JobStatus.RUNNING)
 
-        except Exception as e:
-            self.stats["failed"] += 1
-            error_msg = (
-                f"Error in handling wrapper for tmux processing for job {job.id}: {e}"
-            )
-            logging.error(error_msg)
-            self.notifier.notify_job_failed(
-                recipient=job.email_address,
-                job_id=job.id,
-                script=job.programPath,
-                pid=int(self.pid),
-                error=error_msg,
-            )
+                if not LockFileUtils.check_gpu_lock_file():
+                    LockFileUtils.create_gpu_lock_file(
+                        user=job.user,
+                        script=job.programPath,
+                        pid=int(self.pid),
+                        ctype="sql",
+                        job_id=job.id,
+                    )
 
-        finally:
-            self.no_job_count = 0
-            logging.info("Removing GPU lock file")
-            LockFileUtils.remove_gpu_lock_file()
+                try:
+                    session_name, tmux_log_file, pane = self._start_job_session(
+                        server, job, extra_env={"CUDA_VISIBLE_DEVICES": device}
+                    )
+                    running_jobs[job.id] = RunningJob(
+                        job=job,
+                        session_name=session_name,
+                        tmux_log_file=tmux_log_file,
+                        pane=pane,
+                        device=device,
+                        mem_mb=mem_mb,
+                    )
+                except Exception as e:
+                    job_status, error_msg = self._handle_session_error(job, e)
+                    self.gpu_ledger.release(job.id)
+                    self.queue.update_job_status(job.id, job_status, error_msg)
+                    self._notify_array_if_finished(job)
+                job = None
 
-        return job_status, error_msg
+            if not running_jobs:
+                break
+
+            time.sleep(5)
+
+            gpu_mem_by_pid = get_gpu_memory_by_pid()
+            for job_id, running_job in list(running_jobs.items()):
+                running_job.peak_mem_mb = max(
+                    running_job.peak_mem_mb,
+                    self._get_job_gpu_mem(running_job, gpu_mem_by_pid),
+                )
+                if server.has_session(running_job.session_name):
+                    continue
+                del running_jobs[job_id]
+                try:
+                    self._finish_packed_job(running_job)
+                except Exception as e:
+                    logging.error(f"Error finishing job {job_id}: {e}")
+
+            if not running_jobs:
+                LockFileUtils.remove_gpu_lock_file()
+
+        self.no_job_count = 0 if num_started else self.no_job_count + 1
+        if self.paused:
+            logging.info("Job runner paused. Waiting for resume signal...")
+        elif self.kill:
+            logging.info("Received shutdown signal. Exiting.")
+            self.stop()
+        else:
+            logging.info("No pending jobs found. Will wait for new jobs to be added.")
 
     def run_pending_jobs(self) -> None:
         """Process all pending jobs"""
+        if self.gpu_ledger is not None:
+            return self.run_pending_jobs_packed()
+
         # Check if the log file needs to be rotated
         self._check_log_rotation()
+        self._backup_if_due()
         logging.info("Starting job processing run")
 
         try:
@@ -299,24 +724,21 @@ class JobRunner:
                     self.queue.update_job_status(job.id, JobManager.JobStatus.RUNNING)
                     job_status, error_msg = self.run_job(job)
                     self.queue.update_job_status(job.id, job_status, error_msg)
+                    self._notify_array_if_finished(job)
 
                     string_job_note = f"Job {job.id} {job_status.value}"
                     logging.info(string_job_note)
+                    self._index_logs()
 
                 except Exception as e:
                     self.stats["failed"] += 1
                     error_msg = f"Error processing job {job.id}: {str(e)}"
                     logging.error(error_msg)
-                    self.notifier.notify_job_failed(
-                        recipient=job.email_address,
-                        job_id=job.id,
-                        script=job.programPath,
-                        pid=int(self.pid),
-                        error=error_msg,
-                    )
+                    self._notify_job(job, "failed", error=error_msg)
                     self.queue.update_job_status(
                         job.id, JobManager.JobStatus.FAILED, str(e)
                     )
+                    self._notify_array_if_finished(job)
 
                 job = self.queue.get_next_pending_job()
 
@@ -332,13 +754,7 @@ class JobRunner:
             job_status = JobManager.JobStatus.FAILED
             error_msg = f"Critical error in job runner: {str(e)}"
             self.queue.update_job_status(job.id, JobManager.JobStatus.FAILED, str(e))
-            self.notifier.notify_job_failed(
-                recipient=job.email_address,
-                job_id=job.id,
-                script=job.programPath,
-                pid=int(self.pid),
-                error=error_msg,
-            )
+            self._notify_job(job, "failed", error=error_msg)
 
     def start(self) -> None:
         """Start the job runner"""
@@ -348,6 +764,7 @@ class JobRunner:
     def stop(self) -> None:
         """Stop the job runner"""
         self.running = False
+        self.warm_workers.shutdown()
         logging.info("Job runner stopped")
 
     def _toggle_pause(self, signum, frame) -> None:
@@ -394,13 +811,6 @@ def main():
     def _print_current_numJobs(num_jobs: int):
         logging.info(f"Current number of jobs to process: {num_jobs}")
 
-    def _get_num_pending_jobs(jobs: list[JobManager.Job]):
-        num_pending = 0
-        for job in jobs:
-            if job.status == JobManager.JobStatus.PENDING:
-                num_pending += 1
-        return num_pending
-
     # Initialize queue and runner
     queue = JobManager.JobQueue()
     runner = JobRunner(queue)
@@ -409,8 +819,7 @@ def main():
         runner.start()
 
         while runner.running:
-            jobs = queue.get_all_jobs()
-            initial_jobs = _get_num_pending_jobs(jobs)
+            initial_jobs = queue.count_pending_jobs()
 
             # Sleep until next quarter hour
             if runner.no_job_count < 3:
@@ -432,12 +841,12 @@ def main():
 
                 while datetime.now() < next_time:
                     time.sleep(30)
-                    current_jobs = _get_num_pending_jobs(queue.get_all_jobs())
+                    current_jobs = queue.count_pending_jobs()
                     if current_jobs > initial_jobs:
-                        current_job = queue.get_next_pending_job()
-                        user = current_job.user
-                        email = current_job.email_address
-                        created_at = current_job.created_at
+                        submission = queue.get_newest_pending_submission() or {}
+                        user = submission.get("user")
+                        email = submission.get("email_address")
+                        created_at = submission.get("created_at")
                         logging.info(
                             f"{int(current_jobs - initial_jobs)} job(s) added to queue by {user} ({email}) done at {created_at}"
                         )
@@ -0,0 +1,158 @@
+"""
+Validation, limits & rate limiting for jobs submitted to the dashboard (`POST /api/jobs`).
+
+Settings are read from `JOBLISTER.job_submission` in app_settings.json. Submission is
+disabled unless `enabled` is true, as submitted jobs run programs on this machine.
+"""
+
+import json
+import threading
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from sqljobscheduler import configSetup
+
+DEFAULT_SETTINGS = {
+    "enabled": False,
+    # token -> user. Every request needs `Authorization: Bearer <token>` and its jobs are
+    # submitted as the user of the token. Submission stays disabled until a token is set.
+    "tokens": {},
+    "max_request_mb": 10,
+    "max_jobs_per_request": 10000,
+    "rate_limit_jobs_per_minute": 600,
+    "batch_size": 500,
+}
+
+
+class JobSubmission(BaseModel):
+    """One job, with the arguments of JobQueue.add_job"""
+
+    programPath: str = Field(..., min_length=1)
+    path2python_exec: str = Field(..., min_length=1)
+    parameters: Dict = Field(default_factory=dict)
+    email_address: Optional[str] = None
+    user: Optional[str] = None
+    python_env: Optional[str] = None
+    coalesce: bool = True
+    reuse_results: bool = False
+    gpu_mem_mb: Optional[int] = Field(None, gt=0)
+
+
+class SubmissionError(ValueError):
+    """Raised for a request that cannot be ingested, with the HTTP status to return"""
+
+    def __init__(self, status_code: int, detail: str, headers: Optional[Dict] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.headers = headers
+
+
+def get_submission_settings() -> Dict:
+    try:
+        settings = configSetup.get_app_settings().get("JOBLISTER", {})
+    except (OSError, ValueError):
+        settings = {}
+    return {**DEFAULT_SETTINGS, **(settings.get("job_submission") or {})}
+
+
+class RateLimiter:
+    """Token bucket per user: `rate` jobs per minute, up to a burst of `rate` jobs"""
+
+    def __init__(self, jobs_per_minute: float):
+        self.rate = jobs_per_minute / 60
+        self.capacity = jobs_per_minute
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, user: str, num_jobs: int) -> Tuple[int, float]:
+        """Take up to `num_jobs` tokens of a user
+
+        Returns:
+            tuple: Number of jobs that may be added now & seconds to wait before the rest
+                can be (0 if all may be added)
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(user, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - last) * self.rate)
+            granted = min(num_jobs, int(tokens))
+            self._buckets[user] = (tokens - granted, now)
+            if granted < num_jobs:
+                return granted, (num_jobs - tokens) / self.rate
+            return granted, 0.0
+
+
+def validate_job(item, index: int, token_user: Optional[str]) -> Dict:
+    """Validate one submitted job, returning the keyword arguments for add_job"""
+    if not isinstance(item, dict):
+        raise SubmissionError(422, f"Job {index}: expected a JSON object")
+    try:
+        job = JobSubmission(**item)
+    except ValueError as e:
+        raise SubmissionError(422, f"Job {index}: {e}")
+    kwargs = {
+        field: getattr(job, field)
+        for field in (
+            "programPath",
+            "path2python_exec",
+            "parameters",
+            "email_address",
+            "user",
+            "python_env",
+            "coalesce",
+            "reuse_results",
+            "gpu_mem_mb",
+        )
+    }
+    if token_user is not None:
+        kwargs["user"] = token_user
+    return kwargs
+
+
+async def read_limited(chunks: AsyncIterator[bytes], max_bytes: int) -> bytes:
+    """Read a request body, failing with 413 as soon as it exceeds max_bytes"""
+    body = bytearray()
+    async for chunk in chunks:
+        body += chunk
+        if len(body) > max_bytes:
+            raise SubmissionError(413, f"Request body exceeds {max_bytes} bytes")
+    return bytes(body)
+
+
+def parse_json_jobs(body: bytes) -> List:
+    """Jobs of a JSON body: a single job object or an array of jobs"""
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise SubmissionError(400, f"Invalid JSON: {e}")
+    return data if isinstance(data, list) else [data]
+
+
+async def iter_ndjson(
+    chunks: AsyncIterator[bytes], max_bytes: int
+) -> AsyncIterator[Tuple[int, object]]:
+    """Yield (line number, parsed JSON) of an NDJSON stream as its lines arrive"""
+    num_bytes = 0
+    line_no = 0
+    buffer = b""
+    async for chunk in chunks:
+        num_bytes += len(chunk)
+        if num_bytes > max_bytes:
+            raise SubmissionError(413, f"Request body exceeds {max_bytes} bytes")
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, _parse_ndjson_line(line, line_no)
+    if buffer.strip():
+        yield line_no + 1, _parse_ndjson_line(buffer, line_no + 1)
+
+
+def _parse_ndjson_line(line: bytes, line_no: int):
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        raise SubmissionError(400, f"Line {line_no}: invalid JSON: {e}")
@@ -0,0 +1,378 @@
+"""
+Benchmark of the queue storage: the JobQueue database vs an in-memory queue.
+
+`QueueBackend` holds the core queue operations the benchmark times: enqueue, claim,
+update, query, count & subscribe. It is only used here; the JobRunner, the dashboard and
+JobLister use JobQueue directly.
+
+- `SQLiteBackend`: the JobQueue database.
+- `MemoryBackend`: a heap of pending jobs & a dict of all jobs, as a baseline without disk
+  I/O. Nothing is persisted.
+
+`python -m sqljobscheduler.QueueStorage --backend memory --jobs 10000` runs the benchmark.
+"""
+
+import argparse
+import copy
+import heapq
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Tuple, runtime_checkable
+
+from sqljobscheduler.JobManager import (
+    Job,
+    JobQueue,
+    JobStatus,
+    get_job_hash,
+    to_epoch_us,
+)
+
+
+@runtime_checkable
+class QueueBackend(Protocol):
+    """Core operations of a job queue storage, as timed by benchmark"""
+
+    def enqueue(
+        self,
+        programPath: str,
+        path2python_exec: str,
+        parameters: Dict,
+        email_address: Optional[str] = None,
+        user: Optional[str] = None,
+        python_env: Optional[str] = None,
+        coalesce: bool = True,
+        gpu_mem_mb: Optional[int] = None,
+    ) -> int:
+        """Add a pending job (see JobQueue.add_job)
+
+        Returns:
+            int: ID of the job (of the identical queued job if coalesced)
+        """
+        ...
+
+    def claim(self) -> Optional[Job]:
+        """Mark the oldest pending job as running
+
+        Returns:
+            Optional[Job]: The claimed job, None if no job is pending
+        """
+        ...
+
+    def update(
+        self, job_id: int, status: JobStatus, error_message: Optional[str] = None
+    ) -> None:
+        """Set the status of a job (running, completed or failed)"""
+        ...
+
+    def query(
+        self,
+        status: Optional[JobStatus] = None,
+        user: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Job]:
+        """Get jobs, newest first, with the filters of JobQueue.query_jobs"""
+        ...
+
+    def count(self) -> Dict[str, int]:
+        """Count jobs per status"""
+        ...
+
+    def subscribe(self, cursor: Optional[str] = None) -> Tuple[List[Job], str]:
+        """Get the jobs added or updated since `cursor`
+
+        Args:
+            cursor (str, optional): Cursor returned by the previous call. If None, no jobs
+                are returned, only the cursor of the latest change.
+
+        Returns:
+            tuple: Changed jobs (oldest change first) & the cursor to pass next time
+        """
+        ...
+
+
+class SQLiteBackend(JobQueue):
+    """The JobQueue database as a QueueBackend"""
+
+    def enqueue(
+        self,
+        programPath: str,
+        path2python_exec: str,
+        parameters: Dict,
+        email_address: Optional[str] = None,
+        user: Optional[str] = None,
+        python_env: Optional[str] = None,
+        coalesce: bool = True,
+        gpu_mem_mb: Optional[int] = None,
+    ) -> int:
+        return self.add_job(
+            programPath,
+            path2python_exec,
+            parameters,
+            email_address=email_address,
+            user=user,
+            python_env=python_env,
+            coalesce=coalesce,
+            gpu_mem_mb=gpu_mem_mb,
+        )
+
+    def claim(self) -> Optional[Job]:
+        # Like the JobRunner, assumes a single process claims jobs
+        job = self.get_next_pending_job()
+        if job is None:
+            return None
+        self.update_job_status(job.id, JobStatus.RUNNING)
+        return self.get_job(job.id)
+
+    def update(
+        self, job_id: int, status: JobStatus, error_message: Optional[str] = None
+    ) -> None:
+        self.update_job_status(job_id, JobStatus(status), error_message)
+
+    def query(
+        self,
+        status: Optional[JobStatus] = None,
+        user: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Job]:
+        return self.query_jobs(
+            status=status,
+            user=user,
+            since=since,
+            until=until,
+            limit=limit,
+            params=params,
+        )
+
+    def count(self) -> Dict[str, int]:
+        return self.count_jobs_by_status()
+
+    def subscribe(self, cursor: Optional[str] = None) -> Tuple[List[Job], str]:
+        if cursor is None:
+            return [], str(self.get_last_change_seq())
+        jobs, change_seq = self.get_jobs_changed_since(int(cursor))
+        return jobs, str(change_seq)
+
+
+class MemoryBackend:
+    """In-memory queue: a dict of all jobs (in id order) & a heap of the pending ones
+
+    Enqueue, claim & update are O(log n), so benchmarks measure the scheduling logic rather
+    than the storage. Jobs are returned as copies, like jobs read from a database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, Job] = {}
+        # (created_at, id) of pending jobs. Jobs that left pending are skipped when popped
+        self._pending: List[Tuple[int, int]] = []
+        # Hash of every pending or running job, for coalescing
+        self._queued_hashes: Dict[str, int] = {}
+        self._counts = Counter()
+        # Change sequence number of every job, in the order of their last change
+        self._changes: "OrderedDict[int, int]" = OrderedDict()
+        self._next_id = 1
+        self._change_seq = 0
+
+    def _record_change(self, job_id: int) -> None:
+        self._change_seq += 1
+        self._changes[job_id] = self._change_seq
+        self._changes.move_to_end(job_id)
+
+    def _set_status(self, job: Job, status: JobStatus) -> None:
+        self._counts[job.status.value] -= 1
+        self._counts[status.value] += 1
+        job.status = status
+
+    def enqueue(
+        self,
+        programPath: str,
+        path2python_exec: str,
+        parameters: Dict,
+        email_address: Optional[str] = None,
+        user: Optional[str] = None,
+        python_env: Optional[str] = None,
+        coalesce: bool = True,
+        gpu_mem_mb: Optional[int] = None,
+    ) -> int:
+        job_hash = get_job_hash(programPath, path2python_exec, python_env, parameters)
+        with self._lock:
+            if coalesce and job_hash in self._queued_hashes:
+                return self._queued_hashes[job_hash]
+            job_id = self._next_id
+            self._next_id += 1
+            now = datetime.now()
+            self._jobs[job_id] = Job(
+                id=job_id,
+                programPath=programPath,
+                path2python_exec=path2python_exec,
+                parameters=copy.deepcopy(parameters),
+                created_at=now,
+                started_at=None,
+                completed_at=None,
+                status=JobStatus.PENDING,
+                error_message=None,
+                python_env=python_env,
+                email_address=email_address,
+                user=user,
+                job_hash=job_hash,
+                gpu_mem_mb=gpu_mem_mb,
+            )
+            heapq.heappush(self._pending, (to_epoch_us(now), job_id))
+            self._queued_hashes.setdefault(job_hash, job_id)
+            self._counts[JobStatus.PENDING.value] += 1
+            self._record_change(job_id)
+            return job_id
+
+    def claim(self) -> Optional[Job]:
+        with self._lock:
+            while self._pending:
+                _, job_id = heapq.heappop(self._pending)
+                job = self._jobs[job_id]
+                if job.status == JobStatus.PENDING:
+                    self._update(job, JobStatus.RUNNING, None)
+                    return copy.copy(job)
+            return None
+
+    def update(
+        self, job_id: int, status: JobStatus, error_message: Optional[str] = None
+    ) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._update(job, JobStatus(status), error_message)
+
+    def _update(
+        self, job: Job, status: JobStatus, error_message: Optional[str]
+    ) -> None:
+        now = datetime.now()
+        if status == JobStatus.RUNNING:
+            job.started_at = now
+        elif status in (JobStatus.COMPLETED, JobStatus.FAILED):
+            job.completed_at = now
+            job.error_message = error_message
+            if self._queued_hashes.get(job.job_hash) == job.id:
+                del self._queued_hashes[job.job_hash]
+        else:
+            return
+        self._set_status(job, status)
+        self._record_change(job.id)
+
+    def query(
+        self,
+        status: Optional[JobStatus] = None,
+        user: Optional[str] = None,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> List[Job]:
+        status = JobStatus(status) if status is not None else None
+        jobs = []
+        with self._lock:
+            # Ids are given in creation order, so newest first is reverse id order
+            for job in reversed(self._jobs.values()):
+                if limit is not None and len(jobs) >= limit:
+                    break
+                if since is not None and job.created_at < since:
+                    break
+                if (
+                    (status is not None and job.status != status)
+                    or (user is not None and job.user != user)
+                    or (until is not None and job.created_at >= until)
+                    or (
+                        params
+                        and any(
+                            job.parameters.get(key) != value
+                            for key, value in params.items()
+                        )
+                    )
+                ):
+                    continue
+                jobs.append(copy.copy(job))
+        return jobs
+
+    def count(self) -> Dict[str, int]:
+        with self._lock:
+            return {status.value: self._counts[status.value] for status in JobStatus}
+
+    def subscribe(self, cursor: Optional[str] = None) -> Tuple[List[Job], str]:
+        with self._lock:
+            if cursor is None:
+                return [], str(self._change_seq)
+            change_seq = int(cursor)
+            changed = []
+            for job_id, job_change_seq in reversed(self._changes.items()):
+                if job_change_seq <= change_seq:
+                    break
+                changed.append(copy.copy(self._jobs[job_id]))
+            changed.reverse()
+            return changed, str(self._change_seq)
+
+
+BACKENDS = {
+    "sqlite": SQLiteBackend,
+    "memory": MemoryBackend,
+}
+
+
+def benchmark(backend: QueueBackend, num_jobs: int) -> Dict[str, float]:
+    """Time enqueueing, then claiming & completing, `num_jobs` jobs
+
+    Returns:
+        Dict[str, float]: Operations per second of each phase & the time of a query (ms)
+    """
+    results = {}
+    start = time.perf_counter()
+    for i in range(num_jobs):
+        backend.enqueue(
+            "/benchmark/job.py",
+            "python",
+            {"task": i},
+            user=f"user{i % 8}",
+            coalesce=False,
+        )
+    results["enqueue_per_s"] = num_jobs / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    backend.query(status=JobStatus.PENDING, limit=1000)
+    results["query_ms"] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    while (job := backend.claim()) is not None:
+        backend.update(job.id, JobStatus.COMPLETED)
+    results["claim_complete_per_s"] = num_jobs / (time.perf_counter() - start)
+    return results
+
+
+def main(args):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.backend == "sqlite":
+            backend = SQLiteBackend(Path(tmp_dir) / "queue.db")
+        else:
+            backend = MemoryBackend()
+        results = benchmark(backend, args.jobs)
+    print(
+        f"{args.backend}: {args.jobs} jobs | "
+        f"enqueue {results['enqueue_per_s']:.0f}/s | "
+        f"claim+complete {results['claim_complete_per_s']:.0f}/s | "
+        f"query 1000 pending {results['query_ms']:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark a queue storage backend (in a temporary directory)"
+    )
+    parser.add_argument("--backend", choices=list(BACKENDS), default="memory")
+    parser.add_argument("--jobs", type=int, default=10000)
+    main(parser.parse_args())
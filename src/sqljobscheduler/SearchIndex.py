@@ -0,0 +1,295 @@
+"""
+Full-text search (SQLite FTS5) over jobs and logs.
+
+- `job_search`: one row per job (rowid = job id) with its program, parameters, error
+  message and the tmux log captured when it failed (`logs/tmux/tmux_<id>_*.log`). Rows of
+  archived jobs are kept, so search covers the archive (attached as `archive`) as well.
+- `log_search`: one row per line of the JobRunner logs (`logs/job_runner/JR_*.log`).
+- `search_indexed_files`: how much of each log file is indexed, so logs are indexed
+  incrementally as they grow and dropped when they are removed or rotated.
+"""
+
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS job_search USING fts5(
+        programPath, parameters, error_message, tmux_log
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS log_search USING fts5(
+        log_file UNINDEXED, line_no UNINDEXED, line
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_indexed_files (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        num_lines INTEGER NOT NULL
+    )
+    """,
+]
+
+TMUX_LOG_PATTERN = re.compile(r"tmux_(\d+)_.*\.log$")
+# Words around a match shown in search results
+SNIPPET_TOKENS = 16
+
+
+def index_job(
+    conn: sqlite3.Connection, job_id: int, tmux_log: Optional[str] = None
+) -> None:
+    """(Re)index the searchable fields of a job, keeping its tmux log unless one is given"""
+    schemas = ["main", "archive"] if _has_archive(conn) else ["main"]
+    for schema in schemas:
+        row = conn.execute(
+            f"SELECT programPath, parameters, error_message FROM {schema}.jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is not None:
+            break
+    else:
+        return
+    if tmux_log is None:
+        indexed = conn.execute(
+            "SELECT tmux_log FROM job_search WHERE rowid = ?", (job_id,)
+        ).fetchone()
+        tmux_log = indexed[0] if indexed else None
+
+    conn.execute("DELETE FROM job_search WHERE rowid = ?", (job_id,))
+    conn.execute(
+        """
+        INSERT INTO job_search (rowid, programPath, parameters, error_message, tmux_log)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (job_id, row[0], _flatten_parameters(row[1]), row[2], tmux_log),
+    )
+
+
+def _flatten_parameters(parameters_json: str) -> str:
+    """Parameters as 'key value' text, so keys & values are searchable words"""
+    try:
+        parameters = json.loads(parameters_json)
+    except (TypeError, ValueError):
+        return parameters_json or ""
+    if not isinstance(parameters, dict):
+        return str(parameters)
+    return " ".join(f"{key} {value}" for key, value in parameters.items())
+
+
+def _has_archive(conn: sqlite3.Connection) -> bool:
+    """Whether the archive database is attached to `conn`"""
+    return any(row[1] == "archive" for row in conn.execute("PRAGMA database_list"))
+
+
+def index_jobs(conn: sqlite3.Connection, rows: Iterable[Tuple]) -> None:
+    """Index jobs given as (id, programPath, parameters, error_message) rows"""
+    conn.executemany(
+        """
+        INSERT INTO job_search (rowid, programPath, parameters, error_message)
+        VALUES (?, ?, ?, ?)
+        """,
+        (
+            (job_id, programPath, _flatten_parameters(parameters), error_message)
+            for job_id, programPath, parameters, error_message in rows
+        ),
+    )
+
+
+def backfill_jobs(conn: sqlite3.Connection) -> None:
+    """Index every job in the database & the archive (logs are indexed by index_logs)"""
+    conn.execute("DELETE FROM job_search")
+    index_jobs(
+        conn,
+        conn.execute(
+            "SELECT id, programPath, parameters, error_message FROM main.jobs"
+        ),
+    )
+    if _has_archive(conn):
+        # Ids of archived jobs could be reused before migration 11; the queue's job wins
+        index_jobs(
+            conn,
+            conn.execute(
+                """
+                SELECT id, programPath, parameters, error_message FROM archive.jobs
+                WHERE id NOT IN (SELECT id FROM main.jobs)
+                """
+            ),
+        )
+
+
+def _read_new_lines(path: Path, offset: int) -> Tuple[List[str], int]:
+    """Read the complete lines of a file after a byte offset
+
+    Returns:
+        tuple: the lines & the offset after the last complete line
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    lines = data[:end].decode(errors="replace").splitlines()
+    return lines, offset + end
+
+
+def index_logs(conn: sqlite3.Connection, log_dir: Path) -> int:
+    """Index what changed in the JobRunner & tmux logs since the last call
+
+    JobRunner logs are indexed line by line from where the last call stopped. A log that
+    shrank (rewritten) is indexed again from the start, and the lines of removed logs are
+    dropped. tmux failure logs are attached to the job of their file name.
+
+    Returns:
+        int: Number of new rows indexed
+    """
+    log_dir = Path(log_dir)
+    indexed = {
+        path: (size, num_lines)
+        for path, size, num_lines in conn.execute(
+            "SELECT path, size, num_lines FROM search_indexed_files"
+        )
+    }
+    runner_logs = {
+        str(path): path for path in (log_dir / "job_runner").glob("JR_*.log")
+    }
+    tmux_logs = {str(path): path for path in (log_dir / "tmux").glob("tmux_*.log")}
+    num_indexed = 0
+
+    for path_str in set(indexed) - set(runner_logs) - set(tmux_logs):
+        conn.execute("DELETE FROM log_search WHERE log_file = ?", (path_str,))
+        conn.execute("DELETE FROM search_indexed_files WHERE path = ?", (path_str,))
+
+    for path_str, path in runner_logs.items():
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            continue
+        indexed_size, num_lines = indexed.get(path_str, (0, 0))
+        if size == indexed_size:
+            continue
+        if size < indexed_size:
+            conn.execute("DELETE FROM log_search WHERE log_file = ?", (path_str,))
+            indexed_size, num_lines = 0, 0
+
+        lines, new_size = _read_new_lines(path, indexed_size)
+        conn.executemany(
+            "INSERT INTO log_search (log_file, line_no, line) VALUES (?, ?, ?)",
+            [
+                (path_str, num_lines + i + 1, line)
+                for i, line in enumerate(lines)
+                if line.strip()
+            ],
+        )
+        num_indexed += len(lines)
+        _set_indexed(conn, path_str, new_size, num_lines + len(lines))
+
+    for path_str, path in tmux_logs.items():
+        match = TMUX_LOG_PATTERN.search(path.name)
+        if match is None:
+            continue
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            continue
+        if indexed.get(path_str, (None, None))[0] == size:
+            continue
+        index_job(conn, int(match.group(1)), tmux_log=path.read_text(errors="replace"))
+        num_indexed += 1
+        _set_indexed(conn, path_str, size, 0)
+
+    return num_indexed
+
+
+def _set_indexed(conn: sqlite3.Connection, path: str, size: int, num_lines: int):
+    conn.execute(
+        """
+        INSERT INTO search_indexed_files (path, size, num_lines) VALUES (?, ?, ?)
+        ON CONFLICT (path) DO UPDATE SET size = excluded.size, num_lines = excluded.num_lines
+        """,
+        (path, size, num_lines),
+    )
+
+
+def _quote_query(query: str) -> str:
+    """Match every word literally (for queries that are not valid FTS5 syntax)"""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in query.split())
+
+
+def search(conn: sqlite3.Connection, query: str, limit: int = 50) -> List[Dict]:
+    """Search jobs & logs, best matches (BM25) first
+
+    The query supports FTS5 syntax (AND/OR/NOT, "phrases", prefix*, column:word). Queries
+    that are not valid FTS5 syntax are searched as plain words.
+    """
+    try:
+        return _search(conn, query, limit)
+    except sqlite3.OperationalError:
+        return _search(conn, _quote_query(query), limit)
+
+
+def _search(conn: sqlite3.Connection, query: str, limit: int) -> List[Dict]:
+    names = ("id", "programPath", "status", "created_at", "user")
+    if _has_archive(conn):
+        # A job is in the queue or else in the archive
+        jobs_sql = """
+            LEFT JOIN main.jobs q ON q.id = s.rowid
+            LEFT JOIN archive.jobs a ON a.id = s.rowid AND q.id IS NULL
+        """
+        columns = {name: f"COALESCE(q.{name}, a.{name})" for name in names}
+    else:
+        jobs_sql = "JOIN main.jobs q ON q.id = s.rowid"
+        columns = {name: f"q.{name}" for name in names}
+    job_rows = conn.execute(
+        f"""
+        SELECT s.rowid, {columns["programPath"]}, {columns["status"]},
+               datetime({columns["created_at"]} / 1000000, 'unixepoch', 'localtime'),
+               {columns["user"]},
+               snippet(job_search, -1, '[', ']', '...', {SNIPPET_TOKENS}), s.rank
+        FROM job_search s
+        {jobs_sql}
+        WHERE job_search MATCH ? AND {columns["id"]} IS NOT NULL
+        ORDER BY s.rank
+        LIMIT ?
+        """,
+        (query, limit),
+    ).fetchall()
+    log_rows = conn.execute(
+        f"""
+        SELECT log_file, line_no,
+               snippet(log_search, 2, '[', ']', '...', {SNIPPET_TOKENS}), rank
+        FROM log_search
+        WHERE log_search MATCH ?
+        ORDER BY rank
+        LIMIT ?
+        """,
+        (query, limit),
+    ).fetchall()
+
+    results = [
+        {
+            "type": "job",
+            "job_id": job_id,
+            "program": programPath,
+            "status": status,
+            "created_at": created_at,
+            "user": user,
+            "snippet": snippet,
+            "rank": rank,
+        }
+        for job_id, programPath, status, created_at, user, snippet, rank in job_rows
+    ] + [
+        {
+            "type": "log",
+            "log_file": Path(log_file).name,
+            "line_no": line_no,
+            "snippet": snippet,
+            "rank": rank,
+        }
+        for log_file, line_no, snippet, rank in log_rows
+    ]
+    # BM25 ranks are negative, lower is better
+    return sorted(results, key=lambda result: result["rank"])[:limit]
@@ -0,0 +1,169 @@
+"""
+Benchmark of the job timestamp storage: ISO text (before migration 9) vs epoch microseconds.
+
+Two copies of the same synthetic jobs table are written to a temporary directory, one with
+ISO text timestamps and one with integer epoch microseconds, and the queries that use the
+timestamps are timed on both: a 7-day range via the created_at index, a sort on started_at
+(no index), the total run time, and decoding the three timestamps of every job.
+
+`python -m sqljobscheduler.TimestampBenchmark --jobs 1000000` runs it on 1M jobs.
+"""
+
+import argparse
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict
+
+from sqljobscheduler.JobManager import from_epoch_us, to_epoch_us
+
+FORMATS = ("text", "int")
+# Jobs are spread over this many days before now
+SPAN_DAYS = 365
+
+
+def _encode(value: datetime, fmt: str):
+    return value.isoformat() if fmt == "text" else to_epoch_us(value)
+
+
+def create_jobs_db(db_path: Path, num_jobs: int, fmt: str, seed: int = 0) -> None:
+    """Jobs table with `num_jobs` completed jobs & their timestamps stored as `fmt`"""
+    column_type = "TIMESTAMP" if fmt == "text" else "INTEGER"
+    rng = random.Random(seed)
+    end = datetime.now()
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(f"""
+            CREATE TABLE jobs (
+                id INTEGER PRIMARY KEY,
+                programPath TEXT NOT NULL,
+                parameters TEXT NOT NULL,
+                created_at {column_type} NOT NULL,
+                started_at {column_type},
+                completed_at {column_type},
+                status TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX idx_jobs_created ON jobs (created_at, id)")
+
+        def _rows():
+            for i in range(num_jobs):
+                created = end - timedelta(
+                    days=SPAN_DAYS * (num_jobs - i) / num_jobs,
+                    microseconds=rng.randrange(1_000_000),
+                )
+                started = created + timedelta(seconds=rng.uniform(0, 3600))
+                completed = started + timedelta(seconds=rng.uniform(1, 7200))
+                yield (
+                    f"/data/analysis/program_{i % 20}.py",
+                    f'{{"session": "s{i % 500}", "plane": {i % 4}}}',
+                    _encode(created, fmt),
+                    _encode(started, fmt),
+                    _encode(completed, fmt),
+                    "completed",
+                )
+
+        conn.executemany(
+            "INSERT INTO jobs (programPath, parameters, created_at, started_at, completed_at, status) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            _rows(),
+        )
+    conn.close()
+
+
+def _best_ms(func: Callable, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def benchmark(db_path: Path, fmt: str, repeat: int = 3) -> Dict[str, float]:
+    """Time the timestamp queries on a database written by create_jobs_db
+
+    Returns:
+        Dict[str, float]: File size (MB) & the best time of each query (ms)
+    """
+    range_end = datetime.now() - timedelta(days=SPAN_DAYS // 2)
+    range_start = range_end - timedelta(days=7)
+    if fmt == "text":
+        duration_sql = "SUM((julianday(completed_at) - julianday(started_at)) * 86400)"
+        decode = datetime.fromisoformat
+    else:
+        duration_sql = "SUM(completed_at - started_at) / 1e6"
+        decode = from_epoch_us
+
+    conn = sqlite3.connect(db_path)
+    try:
+        timestamp_rows = conn.execute(
+            "SELECT created_at, started_at, completed_at FROM jobs"
+        ).fetchall()
+
+        def _decode_all():
+            for created_at, started_at, completed_at in timestamp_rows:
+                decode(created_at)
+                decode(started_at)
+                decode(completed_at)
+
+        return {
+            "size_mb": db_path.stat().st_size / 1e6,
+            "range_7d_ms": _best_ms(
+                lambda: conn.execute(
+                    "SELECT * FROM jobs WHERE created_at >= ? AND created_at < ? ORDER BY created_at, id",
+                    (_encode(range_start, fmt), _encode(range_end, fmt)),
+                ).fetchall(),
+                repeat,
+            ),
+            "sort_started_ms": _best_ms(
+                lambda: conn.execute(
+                    "SELECT id FROM jobs ORDER BY started_at"
+                ).fetchall(),
+                repeat,
+            ),
+            "sum_duration_ms": _best_ms(
+                lambda: conn.execute(f"SELECT {duration_sql} FROM jobs").fetchone(),
+                repeat,
+            ),
+            "decode_ms": _best_ms(_decode_all, repeat),
+        }
+    finally:
+        conn.close()
+
+
+def main(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for fmt in FORMATS:
+            db_path = Path(tmp_dir) / f"jobs_{fmt}.db"
+            start = time.perf_counter()
+            create_jobs_db(db_path, args.jobs, fmt)
+            print(
+                f"Wrote {args.jobs} jobs with {fmt} timestamps in {time.perf_counter() - start:.1f} s"
+            )
+            results[fmt] = benchmark(db_path, fmt, args.repeat)
+
+    print(f"\n{args.jobs} jobs, best of {args.repeat} runs (text -> int):")
+    labels = {
+        "size_mb": ("file size", "MB"),
+        "range_7d_ms": ("7-day range, rows via index", "ms"),
+        "sort_started_ms": ("ORDER BY started_at (no index)", "ms"),
+        "sum_duration_ms": ("SUM(completed_at - started_at)", "ms"),
+        "decode_ms": (f"decode 3 timestamps x {args.jobs}", "ms"),
+    }
+    for key, (label, unit) in labels.items():
+        print(
+            f"  {label:<36} {results['text'][key]:8.1f} {unit} -> {results['int'][key]:8.1f} {unit}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark ISO text vs epoch microsecond job timestamps (in a temporary directory)"
+    )
+    parser.add_argument("--jobs", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each query")
+    main(parser.parse_args())
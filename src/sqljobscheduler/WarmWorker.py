@@ -0,0 +1,338 @@
+"""
+Warm workers for python jobs with heavy imports.
+
+A warm worker is a long-lived interpreter (one per python env) that imports the configured
+modules once and then forks a child for every job, which runs the job's program via `runpy`.
+Children share the imported modules with the worker copy-on-write, and each job still runs
+in its own process.
+
+This module only uses the standard library as the worker is started with the python of the
+job's env, which does not need to have sqljobscheduler installed.
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import os
+import runpy
+import select
+import signal
+import socket
+import subprocess
+import sys
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional
+
+READY_TIMEOUT = 600
+# Variables the JobRunner sets per job (not per env), passed from the client to the job, as
+# the worker was started with the env's variables only
+JOB_ENV_VARS = ("CUDA_VISIBLE_DEVICES",)
+
+
+def _send_msg(conn: socket.socket, msg: dict) -> None:
+    conn.sendall((json.dumps(msg) + "\n").encode())
+
+
+def _recv_msg(conn_file) -> Optional[dict]:
+    line = conn_file.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def _run_job_in_child(request: dict, fds: List[int]) -> None:
+    """Runs inside the forked child. Never returns."""
+    exit_code = 1
+    try:
+        os.setsid()
+        # stdin/stdout/stderr of the client become the job's (e.g. the tmux pane)
+        for target_fd, fd in enumerate(fds[:3]):
+            os.dup2(fd, target_fd)
+        for fd in fds:
+            if fd > 2:
+                os.close(fd)
+        sys.stdout = os.fdopen(1, "w", buffering=1, closefd=False)
+        sys.stderr = os.fdopen(2, "w", buffering=1, closefd=False)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+        # Variables set for this job only, e.g. the GPU it was packed on
+        for name, value in request.get("env", {}).items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        os.chdir(request["cwd"])
+        program = request["program"]
+        sys.argv = [program] + request["args"]
+        sys.path[0] = str(Path(program).resolve().parent)
+
+        runpy.run_path(program, run_name="__main__")
+        exit_code = 0
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+def serve(socket_path: str, preimport: List[str]) -> None:
+    """Preimport modules, then fork a child per job request received on the socket"""
+    for module in preimport:
+        start = time.time()
+        importlib.import_module(module)
+        print(f"Preimported {module} in {time.time() - start:.1f}s", flush=True)
+
+    Path(socket_path).unlink(missing_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen()
+    print(f"Warm worker ready on {socket_path}", flush=True)
+
+    children: Dict[int, socket.socket] = {}
+    try:
+        while True:
+            readable, _, _ = select.select([server], [], [], 1.0)
+            if readable:
+                conn, _ = server.accept()
+                try:
+                    msg, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+                    request = json.loads(msg.decode().strip())
+                except Exception as e:
+                    print(f"Invalid job request: {e}", flush=True)
+                    conn.close()
+                    continue
+
+                pid = os.fork()
+                if pid == 0:
+                    server.close()
+                    conn.close()
+                    _run_job_in_child(request, fds)
+
+                for fd in fds:
+                    os.close(fd)
+                children[pid] = conn
+                _send_msg(conn, {"pid": pid})
+
+            # Reap finished jobs and report their exit code to the waiting client
+            while children:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if pid == 0:
+                    break
+                conn = children.pop(pid, None)
+                if conn is not None:
+                    try:
+                        _send_msg(
+                            conn, {"returncode": os.waitstatus_to_exitcode(status)}
+                        )
+                    except OSError:
+                        pass
+                    conn.close()
+    finally:
+        server.close()
+        Path(socket_path).unlink(missing_ok=True)
+
+
+def run(
+    socket_path: str, program: str, args: List[str], pid_file: Optional[str] = None
+) -> int:
+    """Submit a job to a warm worker and wait for it, returning the job's exit code
+
+    The job gets this process's stdin/stdout/stderr, so its output shows up wherever this
+    command is run (e.g. the job's tmux session). The job is forked by the worker, not by
+    this process, so its pid is written to `pid_file` (while it runs) for whoever needs to
+    find its processes, e.g. to measure its GPU memory.
+    """
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.connect(socket_path)
+    request = {
+        "program": program,
+        "args": args,
+        "cwd": os.getcwd(),
+        "env": {name: os.environ.get(name) for name in JOB_ENV_VARS},
+    }
+    socket.send_fds(conn, [(json.dumps(request) + "\n").encode()], [0, 1, 2])
+
+    conn_file = conn.makefile("r")
+    started = _recv_msg(conn_file)
+    if started is None:
+        conn.close()
+        print(
+            f"Warm worker on {socket_path} exited before starting {program}",
+            file=sys.stderr,
+        )
+        return 1
+    job_pid = started["pid"]
+    if pid_file is not None:
+        Path(pid_file).write_text(str(job_pid))
+
+    def _forward_signal(signum, frame):
+        try:
+            os.killpg(job_pid, signum)
+        except ProcessLookupError:
+            pass
+
+    signal.signal(signal.SIGINT, _forward_signal)
+    signal.signal(signal.SIGTERM, _forward_signal)
+
+    try:
+        reply = _recv_msg(conn_file)
+    finally:
+        conn.close()
+        if pid_file is not None:
+            Path(pid_file).unlink(missing_ok=True)
+    if reply is None:
+        print("Warm worker exited before the job finished", file=sys.stderr)
+        return 1
+    return reply["returncode"]
+
+
+class WarmWorkerPool:
+    """Keeps one warm worker per python env alive for the JobRunner"""
+
+    def __init__(self, socket_dir: Path, worker_settings: Optional[Dict] = None):
+        self.socket_dir = Path(socket_dir)
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        worker_settings = worker_settings or {}
+        self.enabled = bool(worker_settings.get("enabled", False))
+        self.env_settings = worker_settings.get("envs", {})
+        self._workers: Dict[str, subprocess.Popen] = {}
+        self._signatures: Dict[str, tuple] = {}
+
+    def uses_warm_worker(self, env_name: Optional[str]) -> bool:
+        """Whether jobs of the env should run in a warm worker"""
+        return self.enabled and env_name is not None and env_name in self.env_settings
+
+    def socket_path(self, env_name: str) -> Path:
+        return self.socket_dir / f"{env_name}.sock"
+
+    def get_worker(
+        self,
+        env_name: str,
+        python_exec: str,
+        env_vars: Optional[Dict[str, str]] = None,
+        cpu_affinity: Optional[str] = None,
+    ) -> Path:
+        """Get the socket of the env's worker, (re)starting the worker if needed
+
+        The worker is restarted if it died or if the env it was started with changed.
+        """
+        signature = (python_exec, tuple(sorted((env_vars or {}).items())), cpu_affinity)
+        worker = self._workers.get(env_name)
+        if (
+            worker is not None
+            and worker.poll() is None
+            and self._signatures.get(env_name) == signature
+        ):
+            return self.socket_path(env_name)
+
+        self.stop_worker(env_name)
+        sock = self.socket_path(env_name)
+        sock.unlink(missing_ok=True)
+
+        cmd = [] if cpu_affinity is None else ["taskset", "-c", cpu_affinity]
+        cmd += [python_exec, __file__, "serve", "--socket", str(sock)]
+        cmd += self.env_settings.get(env_name, {}).get("preimport", [])
+
+        logging.info(f"Starting warm worker for env '{env_name}'")
+        with open(self.socket_dir / f"{env_name}.log", "a") as worker_log:
+            worker = subprocess.Popen(
+                cmd,
+                env={**os.environ, **(env_vars or {})},
+                start_new_session=True,
+                stdout=worker_log,
+                stderr=subprocess.STDOUT,
+            )
+        start = time.time()
+        while not sock.exists():
+            if worker.poll() is not None:
+                raise RuntimeError(
+                    f"Warm worker for env '{env_name}' exited with code {worker.returncode}"
+                )
+            if time.time() - start > READY_TIMEOUT:
+                worker.kill()
+                raise RuntimeError(f"Warm worker for env '{env_name}' did not start")
+            time.sleep(0.5)
+        logging.info(
+            f"Warm worker for env '{env_name}' ready in {time.time() - start:.1f}s"
+        )
+
+        self._workers[env_name] = worker
+        self._signatures[env_name] = signature
+        return sock
+
+    def stop_worker(self, env_name: str) -> None:
+        worker = self._workers.pop(env_name, None)
+        self._signatures.pop(env_name, None)
+        if worker is not None and worker.poll() is None:
+            worker.terminate()
+            try:
+                worker.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+
+    def shutdown(self) -> None:
+        for env_name in list(self._workers):
+            self.stop_worker(env_name)
+
+    def get_pid_file(self, job_id: int) -> Path:
+        """File holding the pid of a job running in a warm worker (see run)"""
+        return self.socket_dir / f"job_{job_id}.pid"
+
+    def build_command(
+        self, env_name: str, program: str, job_id: Optional[int] = None
+    ) -> List[str]:
+        """Command (before job parameters) that runs the program in the env's worker"""
+        cmd = [
+            sys.executable,
+            __file__,
+            "run",
+            "--socket",
+            str(self.socket_path(env_name)),
+        ]
+        if job_id is not None:
+            cmd += ["--pidFile", str(self.get_pid_file(job_id))]
+        return cmd + ["--", program]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm worker for python jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Start a warm worker")
+    serve_parser.add_argument("--socket", required=True, help="Path of the socket")
+    serve_parser.add_argument("preimport", nargs="*", help="Modules to preimport")
+
+    run_parser = subparsers.add_parser("run", help="Run a program in a warm worker")
+    run_parser.add_argument("--socket", required=True, help="Path of the socket")
+    run_parser.add_argument(
+        "--pidFile", help="File to write the pid of the job to while it runs"
+    )
+    run_parser.add_argument("program", help="Path to the program to run")
+    run_parser.add_argument("args", nargs=argparse.REMAINDER, help="Program arguments")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.socket, args.preimport)
+    else:
+        sys.exit(run(args.socket, args.program, args.args, args.pidFile))
+
+
+if __name__ == "__main__":
+    main()
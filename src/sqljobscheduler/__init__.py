@@ -1,34 +1,116 @@
 """
 SQL Job Scheduler - A system for managing GPU-intensive Python jobs
+
+Submodules & their public names are imported lazily on first access (PEP 562), so e.g.
+`from sqljobscheduler import LockFileUtils` does not import libtmux, cryptography or psutil.
 """
 
+import importlib
 import os
+import sys
+import types
+
 
-import tomli
+__all__ = ["LockFileUtils", "JobManager", "JobLister", "EmailNotifier", "JobRunner"]
 
-try:
-    with open("pyproject.toml", "rb") as f:
-        pyproject = tomli.load(f)
-        __version__ = pyproject["project"]["version"]
-except Exception:
-    __version__ = "unknown"
+# Public names of the submodules available as `sqljobscheduler.<name>`
+_EXPORTS = {
+    "LockFileUtils": [
+        "GPU_LOCK_FILE",
+        "check_gpu_lock_file",
+        "gpu_lock_check_timer",
+        "remove_gpu_lock_file",
+        "create_gpu_lock_file",
+        "get_current_gpu_job",
+        "run_script_Wgpu_lock",
+        "lock_file_argparser",
+    ],
+    "JobManager": [
+        "get_JobRunner_pid",
+        "get_job_hash",
+        "get_input_fingerprint",
+        "get_histogram_bin",
+        "get_histogram_bin_value",
+        "get_num_array_tasks",
+        "get_array_task_parameters",
+        "get_param_column",
+        "parse_param_value",
+        "STATS_PERCENTILES",
+        "JobStatus",
+        "StatsBucket",
+        "Job",
+        "JobArray",
+        "JobQueue",
+    ],
+    "JobLister": [
+        "shorten_path",
+        "get_basename",
+        "format_job_row",
+        "job_to_record",
+        "parse_param_filter",
+        "write_jobs",
+        "watch_jobs",
+        "print_job_arrays",
+        "print_summary",
+        "print_search_results",
+    ],
+    "EmailNotifier": ["CredentialsManager"],
+    "JobRunner": ["RunningJob", "get_next_quarter", "get_next_hour"],
+}
+_NAME_TO_MODULE = {name: module for module, names in _EXPORTS.items() for name in names}
+# Submodules named after their main class: `sqljobscheduler.<name>` is the class, as it was
+# when every submodule was star-imported. The submodule stays importable by its full name.
+_CLASS_EXPORTS = {"EmailNotifier", "JobRunner"}
 
 
-__all__ = ["LockFileUtils", "JobManager", "JobLister", "EmailNotifier", "JobRunner"]
+def _get_version() -> str:
+    # importlib.metadata is slow to import, so only on first access of __version__
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("sqljobscheduler")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def __getattr__(name: str):
+    if name == "__version__":
+        globals()[name] = _get_version()
+        return globals()[name]
+    if name in _NAME_TO_MODULE or name in _CLASS_EXPORTS:
+        module_name = _NAME_TO_MODULE.get(name, name)
+        module = importlib.import_module(f".{module_name}", __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    try:
+        return importlib.import_module(f".{name}", __name__)
+    except ModuleNotFoundError as e:
+        if e.name != f"{__name__}.{name}":
+            raise
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name: str, value):
+        # Importing a submodule binds it on the package; keep the class instead
+        if name in _CLASS_EXPORTS and isinstance(value, types.ModuleType):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
+
+def __dir__():
+    return sorted(
+        set(globals()) | set(__all__) | set(_NAME_TO_MODULE) | {"__version__"}
+    )
 
-modules_import_as_is = []
 
 if os.getenv("STATIC_IMPORTS", "false").lower() == "true":
-    from .configSetup import *
-    from .EmailNotifier import *
-    from .JobLister import *
-    from .JobManager import *
-    from .JobRunner import *
-    from .LockFileUtils import *
-else:
-    # import modules accordingly
+    # Import everything up front (e.g. for tools that cannot follow lazy imports)
     for module in __all__:
-        if module in modules_import_as_is:
-            exec(f"from . import {module}")
-        else:
-            exec(f"from .{module} import *")
+        importlib.import_module(f".{module}", __name__)
+    for name in _NAME_TO_MODULE:
+        __getattr__(name)
@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 
 
@@ -17,9 +18,34 @@ def get_log_dir():
     return get_config_dir() / "logs"
 
 
+def get_job_output_dir():
+    return get_log_dir() / "job_output"
+
+
+def get_job_output_file(job_id: int):
+    return get_job_output_dir() / f"job_{job_id:05d}.out"
+
+
 def get_repo_dir(file: str):
     return Path(file).parent.parent.parent
 
 
 def get_server_service_dir(file: str):
     return get_repo_dir(file) / "ServerService"
+
+
+def get_app_settings_path():
+    return get_server_service_dir(__file__) / "templates" / "app_settings.json"
+
+
+def get_app_settings():
+    with open(get_app_settings_path(), "r") as f:
+        return json.load(f)
+
+
+def get_env_cache_dir():
+    return get_config_dir() / "env_cache"
+
+
+def get_backup_dir():
+    return get_config_dir() / "backups"
@@ -0,0 +1,107 @@
+"""
+Load test of AsyncJobQueue: a slow query must not hold up the other clients.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from sqljobscheduler.AsyncJobQueue import AsyncJobQueue, DBBusyError
+from sqljobscheduler.JobManager import JobQueue
+
+NUM_JOBS = 200
+NUM_CLIENTS = 50
+REQUESTS_PER_CLIENT = 20
+SLOW_QUERY_S = 2.0
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    queue = JobQueue(str(tmp_path / "analysis_jobs.db"))
+    for i in range(NUM_JOBS):
+        queue.add_job(
+            "script.py", "python", {"i": i}, "user@example.com", coalesce=False
+        )
+    return queue
+
+
+def get_p99(latencies):
+    latencies = sorted(latencies)
+    return latencies[int(len(latencies) * 0.99) - 1]
+
+
+async def run_clients(db: AsyncJobQueue):
+    """NUM_CLIENTS concurrent clients, each making REQUESTS_PER_CLIENT small queries"""
+    latencies = []
+
+    async def client(client_id: int):
+        for i in range(REQUESTS_PER_CLIENT):
+            start = time.perf_counter()
+            if i % 2:
+                await db.get_job((client_id * REQUESTS_PER_CLIENT + i) % NUM_JOBS + 1)
+            else:
+                await db.count_jobs_by_status()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client(client_id) for client_id in range(NUM_CLIENTS)))
+    return latencies
+
+
+async def measure_loop_lag(stop: asyncio.Event):
+    """Longest delay of a 10 ms timer, i.e. how long the event loop was blocked"""
+    max_lag = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        max_lag = max(max_lag, time.perf_counter() - start - 0.01)
+    return max_lag
+
+
+def test_p99_flat_during_slow_query(queue):
+    async def main():
+        db = AsyncJobQueue(queue, max_pending=NUM_CLIENTS + 1)
+        try:
+            idle_p99 = get_p99(await run_clients(db))
+
+            stop = asyncio.Event()
+            lag_task = asyncio.create_task(measure_loop_lag(stop))
+            # Stands in for a slow query: blocks one DB thread, like sqlite3 does
+            slow_task = asyncio.create_task(db.run(time.sleep, SLOW_QUERY_S))
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            slow_p99 = get_p99(await run_clients(db))
+            assert time.perf_counter() - start < SLOW_QUERY_S, (
+                "load ended after the slow query"
+            )
+            stop.set()
+            await slow_task
+            return idle_p99, slow_p99, await lag_task
+        finally:
+            db.shutdown()
+
+    idle_p99, slow_p99, loop_lag = asyncio.run(main())
+    # One of the DB threads is busy, so a bit slower, but nowhere near the slow query
+    assert slow_p99 < 2 * idle_p99 + 0.1, (idle_p99, slow_p99)
+    assert slow_p99 < SLOW_QUERY_S / 4, (idle_p99, slow_p99)
+    assert loop_lag < 0.1
+
+
+def test_busy_beyond_max_pending(queue):
+    async def main():
+        db = AsyncJobQueue(queue, max_workers=1, max_pending=2)
+        try:
+            slow_tasks = [
+                asyncio.create_task(db.run(time.sleep, 0.2)) for _ in range(2)
+            ]
+            await asyncio.sleep(0)
+            with pytest.raises(DBBusyError):
+                await db.count_jobs_by_status()
+            await asyncio.gather(*slow_tasks)
+            # Free again once the pending calls finished
+            return await db.count_jobs_by_status()
+        finally:
+            db.shutdown()
+
+    assert sum(asyncio.run(main()).values()) == NUM_JOBS
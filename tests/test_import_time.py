@@ -0,0 +1,68 @@
+"""
+`import sqljobscheduler` must stay cheap: submodules are imported lazily on first access.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+# Cumulative import time of the package itself (excluding the interpreter start up)
+IMPORT_TIME_BUDGET_US = 50_000
+# Dependencies that only submodules need
+HEAVY_MODULES = ["libtmux", "psutil", "cryptography", "pandas", "sqlite3", "tomli"]
+
+
+def run_python(code: str, *args: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": str(SRC_DIR), "STATIC_IMPORTS": "false"}
+    return subprocess.run(
+        [sys.executable, *args, "-c", code],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def get_import_time_us() -> int:
+    """Cumulative import time of sqljobscheduler, from `python -X importtime`"""
+    result = run_python("import sqljobscheduler", "-X", "importtime")
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == "sqljobscheduler":
+            return int(fields[1])
+    raise AssertionError(
+        f"sqljobscheduler not in -X importtime output:\n{result.stderr}"
+    )
+
+
+def test_import_time_budget():
+    # Best of a few runs, to not fail on a busy machine
+    import_time_us = min(get_import_time_us() for _ in range(3))
+    assert import_time_us < IMPORT_TIME_BUDGET_US, (
+        f"import sqljobscheduler took {import_time_us / 1000:.1f} ms "
+        f"(budget {IMPORT_TIME_BUDGET_US / 1000:.0f} ms)"
+    )
+
+
+def test_import_does_not_load_dependencies():
+    result = run_python(
+        "import sys, sqljobscheduler\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_class_exports():
+    result = run_python(
+        "import sqljobscheduler as s\n"
+        "print(s.EmailNotifier.__name__, s.JobRunner.__name__, s.JobManager.__name__)"
+    )
+    assert result.stdout.split() == [
+        "EmailNotifier",
+        "JobRunner",
+        "sqljobscheduler.JobManager",
+    ]
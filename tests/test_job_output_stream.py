@@ -0,0 +1,47 @@
+"""
+Output streams resume from the byte offset a client got, also after they were dropped.
+"""
+
+import asyncio
+
+from sqljobscheduler.JobOutputStream import JobOutputHub
+
+NUM_LINES = 50_000
+JOB_ID = 1
+
+
+def test_reconnect_after_release(tmp_path):
+    output_file = tmp_path / "job_1.out"
+    output_file.write_text("".join(f"line {i}\n" for i in range(NUM_LINES)))
+    hub = JobOutputHub(lambda job_id: output_file, lambda job_id: True)
+
+    async def read_lines(after_offset, num_lines):
+        """First `num_lines` lines (and their offsets) a client gets"""
+        received = []
+        stream = hub.get_stream(JOB_ID, after_offset)
+        subscription = stream.subscribe(after_offset)
+        try:
+            async for batch in subscription:
+                received.extend(batch or [])
+                if len(received) >= num_lines:
+                    return received[:num_lines]
+        finally:
+            await subscription.aclose()
+            hub.release(JOB_ID)
+
+    async def main():
+        first = await read_lines(None, 100)
+        # The stream is dropped with its last subscriber & started again on reconnect
+        assert JOB_ID not in hub._streams
+        second = await read_lines(first[-1][0], 100)
+        return first, second
+
+    first, second = asyncio.run(main())
+    first_line = int(first[0][1].split()[1])
+    assert [line for _, line in first + second] == [
+        f"line {i}" for i in range(first_line, first_line + 200)
+    ]
+    # Ids are the byte offsets after each line
+    content = output_file.read_bytes()
+    for offset, line in first + second:
+        assert content[:offset].endswith(f"{line}\n".encode())